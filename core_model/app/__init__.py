@@ -2,7 +2,10 @@
 Create and initialise the app. Uses Blueprints to define view.
 """
 import os
+import threading
+import time
 from functools import lru_cache, partial
+from pathlib import Path
 
 from faqt import WMDScorer, preprocess_text_for_word_embedding
 from faqt.model.faq_matching.contextualization import (
@@ -10,21 +13,48 @@ from faqt.model.faq_matching.contextualization import (
     get_ordered_distance_matrix,
 )
 from flask import Flask
-from hunspell import Hunspell
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from .data_models import FAQModel, LanguageContextModel
 from .database_sqlalchemy import db, migrate
-from .prometheus_metrics import metrics
+from .prometheus_metrics import (
+    faq_refreshes,
+    language_context_refreshes,
+    metrics,
+    record_worker_memory,
+)
+from .src.cache import LRUCache
+from .src.db_listener import listen_for_notifications
+from .src.embeddings import compress_word_embeddings
+from .src.faq_cache import FAQTokenCache
+from .src.faq_snapshot import FAQSnapshot, get_language_context_version
 from .src.faq_weights import add_faq_weight_share
+from .src.inbound_writer import InboundWriter
+from .src.scoring import VectorizedScorer
+from .src.spelling import ThreadSafeHunspell
+from .src.symspell import SymSpellChecker, SymSpellIndex
 from .src.utils import (
     DefaultEnvDict,
     deep_update,
     get_postgres_uri,
+    get_ttl_hash,
     load_data_sources,
     load_parameters,
     load_word_embeddings_bin,
 )
 
+# Seconds to wait before retrying a failed background refresh
+BACKGROUND_REFRESH_RETRY_WAIT = 30
+
+# Postgres channels notified by triggers on the `faqmatches` and `contextualization`
+# tables (see migrations)
+FAQS_CHANGED_CHANNEL = "faqs_changed"
+LANGUAGE_CONTEXT_CHANGED_CHANNEL = "language_context_changed"
+
+# Guards starting the background refresh thread from concurrent requests
+_background_refresh_lock = threading.Lock()
+
 
 def create_app(override_params=None):
     """
@@ -82,6 +112,43 @@ def setup(app, override_params):
     app.cached_faq_refresh = cached_faqs_wrapper(app)
     app.cached_language_context_refresh = cached_language_context_wrapper(app)
 
+    write_behind = app.config["WRITE_BEHIND"]
+    app.inbound_writer = (
+        InboundWriter(
+            app,
+            max_queue_size=write_behind["max_queue_size"],
+            batch_size=write_behind["batch_size"],
+            flush_interval=write_behind["flush_interval"],
+            id_block_size=write_behind["id_block_size"],
+            max_retries=write_behind["max_retries"],
+            retry_wait=write_behind["retry_wait"],
+            dead_letter_path=write_behind["dead_letter_path"],
+        )
+        if write_behind["active"]
+        else None
+    )
+
+    recent_inbounds_cache = app.config["RECENT_INBOUNDS_CACHE"]
+    app.recent_inbounds = (
+        LRUCache(recent_inbounds_cache["maxsize"], recent_inbounds_cache["ttl"])
+        if recent_inbounds_cache["maxsize"] > 0
+        else None
+    )
+
+    app.response_cache = (
+        LRUCache(app.config["RESPONSE_CACHE_SIZE"])
+        if app.config["RESPONSE_CACHE_SIZE"] > 0
+        else None
+    )
+
+    @app.before_request
+    def update_worker_memory_metrics():
+        """
+        Record private vs shared memory of this worker, at most once every
+        `MEMORY_METRICS_FREQ` seconds
+        """
+        record_worker_memory(get_ttl_hash(app.config["MEMORY_METRICS_FREQ"]))
+
 
 def get_config_data(override_params):
     """
@@ -106,6 +173,17 @@ def get_config_data(override_params):
     if config["CONTEXT_ACTIVE"]:
         config["CONTEXT_LIST"] = parameters["contextualization"]["context_list"]
 
+    config["MEMORY_METRICS_FREQ"] = parameters["monitoring"]["memory_metrics_freq"]
+    config["REFRESH_IN_BACKGROUND"] = parameters["refresh"]["background"]
+    config["REFRESH_ON_NOTIFY"] = parameters["refresh"]["on_notify"]
+    config["COMPACT_SCORING"] = parameters["storage"]["compact_scoring"]
+    config["WRITE_BEHIND"] = parameters["storage"]["write_behind"]
+    config["RECENT_INBOUNDS_CACHE"] = parameters["storage"]["recent_inbounds_cache"]
+    config["SPELLING_MEMO_SIZE"] = parameters["spelling"]["memo_size"]
+    config["SPELLING_MEMO_PATH"] = parameters["spelling"]["memo_path"]
+    config["SPELLING_ENGINE"] = parameters["spelling"]["engine"]
+    config["SYMSPELL_PARAMS"] = parameters["spelling"]["symspell"]
+
     faq_matching_config = parameters["faq_match"]
     config.update(faq_matching_config)
 
@@ -120,15 +198,15 @@ def get_config_data(override_params):
     return config
 
 
-def create_contextualization(app):
-    """Create demographic contextualization object"""
+def create_contextualization(app, faqs):
+    """Create demographic contextualization object for `faqs`"""
     contexts = app.context_list
     distance_matrix = get_ordered_distance_matrix(contexts)
     faq_contexts = {
         faq.faq_id: faq.faq_contexts if faq.faq_contexts is not None else contexts
-        for faq in app.faqs
+        for faq in faqs
     }
-    app.contextualizer = Contextualization(
+    return Contextualization(
         contents_dict=faq_contexts, distance_matrix=distance_matrix
     )
 
@@ -145,12 +223,14 @@ def load_embeddings(name_of_model_in_data_source):
     model_folder = data_sources[model_to_use_name]["folder"]
     model_filename = data_sources[model_to_use_name]["filename"]
     model_type = data_sources[model_to_use_name]["type"]
+    model_storage = data_sources[model_to_use_name].get("storage", "float32")
 
     word_embedding_model = load_word_embeddings_bin(
         model_folder,
         model_filename,
         model_type,
     )
+    word_embedding_model = compress_word_embeddings(word_embedding_model, model_storage)
 
     return word_embedding_model
 
@@ -161,24 +241,125 @@ def init_faqt_model(app):
     """
 
     gensim_keyed_vector = load_embeddings(app.config["MATCHING_MODEL"])
+    # Compute the norms now, so that with `--preload` they are computed once and
+    # shared with the workers instead of being computed (and stored) per worker
+    gensim_keyed_vector.fill_norms()
+    app.word_embedding_model = gensim_keyed_vector
+    app.hunspell = ThreadSafeHunspell(memo_size=app.config["SPELLING_MEMO_SIZE"])
+    app.symspell_index = (
+        load_symspell_index(app, gensim_keyed_vector)
+        if app.config["SPELLING_ENGINE"] == "symspell"
+        else None
+    )
+
     language_context = load_language_context(app)
-    custom_wvs = language_context.custom_wvs if language_context else {}
     pairwise = language_context.pairwise_triplewise_entities if language_context else {}
+
+    faq_token_cache = FAQTokenCache(get_text_preprocessor(pairwise))
+
+    app.refresh_lock = threading.Lock()
+    app.faq_snapshot = FAQSnapshot(
+        faqs=(),
+        faqt_model=create_faqt_model(app, language_context, faq_token_cache),
+        language_context=language_context,
+        tokenizer=faq_token_cache,
+    )
+
+    # Loaded after creating the model, in case it adds words to the dictionary
+    # (which clears the memo)
+    if app.config["SPELLING_MEMO_PATH"]:
+        app.hunspell.load_memo(
+            app.config["SPELLING_MEMO_PATH"],
+            version=app.faq_snapshot.language_context_version,
+        )
+
+
+def save_spelling_memo(app):
+    """
+    Save the spell checker's memo to `SPELLING_MEMO_PATH`, if set, so that workers
+    started later load it (see `init_faqt_model`)
+    """
+    if app.config["SPELLING_MEMO_PATH"]:
+        app.hunspell.save_memo(
+            app.config["SPELLING_MEMO_PATH"],
+            version=app.faq_snapshot.language_context_version,
+        )
+
+
+def load_symspell_index(app, keyed_vectors):
+    """
+    Load the SymSpell index of the word embeddings' vocabulary saved with
+    `src/save_symspell_index.py` (`index_filename` in the model's folder), or build
+    it if there is none
+    """
+    params = app.config["SYMSPELL_PARAMS"]
+    if params["index_filename"]:
+        folder = load_data_sources(app.config["MATCHING_MODEL"])["folder"]
+        index_path = (
+            Path(__file__).parents[2] / "data" / folder / params["index_filename"]
+        )
+        if index_path.exists():
+            return SymSpellIndex.load(index_path)
+        app.logger.warning(f"SymSpell index {index_path} not found, building it")
+
+    return SymSpellIndex.from_keyed_vectors(
+        keyed_vectors,
+        params["max_vocab_size"],
+        max_edit_distance=params["max_edit_distance"],
+        prefix_length=params["prefix_length"],
+    )
+
+
+def get_spell_checker(app, custom_wvs, tags_guiding_typos):
+    """
+    Spell checker for a faqt model: the app's Hunspell, or with the `symspell`
+    engine a checker over the vocabulary index plus the glossary words and tags
+    guiding typos
+    """
+    if app.config["SPELLING_ENGINE"] != "symspell":
+        return app.hunspell
+
+    return SymSpellChecker(
+        app.symspell_index, extra_words=[*custom_wvs, *tags_guiding_typos]
+    )
+
+
+def create_faqt_model(app, language_context, tokenizer):
+    """
+    Create a faqt model, without contents, using the app's word embeddings and the
+    glossary and tags guiding typos of `language_context`.
+    """
+    custom_wvs = language_context.custom_wvs if language_context else {}
     tags_guiding_typos = language_context.tag_guiding_typos if language_context else []
-    hunspell = Hunspell()
 
     params = app.config["MODEL_PARAMS"]
-
-    app.faqt_model = WMDScorer(
-        gensim_keyed_vector,
-        tokenizer=get_text_preprocessor(pairwise),
+    scorer_kwargs = dict(
+        tokenizer=tokenizer,
         weighting_method=params["weighting_method"],
         weighting_kwargs=params["weighting_kwargs"],
         glossary=custom_wvs,
-        hunspell=hunspell,
+        hunspell=get_spell_checker(app, custom_wvs, tags_guiding_typos),
         tags_guiding_typos=tags_guiding_typos,
     )
 
+    if params["scorer"] == "vectorized":
+        if params["tag_scoring_method"] != "cs_nearest_k_percent_average":
+            raise ValueError(
+                f"Tag scoring method {params['tag_scoring_method']} is not "
+                "supported by the vectorized scorer"
+            )
+        faqt_model = VectorizedScorer(
+            app.word_embedding_model,
+            tag_scoring_kwargs=params["tag_scoring_kwargs"],
+            score_reduction_method=params["score_reduction_method"],
+            prefilter_top_m=params["prefilter_top_m"],
+            **scorer_kwargs,
+        )
+    else:
+        faqt_model = WMDScorer(app.word_embedding_model, **scorer_kwargs)
+
+    return faqt_model
+
 
 def get_text_preprocessor(pairwise_entities):
     """
@@ -201,9 +382,50 @@ def get_text_preprocessor(pairwise_entities):
     return text_preprocessor
 
 
-def refresh_faqs(app):
+def get_faq_version(app):
     """
-    Queries DB for FAQs, and attaches to app.faqs for use with model
+    Cheap summary of the FAQs table that changes whenever FAQs are added, deleted,
+    updated or reweighted.
+
+    It includes a hash of every column of every FAQ, so that edits that don't
+    update `faq_updated_utc` (e.g. direct SQL edits) and deletes and inserts that
+    leave the other aggregates unchanged are noticed too. Only the hash is sent
+    back, not the FAQs.
+    """
+    with app.app_context():
+        faq_version = db.session.query(
+            func.count(FAQModel.faq_id),
+            func.max(FAQModel.faq_id),
+            func.sum(FAQModel.faq_id),
+            func.max(func.coalesce(FAQModel.faq_updated_utc, FAQModel.faq_added_utc)),
+            func.sum(FAQModel.faq_weight),
+            func.md5(
+                func.string_agg(
+                    literal_column("faqmatches::text"),
+                    aggregate_order_by(literal_column("','"), FAQModel.faq_id),
+                )
+            ),
+        ).one()
+
+    return tuple(faq_version)
+
+
+def refresh_faqs(app, force=False):
+    """
+    Queries DB for FAQs, and swaps in a new `app.faq_snapshot` using them.
+
+    Unless `force` is set, the full reload is skipped if `get_faq_version` shows
+    FAQs haven't changed since the last refresh. Otherwise, only FAQs added or
+    changed since the last refresh are tokenized, and a new model is only built if
+    any FAQ or FAQ weight changed. The new snapshot is built aside and then swapped
+    in, so requests being served keep using the previous one.
+
+    The tokens of unchanged FAQs come from `FAQTokenCache`. With the `vectorized`
+    scorer, so do their normalized word vectors, so only new or changed FAQs are
+    tokenized and looked up in the word embeddings; the vectors of all FAQs are
+    then stacked into one matrix, which is a plain copy. faqt's `WMDScorer` looks
+    up the word vectors of all FAQs itself, so with it only tokenization is
+    incremental.
     """
 
     # Need to push application context. Otherwise will raise:
@@ -211,16 +433,52 @@ def refresh_faqs(app):
     # Either work inside a view function or push an application context.
     # See http://flask-sqlalchemy.pocoo.org/contexts/.
 
-    with app.app_context():
-        faqs = FAQModel.query.all()
-    faqs.sort(key=lambda x: x.faq_id)
-    app.faqs = add_faq_weight_share(faqs)
+    with app.refresh_lock:
+        snapshot = app.faq_snapshot
+        faq_version = get_faq_version(app)
+        if (
+            not force
+            and faq_version == snapshot.version
+            and snapshot.content_state is not None
+        ):
+            faq_refreshes.labels(outcome="skipped").inc()
+            return len(snapshot.faqs)
+
+        with app.app_context():
+            faqs = FAQModel.query.all()
+        faqs.sort(key=lambda x: x.faq_id)
+        faqs = add_faq_weight_share(faqs)
+
+        faqt_model = snapshot.faqt_model
+        n_tokenized = snapshot.tokenizer.update(faqs)
+        content_state = [(faq.faq_id, faq.faq_weight_share) for faq in faqs]
+        if n_tokenized > 0 or content_state != snapshot.content_state:
+            faqt_model = create_faqt_model(
+                app, snapshot.language_context, snapshot.tokenizer
+            )
+            set_faqt_model_contents(faqt_model, faqs)
+
+        contextualizer = None
+        if app.is_context_active:
+            contextualizer = create_contextualization(app, faqs)
+
+        app.faq_snapshot = snapshot.replace(
+            faqs=faqs,
+            faqt_model=faqt_model,
+            contextualizer=contextualizer,
+            content_state=content_state,
+            version=faq_version,
+        )
+
+    faq_refreshes.labels(outcome="performed").inc()
+    return len(faqs)
+
+
+def set_faqt_model_contents(faqt_model, faqs):
+    """Set `faqs` as the contents of `faqt_model`"""
     content = [faq.faq_content_to_send for faq in faqs]
     weights = [faq.faq_weight_share for faq in faqs]
-    app.faqt_model.set_contents(content, weights)
-    if app.is_context_active:
-        create_contextualization(app)
-    return len(faqs)
+    faqt_model.set_contents(content, weights)
 
 
 def cached_faqs_wrapper(app):
@@ -247,24 +505,48 @@ def load_language_context(app):
     return language_context
 
 
-def refresh_language_context(app):
+def refresh_language_context(app, force=False):
     """
-    Update faqt model language contexts with the current configuration in the database
+    Update faqt model language contexts with the current configuration in the database.
+
+    Unless `force` is set, nothing is rebuilt if the language context is the same
+    as the current snapshot's (see `get_language_context_version`). Otherwise, a
+    new snapshot is built aside with the new configuration and then swapped in, so
+    requests being served keep using the previous one.
     """
     language_context = load_language_context(app)
 
-    app.faqt_model.set_glossary(language_context.custom_wvs if language_context else {})
-
-    app.faqt_model.set_tokenizer(
-        get_text_preprocessor(
-            language_context.pairwise_triplewise_entities if language_context else {}
+    with app.refresh_lock:
+        snapshot = app.faq_snapshot
+        new_version = get_language_context_version(language_context)
+        if not force and new_version == snapshot.language_context_version:
+            language_context_refreshes.labels(outcome="skipped").inc()
+            return language_context.version_id if language_context else "Empty"
+
+        # FAQ tokens depend on the entities, so FAQs need tokenizing from scratch
+        faq_token_cache = FAQTokenCache(
+            get_text_preprocessor(
+                language_context.pairwise_triplewise_entities
+                if language_context
+                else {}
+            )
         )
-    )
+        faqt_model = create_faqt_model(app, language_context, faq_token_cache)
 
-    app.faqt_model.set_tags_guiding_typos(
-        language_context.tag_guiding_typos if language_context else []
-    )
+        if snapshot.content_state is not None:
+            faq_token_cache.update(snapshot.faqs)
+            set_faqt_model_contents(faqt_model, snapshot.faqs)
+
+        app.faq_snapshot = snapshot.replace(
+            faqt_model=faqt_model,
+            language_context=language_context,
+            tokenizer=faq_token_cache,
+        )
+        # Spell corrections depend on the glossary and tags guiding typos
+        if new_version != snapshot.language_context_version:
+            app.hunspell.clear_memo()
 
+    language_context_refreshes.labels(outcome="performed").inc()
     if language_context is None:
         return "Empty"
     else:
@@ -283,3 +565,103 @@ def cached_language_context_wrapper(app):
         return version_id
 
     return cached_language_context
+
+
+def start_background_refresh(app):
+    """
+    If `REFRESH_IN_BACKGROUND` is set, start a daemon thread that refreshes FAQs and
+    language context once every `FAQ_REFRESH_FREQ` and
+    `LANGUAGE_CONTEXT_REFRESH_FREQ` seconds respectively, so that inbound requests
+    never wait on a refresh.
+
+    Threads don't survive forking, so the thread is started at most once per
+    process: with gunicorn, by `post_worker_init` in `gunicorn.conf.py`, and
+    otherwise (e.g. `flask run`) by the first inbound request, which calls this
+    again in case the thread isn't running in its process.
+
+    Returns
+    -------
+    threading.Thread or None
+        The refresh thread, or None if background refresh is not enabled
+    """
+    if not app.config["REFRESH_IN_BACKGROUND"]:
+        return None
+
+    with _background_refresh_lock:
+        thread = getattr(app, "background_refresh_thread", None)
+        if (
+            thread is not None
+            and app.background_refresh_pid == os.getpid()
+            and thread.is_alive()
+        ):
+            return thread
+
+        thread = _start_background_refresh_thread(app)
+        app.background_refresh_thread = thread
+        app.background_refresh_pid = os.getpid()
+
+    return thread
+
+
+def _start_background_refresh_thread(app):
+    """Start a daemon thread running the cached refreshes of `app` every second"""
+
+    def refresh_periodically():
+        """Run the cached refreshes, which only refresh once per TTL period"""
+        while True:
+            try:
+                if app.config["FAQ_REFRESH_FREQ"] > 0:
+                    app.cached_faq_refresh(get_ttl_hash(app.config["FAQ_REFRESH_FREQ"]))
+                if app.config["LANGUAGE_CONTEXT_REFRESH_FREQ"] > 0:
+                    app.cached_language_context_refresh(
+                        get_ttl_hash(app.config["LANGUAGE_CONTEXT_REFRESH_FREQ"])
+                    )
+            except Exception:
+                app.logger.exception("Background refresh failed")
+                time.sleep(BACKGROUND_REFRESH_RETRY_WAIT)
+            time.sleep(1)
+
+    thread = threading.Thread(
+        target=refresh_periodically, name="background-refresh", daemon=True
+    )
+    thread.start()
+
+    return thread
+
+
+def start_change_listener(app):
+    """
+    If `REFRESH_ON_NOTIFY` is set, start a daemon thread that listens for the
+    Postgres notifications sent when FAQs or language context change, and refreshes
+    them as soon as they do.
+
+    Threads don't survive forking, so with gunicorn this must be called in each
+    worker (see `post_worker_init` in `gunicorn.conf.py`).
+
+    Returns
+    -------
+    threading.Thread or None
+        The listener thread, or None if refreshing on notifications is not enabled
+    """
+    if not app.config["REFRESH_ON_NOTIFY"]:
+        return None
+
+    def refresh_all():
+        """Catch up on any changes missed while not listening"""
+        refresh_faqs(app)
+        refresh_language_context(app)
+
+    handlers = {
+        FAQS_CHANGED_CHANNEL: partial(refresh_faqs, app, force=True),
+        LANGUAGE_CONTEXT_CHANGED_CHANNEL: partial(refresh_language_context, app),
+    }
+    thread = threading.Thread(
+        target=listen_for_notifications,
+        args=(app.config["SQLALCHEMY_DATABASE_URI"], handlers),
+        kwargs={"on_connect": refresh_all},
+        name="change-listener",
+        daemon=True,
+    )
+    thread.start()
+
+    return thread
@@ -2,36 +2,74 @@
 Datamodels used in the app
 """
 
+from sqlalchemy import DDL, event
 from sqlalchemy.dialects.postgresql import JSONB
 
 from .database_sqlalchemy import db
+from .src.inbound_partitions import DEFAULT_PARTITION
 
 
 class Inbound(db.Model):
     """
     SQLAlchemy data model for Inbound API calls (with model and return metadata)
+
+    Partitioned by month of `inbound_utc` (see `src/inbound_partitions.py`), so the
+    primary key includes `inbound_utc`. Looking up an inbound by `inbound_id` alone
+    searches the `inbound_id` index of every partition, so lookups also match
+    `inbound_utc` where it is known, and old partitions are archived to bound the
+    number of partitions
     """
 
     __tablename__ = "inbounds"
-
-    inbound_id = db.Column(db.Integer(), primary_key=True, nullable=False)
+    __table_args__ = (
+        db.Index(
+            "ix_inbounds_returned_feedback",
+            "returned_feedback",
+            postgresql_using="gin",
+            postgresql_ops={"returned_feedback": "jsonb_path_ops"},
+        ),
+        db.Index(
+            "ix_inbounds_inbound_metadata", "inbound_metadata", postgresql_using="gin"
+        ),
+        db.Index("ix_inbounds_inbound_utc", "inbound_utc", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (inbound_utc)"},
+    )
+
+    inbound_id = db.Column(
+        db.Integer(), primary_key=True, autoincrement=True, nullable=False
+    )
     inbound_secret_key = db.Column(db.String(), nullable=False)
     feedback_secret_key = db.Column(db.String(), nullable=False)
     inbound_text = db.Column(db.String(), nullable=False)
-    inbound_metadata = db.Column(db.JSON())
-    inbound_utc = db.Column(db.DateTime(), nullable=False)
+    inbound_metadata = db.Column(JSONB)
+    inbound_utc = db.Column(db.DateTime(), primary_key=True, nullable=False)
 
-    model_scoring = db.Column(db.JSON(), nullable=False)
+    model_scoring = db.Column(JSONB, nullable=False)
+    # Compact alternative to `model_scoring` (see `src/compact_scoring.py`)
+    model_scores = db.Column(db.LargeBinary())
+    faq_snapshot_id = db.Column(
+        db.Integer(), db.ForeignKey("faq_snapshots.faq_snapshot_id")
+    )
 
-    returned_content = db.Column(db.JSON(), nullable=False)
+    returned_content = db.Column(JSONB, nullable=False)
     returned_utc = db.Column(db.DateTime(), nullable=False)
-    returned_feedback = db.Column(db.JSON())
+    returned_feedback = db.Column(JSONB)
 
     def __repr__(self):
         """Pretty print"""
         return "<Inbound %r>" % self.inbound_id
 
 
+# A partitioned table can't hold rows itself, so when `inbounds` is created without
+# migrations (e.g. by `db.create_all()`), also create the default partition that
+# inbounds go to until monthly partitions are created
+event.listen(
+    Inbound.__table__,
+    "after_create",
+    DDL(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF %(table)s DEFAULT"),
+)
+
+
 class FAQModel(db.Model):
     """
     SQLAlchemy data model for FAQ
@@ -56,6 +94,25 @@ class FAQModel(db.Model):
         return "<FAQ %r>" % self.faq_id
 
 
+class FAQSnapshotModel(db.Model):
+    """
+    SQLAlchemy data model for the FAQs (ids and titles, in order) that compactly
+    stored inbound scores refer to
+    """
+
+    __tablename__ = "faq_snapshots"
+
+    faq_snapshot_id = db.Column(db.Integer, primary_key=True, nullable=False)
+    content_hash = db.Column(db.String(), nullable=False, unique=True)
+    faq_ids = db.Column(db.ARRAY(db.Integer()), nullable=False)
+    faq_titles = db.Column(db.ARRAY(db.String()), nullable=False)
+    snapshot_added_utc = db.Column(db.DateTime(), nullable=False)
+
+    def __repr__(self):
+        """Pretty print"""
+        return "<FAQSnapshot %r>" % self.faq_snapshot_id
+
+
 class LanguageContextModel(db.Model):
     """
     SQLAlchemy data model for contextualization configurations
@@ -1,6 +1,7 @@
 ##############################################################################
 # INBOUND ENDPOINTS
 ##############################################################################
+import json
 import os
 from base64 import b64encode
 from collections import defaultdict
@@ -10,22 +11,73 @@ from math import ceil
 import numpy as np
 from flask import current_app, request, url_for
 from flask_restx import Resource
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import load_only
 
-from ..data_models import Inbound
+from .. import start_background_refresh
+from ..data_models import FAQSnapshotModel, Inbound
 from ..database_sqlalchemy import db
-from ..prometheus_metrics import metrics
+from ..prometheus_metrics import metrics, response_cache_requests
+from ..src.compact_scoring import encode_scores, scoring_from_scores
+from ..src.inbound_writer import RESERVE_INBOUND_IDS
+from ..src.ranking import rank_by_score
 from ..src.utils import get_ttl_hash
 from .auth import auth
 from .swagger_components import (
     api,
     feedback_request_fields,
+    inbound_check_batch_fields,
     inbound_check_fields,
     pagination_parser,
     pagination_response_fields,
+    response_check_batch_fields,
     response_check_fields,
 )
 
+# `faq_snapshots` ids by FAQ snapshot content hash
+FAQ_SNAPSHOT_IDS = {}
+
+# Columns needed to serve pages of past inbounds. `inbound_utc` is cached with them
+# so that later feedback only searches the inbound's partition
+PAGINATION_COLUMNS = (
+    Inbound.inbound_id,
+    Inbound.inbound_utc,
+    Inbound.inbound_secret_key,
+    Inbound.feedback_secret_key,
+    Inbound.model_scoring,
+    Inbound.model_scores,
+    Inbound.faq_snapshot_id,
+)
+
+# Columns needed to check feedback
+FEEDBACK_COLUMNS = (
+    Inbound.inbound_id,
+    Inbound.inbound_utc,
+    Inbound.feedback_secret_key,
+)
+
+# Append feedback to `returned_feedback` in a single statement, so concurrent
+# feedback on the same inbound isn't lost.
+# BACKWARDS COMPATIBILITY
+# Previously, instead of maintaining `returned_feedback` as a list, we saved a dict.
+# So we convert dict to [dict], so that we can append without overwriting the
+# original feedback.
+# `inbound_utc` is matched too, so that only the inbound's partition is searched
+APPEND_FEEDBACK = text(
+    """
+    UPDATE inbounds
+    SET returned_feedback = CASE
+            WHEN returned_feedback IS NULL
+                OR returned_feedback IN ('null'::jsonb, '{}'::jsonb)
+                THEN '[]'::jsonb
+            WHEN jsonb_typeof(returned_feedback) = 'array' THEN returned_feedback
+            ELSE jsonb_build_array(returned_feedback)
+        END || jsonb_build_array(CAST(:feedback AS jsonb))
+    WHERE inbound_id = :inbound_id AND inbound_utc = :inbound_utc
+    """
+)
+
 
 @api.route("/inbound/check")
 class InboundCheck(Resource):
@@ -83,62 +135,120 @@ class InboundCheck(Resource):
         """
         See class docstring for details.
         """
-        if current_app.config["FAQ_REFRESH_FREQ"] > 0:
-            current_app.cached_faq_refresh(
-                get_ttl_hash(current_app.config["FAQ_REFRESH_FREQ"])
-            )
-        if current_app.config["LANGUAGE_CONTEXT_REFRESH_FREQ"] > 0:
-            current_app.cached_language_context_refresh(
-                get_ttl_hash(current_app.config["LANGUAGE_CONTEXT_REFRESH_FREQ"])
-            )
+        run_due_refreshes()
 
         incoming = request.json
-        if "return_scoring" in incoming:
-            return_scoring = incoming["return_scoring"]
-            return_scoring = (return_scoring is True) or (return_scoring == "true")
-        else:
-            return_scoring = False
+        return_scoring = get_return_scoring(incoming)
 
-        if (
-            "context" in incoming
-            and len(incoming["context"]) > 0
-            and current_app.is_context_active
-        ):
-            contexts = incoming["context"]
-            weights_dic = current_app.contextualizer.get_context_weights(contexts)
-            weights = list(weights_dic.values())
-        else:
-            weights = None
+        # Refreshes swap in a new snapshot, so read it once per request
+        snapshot = current_app.faq_snapshot
+        matched = match_inbound(incoming, snapshot, return_scoring)
 
-        result = current_app.faqt_model.score_contents(
-            incoming["text_to_match"],
-            return_spell_corrected=True,
-            return_tag_scores=True,
-            weights=weights,
+        inbound_id = save_inbound_to_db(
+            incoming,
+            matched["stored_scoring"],
+            matched["json_return"],
+            matched["secret_keys"],
+            matched["compact_scoring"],
+            matched["inbound_utc"],
         )
+        return finalise_matched_inbound(matched, inbound_id)
 
-        word_vector_scores = result["overall_scores"]
-        spell_corrected = result["spell_corrected"]
-        tag_scores = []  # result["tag_scores"]
 
-        max_pages = ceil(
-            len(word_vector_scores) / current_app.config["N_TOP_MATCHES_PER_PAGE"]
-        )
+@api.route("/inbound/check-batch")
+class InboundCheckBatch(Resource):
+    """
+    Handles several inbound queries in one request, matching each message to FAQs
+    in database as `/inbound/check` does and saving all inbounds in one insert.
 
-        secret_keys = generate_secret_keys()
-        scoring_output = prepare_scoring_as_json(
-            current_app.faqs, word_vector_scores, tag_scores
-        )
-        json_return = prepare_return_json(
-            scoring_output, secret_keys, return_scoring, 1
-        )
-        scoring_output["spell_corrected"] = " ".join(spell_corrected)
-        inbound_id = save_inbound_to_db(
-            incoming, scoring_output, json_return, secret_keys
+    Messages are scored together with one matrix product if the model is a
+    `VectorizedScorer` (without prefilter), and one at a time otherwise (e.g. with
+    the default word mover's distance scorer). See `score_messages`.
+
+    Parameters
+    ----------
+    request (request proxy; see https://flask.palletsprojects.com/en/1.1.x/reqcontext/)
+        The request should be sent as JSON with fields:
+        - messages (required, list of at most `MAX_INBOUND_BATCH_SIZE` dicts), each
+          with fields:
+            - text_to_match (required, string)
+            - context (optional, List[string])
+            - metadata (optional, list/string/dict/etc.)
+        - return_scoring (optional, string)
+            - "true" will return scoring in the returned JSON of every message
+
+    Returns
+    -------
+    JSON
+        Fields:
+        - results: list with, for each message in order, the same fields as
+          returned by `/inbound/check`
+    """
+
+    @api.doc(
+        model=response_check_batch_fields,
+        body=inbound_check_batch_fields,
+        security="Bearer",
+    )
+    @metrics.do_not_track()
+    @metrics.summary(
+        "inbound_batch_by_status_current",
+        "Inbound batch latencies current",
+        labels={"status": lambda r: r.status_code},
+    )
+    @metrics.counter(
+        "inbound_batch_by_status",
+        "Inbound batch invocations counter",
+        labels={"status": lambda r: r.status_code},
+    )
+    @auth.login_required
+    def post(self):
+        """
+        See class docstring for details.
+        """
+        incoming = request.json
+        messages = incoming.get("messages")
+        max_batch_size = current_app.config["MAX_INBOUND_BATCH_SIZE"]
+        if not isinstance(messages, list) or len(messages) == 0:
+            return "`messages` must be a non-empty list", 400
+        elif len(messages) > max_batch_size:
+            return f"At most {max_batch_size} messages can be sent at once", 400
+        elif not all(
+            isinstance(message, dict) and "text_to_match" in message
+            for message in messages
+        ):
+            return "Every message must have `text_to_match`", 400
+
+        run_due_refreshes()
+        return_scoring = get_return_scoring(incoming)
+
+        # Refreshes swap in a new snapshot, so read it once for the whole batch
+        snapshot = current_app.faq_snapshot
+        results = score_messages(messages, snapshot)
+        matched_inbounds = [
+            match_inbound(message, snapshot, return_scoring, result)
+            for message, result in zip(messages, results)
+        ]
+
+        inbound_ids = save_inbounds_to_db(
+            [
+                build_inbound_row(
+                    message,
+                    matched["stored_scoring"],
+                    matched["json_return"],
+                    matched["secret_keys"],
+                    matched["compact_scoring"],
+                    matched["inbound_utc"],
+                )
+                for message, matched in zip(messages, matched_inbounds)
+            ]
         )
-        json_return = finalise_return_json(json_return, inbound_id, 1, max_pages)
+        results = [
+            finalise_matched_inbound(matched, inbound_id)
+            for matched, inbound_id in zip(matched_inbounds, inbound_ids)
+        ]
 
-        return json_return
+        return {"results": results}
 
 
 @api.route("/inbound/<int:inbound_id>/<int:page_number>")
@@ -189,17 +299,17 @@ class InboundResultsPage(Resource):
         See class docstring for details.
         """
         # check inbound key
-        orig_inbound = Inbound.query.filter_by(inbound_id=inbound_id).first()
+        recent_inbound = load_recent_inbound(inbound_id)
         secret_key = request.args["inbound_secret_key"]
         page_number = int(page_number)
 
-        if orig_inbound is None:
+        if recent_inbound is None:
             return f"No inbound message with `id` {inbound_id} found", 404
-        elif orig_inbound.inbound_secret_key != secret_key:
+        elif recent_inbound["keys"]["inbound_secret_key"] != secret_key:
             return "Incorrect Inbound Secret Key", 403
 
-        scoring_output = orig_inbound.model_scoring
-        _ = scoring_output.pop("spell_corrected")
+        scoring_output = recent_inbound["scoring"]
+        ranked_faq_ids = recent_inbound["ranked_faq_ids"]
         max_pages = ceil(
             len(scoring_output) / current_app.config["N_TOP_MATCHES_PER_PAGE"]
         )
@@ -213,12 +323,13 @@ class InboundResultsPage(Resource):
                 404,
             )
 
-        keys = {
-            "feedback_secret_key": orig_inbound.feedback_secret_key,
-            "inbound_secret_key": orig_inbound.inbound_secret_key,
-        }
-
-        json_return = prepare_return_json(scoring_output, keys, False, page_number)
+        json_return = prepare_return_json(
+            scoring_output,
+            recent_inbound["keys"],
+            False,
+            page_number,
+            ranked_faq_ids=ranked_faq_ids,
+        )
         json_return = finalise_return_json(
             json_return, inbound_id, page_number, max_pages
         )
@@ -266,37 +377,59 @@ class InboundFeedback(Resource):
         See class docstring for details.
         """
         feedback_request = request.json
-        orig_inbound = Inbound.query.filter_by(
-            inbound_id=feedback_request["inbound_id"]
-        ).first()
+        if current_app.recent_inbounds is not None:
+            # The secret key is checked against the cache, and caching the inbound
+            # on a miss means later feedback and pages only search its partition
+            recent_inbound = load_recent_inbound(feedback_request["inbound_id"])
+            if recent_inbound is None:
+                return "No Matches", 404
+            feedback_secret_key = recent_inbound["keys"]["feedback_secret_key"]
+            inbound_utc = recent_inbound["inbound_utc"]
+        else:
+            orig_inbound = get_inbound(feedback_request["inbound_id"], FEEDBACK_COLUMNS)
+            if orig_inbound is None:
+                return "No Matches", 404
+            feedback_secret_key = orig_inbound.feedback_secret_key
+            inbound_utc = orig_inbound.inbound_utc
 
-        if orig_inbound is None:
-            return "No Matches", 404
-        elif (
-            orig_inbound.feedback_secret_key != feedback_request["feedback_secret_key"]
-        ):
+        if feedback_secret_key != feedback_request["feedback_secret_key"]:
             return "Incorrect Feedback Secret Key", 403
         elif bad_feedback_schema(feedback_request["feedback"]):
             return "Malformed Feedback JSON", 400
+        elif not append_feedback(
+            int(feedback_request["inbound_id"]),
+            inbound_utc,
+            feedback_request["feedback"],
+        ):
+            return "No Matches", 404
+        return "Success", 200
 
-        if orig_inbound.returned_feedback:
-            # BACKWARDS COMPATIBILITY
-            # Previously, instead of maintaining orig_inbound.returned_feedback as a
-            # list, we saved a dict. So we convert dict to [dict], so that we can append
-            # without overwriting the original feedback.
-            if not isinstance(orig_inbound.returned_feedback, list):
-                orig_inbound.returned_feedback = [orig_inbound.returned_feedback]
-
-            orig_inbound.returned_feedback.append(feedback_request["feedback"])
-            # Need to flag dirty, since modifying JSON object
-            # https://docs.sqlalchemy.org/en/14/orm/session_api.htm
-            flag_modified(orig_inbound, "returned_feedback")
-        else:
-            orig_inbound.returned_feedback = [feedback_request["feedback"]]
 
-        db.session.add(orig_inbound)
-        db.session.commit()
-        return "Success", 200
+def append_feedback(inbound_id, inbound_utc, feedback):
+    """
+    Append `feedback` to the `returned_feedback` of the inbound with `inbound_id`
+    and `inbound_utc`.
+
+    With write-behind, if the inbound isn't written yet, inbounds queued by this
+    worker are written before trying again.
+
+    Returns
+    -------
+    bool
+        Whether the inbound was found
+    """
+    params = {
+        "inbound_id": inbound_id,
+        "inbound_utc": inbound_utc,
+        "feedback": json.dumps(feedback),
+    }
+    n_updated = db.session.execute(APPEND_FEEDBACK, params).rowcount
+    if n_updated == 0 and current_app.inbound_writer is not None:
+        current_app.inbound_writer.flush()
+        n_updated = db.session.execute(APPEND_FEEDBACK, params).rowcount
+    db.session.commit()
+
+    return n_updated > 0
 
 
 def generate_secret_keys():
@@ -311,15 +444,262 @@ def generate_secret_keys():
     return request_keys
 
 
-def prepare_scoring_as_json(faqs, overall_scores, tag_scores):
+def run_due_refreshes():
+    """
+    Refresh FAQs and language context if their refresh period has passed. With
+    background refresh, a thread in each worker runs these instead, and is started
+    here if it isn't running in this process yet
+    """
+    if current_app.config["REFRESH_IN_BACKGROUND"]:
+        start_background_refresh(current_app._get_current_object())
+        return
+
+    if current_app.config["FAQ_REFRESH_FREQ"] > 0:
+        current_app.cached_faq_refresh(
+            get_ttl_hash(current_app.config["FAQ_REFRESH_FREQ"])
+        )
+    if current_app.config["LANGUAGE_CONTEXT_REFRESH_FREQ"] > 0:
+        current_app.cached_language_context_refresh(
+            get_ttl_hash(current_app.config["LANGUAGE_CONTEXT_REFRESH_FREQ"])
+        )
+
+
+def get_return_scoring(incoming):
+    """
+    Whether the request asks for scoring to be returned ("return_scoring" is true or
+    "true")
+    """
+    return_scoring = incoming.get("return_scoring", False)
+    return (return_scoring is True) or (return_scoring == "true")
+
+
+def match_inbound(incoming, snapshot, return_scoring, result=None):
+    """
+    Match one inbound message to the FAQs of `snapshot` and prepare what is returned
+    and saved for it.
+
+    Parameters
+    ----------
+    incoming: Dict
+        The inbound message, with `text_to_match` and optionally `context`
+    snapshot: FAQSnapshot
+        The snapshot to match against, read once per request
+    return_scoring: bool
+        If scoring should be sent back in the JSON response
+    result: Dict, optional
+        The scores of the message, as returned by `score_messages`. Scored if not
+        given
+
+    Returns
+    -------
+    Dict
+        With keys:
+        - scoring_output, ranked_faq_ids: see `prepare_scoring_as_json`
+        - json_return: the response, to be completed by `finalise_matched_inbound`
+        - secret_keys: see `generate_secret_keys`
+        - max_pages: number of pages of results
+        - stored_scoring, compact_scoring: the scoring to save (see
+          `save_inbound_to_db`)
+        - inbound_utc: when the inbound was received
+    """
+    inbound_utc = datetime.utcnow()
+    if result is None:
+        result = score_messages([incoming], snapshot)[0]
+
+    word_vector_scores = result["overall_scores"]
+    spell_corrected = result["spell_corrected"]
+    tag_scores = []  # result["tag_scores"]
+
+    max_pages = ceil(
+        len(word_vector_scores) / current_app.config["N_TOP_MATCHES_PER_PAGE"]
+    )
+
+    # Full scoring is returned to the user, so only rank the top matches if not
+    n_ranked_pages = current_app.config["N_RANKED_PAGES"]
+    if n_ranked_pages and not return_scoring:
+        n_ranked = n_ranked_pages * current_app.config["N_TOP_MATCHES_PER_PAGE"]
+    else:
+        n_ranked = None
+
+    secret_keys = generate_secret_keys()
+    scoring_output, ranked_faq_ids = prepare_scoring_as_json(
+        snapshot.faqs, word_vector_scores, tag_scores, n_ranked=n_ranked
+    )
+    json_return = prepare_return_json(
+        scoring_output,
+        secret_keys,
+        return_scoring,
+        1,
+        ranked_faq_ids=ranked_faq_ids,
+        faqs_by_id=snapshot.faqs_by_id,
+    )
+    scoring_output["spell_corrected"] = " ".join(spell_corrected)
+    if current_app.config["COMPACT_SCORING"]:
+        compact_scoring = {
+            "model_scores": encode_scores(word_vector_scores),
+            "faq_snapshot_id": get_faq_snapshot_id(snapshot),
+        }
+        stored_scoring = {"spell_corrected": scoring_output["spell_corrected"]}
+    else:
+        compact_scoring = None
+        stored_scoring = scoring_output
+
+    return {
+        "scoring_output": scoring_output,
+        "ranked_faq_ids": ranked_faq_ids,
+        "json_return": json_return,
+        "secret_keys": secret_keys,
+        "max_pages": max_pages,
+        "stored_scoring": stored_scoring,
+        "compact_scoring": compact_scoring,
+        "inbound_utc": inbound_utc,
+    }
+
+
+def score_messages(incomings, snapshot):
+    """
+    Score the message of each of `incomings` against the FAQs of `snapshot`, with
+    the weights of its contexts if contextualization is active.
+
+    Results are kept in `current_app.response_cache`, if enabled, so repeated
+    messages aren't preprocessed, spell corrected and scored again. The cache key
+    (see `get_response_cache_key`) changes whenever the FAQs or language context
+    change, so cached scores are never served for other FAQs.
+
+    Messages that aren't cached are scored together with `score_contents_batch` if
+    the model has it (see `src/scoring.py`), and one at a time otherwise.
+
+    Returns
+    -------
+    List[Dict]
+        For each message, `overall_scores` and `spell_corrected`, as returned by
+        `score_contents`. Shared with other requests, so must not be modified
+    """
+    response_cache = current_app.response_cache
+    results = [None] * len(incomings)
+    to_score = []
+    for i, incoming in enumerate(incomings):
+        if (
+            "context" in incoming
+            and len(incoming["context"]) > 0
+            and current_app.is_context_active
+        ):
+            contexts = incoming["context"]
+        else:
+            contexts = None
+
+        cache_key = None
+        if response_cache is not None:
+            cache_key = get_response_cache_key(
+                incoming["text_to_match"], contexts, snapshot
+            )
+            results[i] = response_cache.get(cache_key)
+            if results[i] is not None:
+                response_cache_requests.labels(outcome="hit").inc()
+                continue
+            response_cache_requests.labels(outcome="miss").inc()
+
+        if contexts is not None:
+            weights_dic = snapshot.contextualizer.get_context_weights(contexts)
+            weights = list(weights_dic.values())
+        else:
+            weights = None
+        to_score.append((i, incoming["text_to_match"], weights, cache_key))
+
+    if not to_score:
+        return results
+
+    faqt_model = snapshot.faqt_model
+    _, messages, weights, _ = zip(*to_score)
+    if len(to_score) > 1 and hasattr(faqt_model, "score_contents_batch"):
+        scores = faqt_model.score_contents_batch(
+            list(messages), return_spell_corrected=True, weights=list(weights)
+        )
+    else:
+        scores = [
+            faqt_model.score_contents(
+                message,
+                return_spell_corrected=True,
+                return_tag_scores=True,
+                weights=message_weights,
+            )
+            for message, message_weights in zip(messages, weights)
+        ]
+
+    for (i, _, _, cache_key), message_scores in zip(to_score, scores):
+        results[i] = {
+            "overall_scores": message_scores["overall_scores"],
+            "spell_corrected": message_scores["spell_corrected"],
+        }
+        if response_cache is not None:
+            response_cache.set(cache_key, results[i])
+
+    return results
+
+
+def get_response_cache_key(text_to_match, contexts, snapshot):
+    """
+    Key of the scores of a message in `current_app.response_cache`: the message
+    with whitespace normalized, its contexts (sorted), and the versions of the FAQs
+    and language context of `snapshot`
+    """
+    return (
+        " ".join(text_to_match.split()),
+        tuple(sorted(contexts)) if contexts else (),
+        snapshot.version,
+        snapshot.content_hash,
+        snapshot.language_context_version,
+    )
+
+
+def finalise_matched_inbound(matched, inbound_id):
+    """
+    Cache the scoring of an inbound matched by `match_inbound` and saved with
+    `inbound_id`, and return its finalised response
+    """
+    cache_recent_inbound(
+        inbound_id,
+        matched["scoring_output"],
+        matched["ranked_faq_ids"],
+        matched["secret_keys"],
+        matched["inbound_utc"],
+    )
+    return finalise_return_json(
+        matched["json_return"], inbound_id, 1, matched["max_pages"]
+    )
+
+
+def prepare_scoring_as_json(faqs, overall_scores, tag_scores, n_ranked=None):
     """
     Convert scores so it can be saved as JSON in Db. Also save spell corrected
     terms.
+
+    Parameters
+    ----------
+    faqs: Sequence[FAQ]
+        FAQs in the same order as `overall_scores`
+    overall_scores: List[float]
+        Score of each FAQ
+    tag_scores: List
+        Unused
+    n_ranked: int, optional
+        If given, only the `n_ranked` top scoring FAQs are ranked (with
+        `np.partition`) and get a title and rank in `scoring_output`; other FAQs
+        only get their score, from which `get_top_n_matches` ranks them if deeper
+        pages are requested. Default rank all FAQs
+
+    Returns
+    -------
+    scoring_output: Dict[int, Dict]
+        Dict with faq_id as key and faq title, score and rank as values
+    ranked_faq_ids: List[int]
+        faq_ids of the ranked FAQs, from highest to lowest score, FAQs with the same
+        score by faq_id (see `rank_by_score`)
     """
     scoring_output = defaultdict(dict)
 
     if len(overall_scores) == 0 and len(tag_scores) == 0:
-        return scoring_output
+        return scoring_output, []
 
     n_faqs = len(faqs)
 
@@ -329,7 +709,11 @@ def prepare_scoring_as_json(faqs, overall_scores, tag_scores):
             f"be equal but got lengths {n_faqs} and {len(overall_scores)}, "
         )
 
-    ranks = np.argsort(np.argsort(overall_scores)[::-1]) + 1
+    if n_ranked is not None and n_ranked < n_faqs:
+        return prepare_top_scoring_as_json(faqs, overall_scores, n_ranked)
+
+    order = rank_by_score(overall_scores, [faq.faq_id for faq in faqs])
+    ranks = np.argsort(order) + 1
 
     for i, faq in enumerate(faqs):
         scoring_output[faq.faq_id]["overall_score"] = str(overall_scores[i])
@@ -337,10 +721,42 @@ def prepare_scoring_as_json(faqs, overall_scores, tag_scores):
         scoring_output[faq.faq_id]["rank"] = str(ranks[i])
         # Convert scoring[faq.faq_id] to have string values (to save in DB as JSON)
 
-    return scoring_output
+    ranked_faq_ids = [faqs[i].faq_id for i in order]
+
+    return scoring_output, ranked_faq_ids
 
 
-def save_inbound_to_db(incoming, scoring_output, json_return, secret_keys):
+def prepare_top_scoring_as_json(faqs, overall_scores, n_ranked):
+    """
+    Same as `prepare_scoring_as_json`, but only ranking the `n_ranked` top scoring
+    FAQs. Other FAQs only get their score, to be ranked if deeper pages are
+    requested.
+    """
+    scoring_output = defaultdict(dict)
+
+    order = rank_by_score(overall_scores, [faq.faq_id for faq in faqs], n_ranked)
+
+    for i, faq in enumerate(faqs):
+        scoring_output[faq.faq_id]["overall_score"] = str(overall_scores[i])
+
+    for rank, i in enumerate(order, start=1):
+        faq = faqs[i]
+        scoring_output[faq.faq_id]["faq_title"] = faq.faq_title
+        scoring_output[faq.faq_id]["rank"] = str(rank)
+
+    ranked_faq_ids = [faqs[i].faq_id for i in order]
+
+    return scoring_output, ranked_faq_ids
+
+
+def save_inbound_to_db(
+    incoming,
+    scoring_output,
+    json_return,
+    secret_keys,
+    compact_scoring=None,
+    inbound_utc=None,
+):
     """
     Saves the inbound request and (most of) the response in the Db.
 
@@ -357,16 +773,78 @@ def save_inbound_to_db(incoming, scoring_output, json_return, secret_keys):
         the response dict
     secret_keys: Dict
         A dictionary of secret keys
+    compact_scoring: Dict, optional
+        `model_scores` and `faq_snapshot_id`, if scores are stored compactly (see
+        `src/compact_scoring.py`)
+    inbound_utc: datetime, optional
+        When the inbound was received. Default now
 
     Returns
     -------
     inbound_id: int
-        The id of the new record created in the Db
+        The id of the new record created in the Db. With write-behind, the id the
+        record will be created with
+    """
+    inbound_row = build_inbound_row(
+        incoming, scoring_output, json_return, secret_keys, compact_scoring, inbound_utc
+    )
+
+    inbound_writer = current_app.inbound_writer
+    if inbound_writer is not None:
+        return submit_inbound_row(inbound_writer, inbound_row)
+
+    new_inbound_query = Inbound(**inbound_row)
+    db.session.add(new_inbound_query)
+    db.session.commit()
+
+    return new_inbound_query.inbound_id
+
+
+def save_inbounds_to_db(inbound_rows):
+    """
+    Save several inbounds (rows built by `build_inbound_row`) in one multi-row
+    insert, with ids reserved from the id sequence in one query.
+
+    Returns
+    -------
+    inbound_ids: List[int]
+        The ids of the new records, in the order of `inbound_rows`. With
+        write-behind, the ids the records will be created with
     """
-    received_ts = datetime.utcnow()
+    inbound_writer = current_app.inbound_writer
+    if inbound_writer is not None:
+        return [submit_inbound_row(inbound_writer, row) for row in inbound_rows]
+
+    inbound_ids = (
+        db.session.execute(RESERVE_INBOUND_IDS, {"n_ids": len(inbound_rows)})
+        .scalars()
+        .all()
+    )
+    for inbound_row, inbound_id in zip(inbound_rows, inbound_ids):
+        inbound_row["inbound_id"] = inbound_id
+
+    db.session.execute(Inbound.__table__.insert(), inbound_rows)
+    db.session.commit()
+
+    return inbound_ids
+
+
+def build_inbound_row(
+    incoming,
+    scoring_output,
+    json_return,
+    secret_keys,
+    compact_scoring=None,
+    inbound_utc=None,
+):
+    """
+    `Inbound` column values for an inbound. See `save_inbound_to_db` for the
+    parameters
+    """
+    received_ts = inbound_utc or datetime.utcnow()
     incoming_metadata = incoming.get("metadata")
 
-    new_inbound_query = Inbound(
+    return dict(
         # Inbound details
         **secret_keys,
         inbound_text=incoming["text_to_match"],
@@ -374,17 +852,187 @@ def save_inbound_to_db(incoming, scoring_output, json_return, secret_keys):
         inbound_utc=received_ts,
         # Processing details
         model_scoring=scoring_output,
+        **(compact_scoring or {}),
         # Returned details
         returned_content=json_return,
         returned_utc=datetime.utcnow(),
     )
-    db.session.add(new_inbound_query)
+
+
+def submit_inbound_row(inbound_writer, inbound_row):
+    """
+    Queue `inbound_row` to be written by the write-behind `inbound_writer`, and
+    return the id it will be written with
+    """
+    # `json_return` is updated after saving, and the row is written later
+    inbound_row["returned_content"] = dict(inbound_row["returned_content"])
+    inbound_row["inbound_id"] = inbound_writer.next_inbound_id()
+    inbound_writer.submit(inbound_row)
+    return inbound_row["inbound_id"]
+
+
+def cache_recent_inbound(inbound_id, scoring_output, ranked_faq_ids, keys, inbound_utc):
+    """
+    Keep what's needed to serve pages of and check feedback on an inbound in
+    `current_app.recent_inbounds`, if enabled.
+
+    Returns
+    -------
+    Dict
+        The cached entry, with `scoring` (without `spell_corrected`),
+        `ranked_faq_ids`, secret `keys` and `inbound_utc` (which locates the
+        inbound's partition)
+    """
+    recent_inbound = {
+        "scoring": {
+            faq_id: scores
+            for faq_id, scores in scoring_output.items()
+            if faq_id != "spell_corrected"
+        },
+        "ranked_faq_ids": ranked_faq_ids,
+        "keys": {
+            "feedback_secret_key": keys["feedback_secret_key"],
+            "inbound_secret_key": keys["inbound_secret_key"],
+        },
+        "inbound_utc": inbound_utc,
+    }
+    if current_app.recent_inbounds is not None:
+        current_app.recent_inbounds.set(int(inbound_id), recent_inbound)
+
+    return recent_inbound
+
+
+def get_recent_inbound(inbound_id):
+    """
+    Get the entry cached by `cache_recent_inbound` for `inbound_id`, or None if not
+    cached in this worker
+    """
+    if current_app.recent_inbounds is None:
+        return None
+
+    try:
+        return current_app.recent_inbounds.get(int(inbound_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def load_recent_inbound(inbound_id):
+    """
+    Get the entry cached by `cache_recent_inbound` for `inbound_id`, reading the
+    inbound from the database and caching it if it isn't cached. None if the
+    inbound doesn't exist
+    """
+    recent_inbound = get_recent_inbound(inbound_id)
+    if recent_inbound is not None:
+        return recent_inbound
+
+    orig_inbound = get_inbound(inbound_id, PAGINATION_COLUMNS)
+    if orig_inbound is None:
+        return None
+
+    return cache_recent_inbound(
+        inbound_id,
+        *load_scoring(orig_inbound),
+        {
+            "feedback_secret_key": orig_inbound.feedback_secret_key,
+            "inbound_secret_key": orig_inbound.inbound_secret_key,
+        },
+        orig_inbound.inbound_utc,
+    )
+
+
+def get_inbound(inbound_id, columns=None):
+    """
+    Get the inbound with `inbound_id`, or None if it doesn't exist. If `columns`
+    (`Inbound` attributes) are given, only those are loaded.
+
+    With write-behind, if the inbound isn't found, inbounds queued by this worker
+    are written before checking again. Inbounds queued by other workers are found
+    once written, within `flush_interval` seconds.
+
+    The inbound's time isn't known, so the `inbound_id` index of every partition of
+    `inbounds` is searched. Only used when an inbound isn't cached: callers cache
+    `inbound_utc` (see `load_recent_inbound`) so that later pages of and feedback on
+    the same inbound only search its partition.
+    """
+    query = Inbound.query.filter_by(inbound_id=inbound_id)
+    if columns is not None:
+        query = query.options(load_only(*columns))
+
+    inbound = query.first()
+    if inbound is None and current_app.inbound_writer is not None:
+        current_app.inbound_writer.flush()
+        inbound = query.first()
+
+    return inbound
+
+
+def get_faq_snapshot_id(snapshot):
+    """
+    Id of the `faq_snapshots` row for the FAQs of `snapshot`, adding it if it
+    doesn't exist yet. Ids are cached in `FAQ_SNAPSHOT_IDS`
+    """
+    content_hash = snapshot.content_hash
+    faq_snapshot_id = FAQ_SNAPSHOT_IDS.get(content_hash)
+    if faq_snapshot_id is not None:
+        return faq_snapshot_id
+
+    statement = (
+        insert(FAQSnapshotModel)
+        .values(
+            content_hash=content_hash,
+            faq_ids=[faq.faq_id for faq in snapshot.faqs],
+            faq_titles=[faq.faq_title for faq in snapshot.faqs],
+            snapshot_added_utc=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["content_hash"])
+    )
+    db.session.execute(statement)
     db.session.commit()
 
-    return new_inbound_query.inbound_id
+    faq_snapshot_id = (
+        db.session.query(FAQSnapshotModel.faq_snapshot_id)
+        .filter_by(content_hash=content_hash)
+        .scalar()
+    )
+    FAQ_SNAPSHOT_IDS[content_hash] = faq_snapshot_id
+
+    return faq_snapshot_id
 
 
-def prepare_return_json(scoring_output, keys, return_scoring, page_number):
+def load_scoring(inbound):
+    """
+    Load the model scoring of a saved inbound, whether stored compactly or as JSON.
+
+    Returns
+    -------
+    scoring_output: Dict[str, Dict]
+        Dict with faq_id as key and faq details and scores as values
+    ranked_faq_ids: List[str] or None
+        faq_ids from highest to lowest score, if known without sorting
+        `scoring_output`
+    """
+    if inbound.model_scores is None:
+        scoring_output = dict(inbound.model_scoring)
+        scoring_output.pop("spell_corrected", None)
+        return scoring_output, None
+
+    faq_snapshot = FAQSnapshotModel.query.filter_by(
+        faq_snapshot_id=inbound.faq_snapshot_id
+    ).first()
+    return scoring_from_scores(
+        inbound.model_scores, faq_snapshot.faq_ids, faq_snapshot.faq_titles
+    )
+
+
+def prepare_return_json(
+    scoring_output,
+    keys,
+    return_scoring,
+    page_number,
+    ranked_faq_ids=None,
+    faqs_by_id=None,
+):
     """
     Prepare the json to be returned. Note that it also has the side effect of
     updating `scoring_output`.
@@ -399,6 +1047,10 @@ def prepare_return_json(scoring_output, keys, return_scoring, page_number):
         If scoring should be sent back in the JSON response
     page_number: Int
         The page number to return
+    ranked_faq_ids: List[int], optional
+        See `get_top_n_matches`
+    faqs_by_id: Mapping[int, FAQ], optional
+        See `get_top_n_matches`
 
     Returns
     -------
@@ -411,7 +1063,11 @@ def prepare_return_json(scoring_output, keys, return_scoring, page_number):
         top_matches_list = []
     else:
         top_matches_list = get_top_n_matches(
-            scoring_output, items_per_page, (page_number - 1) * items_per_page
+            scoring_output,
+            items_per_page,
+            (page_number - 1) * items_per_page,
+            ranked_faq_ids=ranked_faq_ids,
+            faqs_by_id=faqs_by_id,
         )
 
     json_return = {}
@@ -424,7 +1080,9 @@ def prepare_return_json(scoring_output, keys, return_scoring, page_number):
     return json_return
 
 
-def get_top_n_matches(scoring, n_top_matches, start_idx=0):
+def get_top_n_matches(
+    scoring, n_top_matches, start_idx=0, ranked_faq_ids=None, faqs_by_id=None
+):
     """
     Gives a list of scores for each FAQ, return the top `n_top_matches` FAQs
 
@@ -438,34 +1096,66 @@ def get_top_n_matches(scoring, n_top_matches, start_idx=0):
         the number of top matches to return
     start_idx: int, optional
         takes the `n_top_matches` starting the `start_idx`
+    ranked_faq_ids: List[int], optional
+        faq_ids of `scoring` from highest to lowest score, at least up to the
+        requested page. If not given, they are taken from `scoring` (see
+        `get_ranked_faq_ids`)
+    faqs_by_id: Mapping[int, FAQ], optional
+        FAQs to take the content and title from, by faq_id. Default the FAQs of the
+        current `faq_snapshot`
 
     Returns
     -------
     List[Tuple(str, str, str)]
         A list of tuples of (faq_id, faq_content_to_send, faq_title).
     """
-    # Sort and copy over top matches
+    n_needed = start_idx + n_top_matches
+    if ranked_faq_ids is None or (
+        len(ranked_faq_ids) < n_needed and len(ranked_faq_ids) < len(scoring)
+    ):
+        ranked_faq_ids = get_ranked_faq_ids(scoring, n_needed)
+    if faqs_by_id is None:
+        faqs_by_id = current_app.faq_snapshot.faqs_by_id
+
+    # Copy over top matches
     top_matches_list = []
-    sorted_scoring = sorted(scoring, key=lambda x: int(scoring[x]["rank"]))
 
-    for faq_id in sorted_scoring[start_idx : start_idx + n_top_matches]:
-        content = [
-            faq.faq_content_to_send
-            for faq in current_app.faqs
-            if faq.faq_id == int(faq_id)
-        ][0]
+    for faq_id in ranked_faq_ids[start_idx : start_idx + n_top_matches]:
+        faq = faqs_by_id[int(faq_id)]
+        # FAQs beyond the ranked top matches are stored without their title
+        title = scoring[faq_id].get("faq_title", faq.faq_title)
 
         top_matches_list.append(
             (
                 str(faq_id),
-                scoring[faq_id]["faq_title"],
-                content,
+                title,
+                faq.faq_content_to_send,
             )
         )
 
     return top_matches_list
 
 
+def get_ranked_faq_ids(scoring, n_needed):
+    """
+    faq_ids of `scoring` from highest to lowest score, at least for the first
+    `n_needed`.
+
+    FAQs with a rank are sorted by rank. Only if they are fewer than `n_needed` (see
+    `n_ranked` in `prepare_scoring_as_json`) are the remaining FAQs ranked, by
+    score and then faq_id, as by `rank_by_score`.
+    """
+    ranked = [faq_id for faq_id, scores in scoring.items() if "rank" in scores]
+    ranked.sort(key=lambda x: int(scoring[x]["rank"]))
+    if len(ranked) >= n_needed or len(ranked) == len(scoring):
+        return ranked
+
+    unranked = [faq_id for faq_id, scores in scoring.items() if "rank" not in scores]
+    unranked.sort(key=lambda x: (-float(scoring[x]["overall_score"]), int(x)))
+
+    return ranked + unranked
+
+
 def finalise_return_json(json_return, inbound_id, current_page, max_pages):
     """
     Create additional items in JSON returned. This also includes pagination links
@@ -37,10 +37,11 @@ def healthcheck():
     except Exception:
         return "Failed to refresh FAQs (even after connecting to database)", 500
 
-    if not current_app.faqs:
+    snapshot = current_app.faq_snapshot
+    if not snapshot.faqs:
         return "No FAQs in database", 500
 
-    if "test" not in current_app.faqt_model.word_embedding_model:
+    if "test" not in snapshot.faqt_model.word_embedding_model:
         return "Model failure - the word 'test' is not in the model", 500
 
     engine = sa.create_engine(current_app.config["SQLALCHEMY_DATABASE_URI"])
@@ -19,36 +19,49 @@ api = Api(
 )
 
 # Inbound fields
+inbound_message_dict = {
+    "text_to_match": fields.String(
+        description="The input message text to match",
+        required=True,
+        example="is it normal to crave anchovies for breakfast",
+    ),
+    "context": fields.List(
+        fields.String,
+        description=("List of message contexts. Each contect is a string "),
+        required=False,
+        example=["test", "deploy"],
+    ),
+    "metadata": fields.Raw(
+        description=(
+            "Can be list/dict/string/etc. Any custom metadata "
+            "(inbound phone number/hash, labels, etc.). This will be "
+            "stored in the inbound query database."
+        ),
+        required=False,
+    ),
+}
+return_scoring_field = fields.Boolean(
+    default=False,
+    description=(
+        "Setting this to 'true' (lowercase) will return "
+        "the match scores for each FAQ in the returned JSON."
+    ),
+    required=False,
+)
+
 inbound_check_fields = api.model(
     "InboundCheckRequest",
+    {**inbound_message_dict, "return_scoring": return_scoring_field},
+)
+inbound_check_batch_fields = api.model(
+    "InboundCheckBatchRequest",
     {
-        "text_to_match": fields.String(
-            description="The input message text to match",
+        "messages": fields.List(
+            fields.Nested(api.model("InboundMessage", inbound_message_dict)),
+            description="Messages to match, each with its own context and metadata",
             required=True,
-            example="is it normal to crave anchovies for breakfast",
-        ),
-        "context": fields.List(
-            fields.String,
-            description=("List of message contexts. Each contect is a string "),
-            required=False,
-            example=["test", "deploy"],
-        ),
-        "metadata": fields.Raw(
-            description=(
-                "Can be list/dict/string/etc. Any custom metadata "
-                "(inbound phone number/hash, labels, etc.). This will be "
-                "stored in the inbound query database."
-            ),
-            required=False,
-        ),
-        "return_scoring": fields.Boolean(
-            default=False,
-            description=(
-                "Setting this to 'true' (lowercase) will return "
-                "the match scores for each FAQ in the returned JSON."
-            ),
-            required=False,
         ),
+        "return_scoring": return_scoring_field,
     },
 )
 
@@ -129,6 +142,15 @@ response_dict = {
 
 
 response_check_fields = api.model("InboundCheckResponseModel", response_dict)
+response_check_batch_fields = api.model(
+    "InboundCheckBatchResponseModel",
+    {
+        "results": fields.List(
+            fields.Nested(response_check_fields),
+            description="Response for each message, in the order they were sent",
+        )
+    },
+)
 
 # Pagination inbound
 # TODO: reqparse is deprecated, Switch to marshmallow or WegArgs
@@ -7,6 +7,7 @@ from functools import wraps
 from faqt.model.faq_matching.keyed_vectors_scoring import model_search_word
 from flask import abort, current_app, jsonify, request
 
+from .. import create_faqt_model, set_faqt_model_contents
 from ..data_models import TemporaryModel
 from ..prometheus_metrics import metrics
 from ..src import faq_weights
@@ -60,6 +61,7 @@ def check_new_tags():
             - New FAQ is titled "*** NEW TAGS MATCHED ***"
     """
     req_json = request.json
+    snapshot = current_app.faq_snapshot
     temp_faq = TemporaryModel(
         faq_id="TEMP",
         faq_title="*** NEW TAGS MATCHED ***",
@@ -67,21 +69,30 @@ def check_new_tags():
         faq_content_to_send=" ".join(req_json["tags_to_check"]),
         faq_weight=1,
     )
-    original_faqs = current_app.faqs
-    with_temp_faqs = original_faqs + [temp_faq]
-    with_temp_faqs = faq_weights.add_faq_weight_share(with_temp_faqs)
-    current_app.faqt_model.set_contents(
-        [faq.faq_content_to_send for faq in with_temp_faqs],
-        [faq.faq_weight_share for faq in with_temp_faqs],
+    # The FAQ objects are shared with requests being served, so don't set new
+    # weight shares on them
+    faq_copies = [
+        TemporaryModel(
+            faq_id=faq.faq_id,
+            faq_title=faq.faq_title,
+            faq_content_to_send=faq.faq_content_to_send,
+            faq_weight=faq.faq_weight,
+        )
+        for faq in snapshot.faqs
+    ]
+    with_temp_faqs = faq_weights.add_faq_weight_share(faq_copies + [temp_faq])
+
+    # Score with a separate model, so that the shared model keeps its contents
+    faqt_model = create_faqt_model(
+        current_app, snapshot.language_context, snapshot.tokenizer
     )
+    set_faqt_model_contents(faqt_model, with_temp_faqs)
 
     json_return = {}
     json_return["top_matches_for_each_query"] = []
 
     for query_to_check in req_json["queries_to_check"]:
-        result = current_app.faqt_model.score_contents(
-            query_to_check, return_tag_scores=True
-        )
+        result = faqt_model.score_contents(query_to_check, return_tag_scores=True)
 
         matched_faq_titles = set()
         top_matches = []
@@ -99,11 +110,6 @@ def check_new_tags():
 
         json_return["top_matches_for_each_query"].append(top_matches)
 
-    current_app.faqt_model.set_contents(
-        [faq.faq_content_to_send for faq in original_faqs],
-        [faq.faq_weight_share for faq in original_faqs],
-    )
-
     # Flask automatically calls jsonify
     return json_return
 
@@ -129,14 +135,15 @@ def validate_tags():
     """
 
     req_json = request.json
+    faqt_model = current_app.faq_snapshot.faqt_model
     failed_tags = []
 
     for tag in req_json["tags_to_check"]:
         if (
             model_search_word(
                 tag,
-                current_app.faqt_model.word_embedding_model,
-                current_app.faqt_model.glossary,
+                faqt_model.word_embedding_model,
+                faqt_model.glossary,
             )
             is None
         ):
@@ -168,7 +175,7 @@ def check_faq_contexts():
     to_check = set(incoming["contexts_to_check"])
 
     invalid_contexts = (
-        to_check - set(current_app.contextualizer.contexts)
+        to_check - set(current_app.faq_snapshot.contextualizer.contexts)
         if current_app.is_context_active
         else to_check
     )
@@ -1,3 +1,73 @@
+from functools import lru_cache
+
+from prometheus_client import Counter, Gauge, Histogram
 from prometheus_flask_exporter.multiprocess import GunicornInternalPrometheusMetrics
 
+from .src.utils import get_process_memory
+
 metrics = GunicornInternalPrometheusMetrics.for_app_factory()
+
+worker_memory_bytes = Gauge(
+    "worker_memory_bytes",
+    "Memory used by the worker process, by type (private, shared, proportional)",
+    ["memory_type"],
+    multiprocess_mode="all",
+)
+
+faq_refreshes = Counter(
+    "faq_refreshes",
+    "FAQ refreshes, by outcome (skipped if FAQs were unchanged, else performed)",
+    ["outcome"],
+)
+
+language_context_refreshes = Counter(
+    "language_context_refreshes",
+    "Language context refreshes, by outcome (skipped if the language context was "
+    "unchanged, else performed)",
+    ["outcome"],
+)
+
+inbound_write_queue_depth = Gauge(
+    "inbound_write_queue_depth",
+    "Inbounds waiting to be written to the database (write-behind mode)",
+    multiprocess_mode="livesum",
+)
+
+inbound_write_flush_seconds = Histogram(
+    "inbound_write_flush_seconds",
+    "Time taken to write a batch of inbounds to the database (write-behind mode)",
+)
+
+inbound_write_failures = Counter(
+    "inbound_write_failures",
+    "Inbounds that couldn't be written to the database after retries and were "
+    "saved to the dead letter file (write-behind mode)",
+)
+
+response_cache_requests = Counter(
+    "response_cache_requests",
+    "Inbound messages looked up in the response cache, by outcome (hit or miss)",
+    ["outcome"],
+)
+
+spelling_memo_requests = Counter(
+    "spelling_memo_requests",
+    "Hunspell calls looked up in the spelling memo, by method and outcome (hit or "
+    "miss)",
+    ["method", "outcome"],
+)
+
+spelling_memo_evictions = Counter(
+    "spelling_memo_evictions",
+    "Results evicted from the spelling memo to make room for new ones",
+)
+
+
+@lru_cache(maxsize=1)
+def record_worker_memory(ttl_hash):
+    """
+    Update `worker_memory_bytes` for this process. Caching on `ttl_hash` means it
+    only reads memory usage once per TTL period.
+    """
+    for memory_type, value in get_process_memory().items():
+        worker_memory_bytes.labels(memory_type=memory_type).set(value)
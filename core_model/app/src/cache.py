@@ -0,0 +1,82 @@
+"""In-memory caches shared between the threads of a worker"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache, with optional expiry.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries. The least recently used entry is evicted when
+        the cache is full
+    ttl : float, optional
+        Seconds after which an entry expires. Default entries don't expire
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        """Create an empty cache"""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of entries, including any expired but not yet evicted"""
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Get the value for `key`, or `default` if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, expiry = entry
+            if expiry is not None and expiry < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Set the value for `key`, evicting the least recently used if full. Returns
+        the number of entries evicted
+        """
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else None
+        n_evicted = 0
+        with self._lock:
+            self._entries[key] = (value, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                n_evicted += 1
+
+        return n_evicted
+
+    def pop(self, key, default=None):
+        """Remove `key` and return its value, or `default` if missing"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+        return default if entry is None else entry[0]
+
+    def items(self):
+        """(key, value) of unexpired entries, from least to most recently used"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value)
+                for key, (value, expiry) in self._entries.items()
+                if expiry is None or expiry >= now
+            ]
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,66 @@
+"""
+Compact storage of the model scoring of inbound messages.
+
+Instead of a JSON dict with the stringified score, title and rank of every FAQ, an
+inbound's scores are stored as a float32 array, in the order of the FAQs of an
+`faq_snapshots` row. The FAQs (ids and titles) are stored once per set of FAQs,
+instead of once per inbound.
+"""
+import numpy as np
+
+from .ranking import rank_by_score
+
+SCORE_DTYPE = np.float32
+
+
+def encode_scores(scores):
+    """Encode a list of scores as bytes, to store as `bytea`"""
+    return np.asarray(scores, dtype=SCORE_DTYPE).tobytes()
+
+
+def decode_scores(data):
+    """Decode scores encoded with `encode_scores`"""
+    return np.frombuffer(data, dtype=SCORE_DTYPE)
+
+
+def scoring_from_scores(scores, faq_ids, faq_titles):
+    """
+    Rebuild the scoring dict saved in `model_scoring` from compactly stored scores.
+
+    Parameters
+    ----------
+    scores : bytes
+        Scores encoded with `encode_scores`
+    faq_ids : List[int]
+        faq_id for each score
+    faq_titles : List[str]
+        FAQ title for each score
+
+    Returns
+    -------
+    scoring : Dict[str, Dict]
+        Same format as `model_scoring`, i.e. dict with faq_id as key and faq title,
+        score and rank as values
+    ranked_faq_ids : List[str]
+        Keys of `scoring` from highest to lowest score, FAQs with the same score by
+        faq_id (see `rank_by_score`)
+    """
+    scores = decode_scores(scores)
+    if len(scores) != len(faq_ids):
+        raise ValueError(
+            f"Got {len(scores)} scores for {len(faq_ids)} FAQs in the FAQ snapshot"
+        )
+
+    order = rank_by_score(scores, faq_ids)
+    ranks = np.argsort(order) + 1
+
+    scoring = {}
+    for faq_id, title, score, rank in zip(faq_ids, faq_titles, scores, ranks):
+        scoring[str(faq_id)] = {
+            "overall_score": str(float(score)),
+            "faq_title": title,
+            "rank": str(rank),
+        }
+    ranked_faq_ids = [str(faq_ids[i]) for i in order]
+
+    return scoring, ranked_faq_ids
@@ -0,0 +1,71 @@
+"""Listening for Postgres notifications"""
+import logging
+import select
+import time
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+
+def listen_for_notifications(
+    dsn, handlers, on_connect=None, poll_timeout=60, retry_wait=30
+):
+    """
+    Listen to Postgres channels forever, calling the channel's handler whenever
+    notifications arrive on it. Notifications arriving together on the same channel
+    only call its handler once.
+
+    Reconnects after `retry_wait` seconds if the connection fails. Meant to be run
+    in a daemon thread.
+
+    Parameters
+    ----------
+    dsn : str
+        Postgres connection string or URI
+    handlers : Dict[str, Callable[[], Any]]
+        Function to call, without arguments, for each channel to listen to
+    on_connect : Callable[[], Any], optional
+        Function to call after each (re)connection, e.g. to catch up on changes
+        missed while disconnected
+    poll_timeout : float
+        Seconds to wait for notifications before checking again
+    retry_wait : float
+        Seconds to wait before reconnecting after a failure
+    """
+    while True:
+        connection = None
+        try:
+            connection = psycopg2.connect(dsn)
+            connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                for channel in handlers:
+                    cursor.execute(
+                        sql.SQL("LISTEN {};").format(sql.Identifier(channel))
+                    )
+
+            if on_connect is not None:
+                on_connect()
+
+            while True:
+                readable, _, _ = select.select([connection], [], [], poll_timeout)
+                if not readable:
+                    continue
+
+                connection.poll()
+                channels = {notify.channel for notify in connection.notifies}
+                connection.notifies.clear()
+
+                for channel in channels:
+                    try:
+                        handlers[channel]()
+                    except Exception:
+                        logger.exception(f"Handling notification on {channel} failed")
+        except Exception:
+            logger.exception("Listening for notifications failed. Reconnecting.")
+            time.sleep(retry_wait)
+        finally:
+            if connection is not None:
+                connection.close()
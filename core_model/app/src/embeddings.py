@@ -0,0 +1,211 @@
+"""Functions for storing word embeddings compactly and pruning their vocabulary"""
+import numpy as np
+from gensim.models import KeyedVectors
+from gensim.models.fasttext import FastTextKeyedVectors
+
+STORAGE_TYPES = ["float32", "float16", "int8"]
+
+
+def _row_norms(vectors, scales=None, chunk_size=100000):
+    """
+    Compute float32 L2 norms of each row of `vectors`, in chunks so that
+    upcasting a compact matrix never materialises a full float32 copy.
+    """
+    norms = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start : start + chunk_size].astype(np.float32)
+        norms[start : start + chunk_size] = np.linalg.norm(chunk, axis=1)
+
+    if scales is not None:
+        norms *= scales
+
+    return norms
+
+
+def _cast(vectors, dtype, chunk_size=100000):
+    """
+    Copy `vectors` as `dtype`, in chunks so that a memory-mapped matrix is read a
+    chunk at a time rather than all at once.
+    """
+    cast = np.empty(vectors.shape, dtype=dtype)
+    for start in range(0, len(vectors), chunk_size):
+        cast[start : start + chunk_size] = vectors[start : start + chunk_size]
+
+    return cast
+
+
+def _quantize_int8(vectors, chunk_size=100000):
+    """
+    Quantize each row of `vectors` to int8 with a per-row float32 scale, in chunks
+    to avoid float32 temporaries the size of the full matrix.
+    """
+    quantized = np.empty(vectors.shape, dtype=np.int8)
+    scales = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start : start + chunk_size].astype(np.float32)
+        chunk_scales = np.abs(chunk).max(axis=1) / 127
+        chunk_scales[chunk_scales == 0] = 1
+        quantized[start : start + chunk_size] = np.rint(chunk / chunk_scales[:, None])
+        scales[start : start + chunk_size] = chunk_scales
+
+    return quantized, scales
+
+
+class Float16KeyedVectors(KeyedVectors):
+    """
+    KeyedVectors storing vectors as float16. Vectors are upcast to float32 as they
+    are looked up, so similarities are computed in float32.
+    """
+
+    def get_vector(self, key, norm=False):
+        """Get the float32 vector for `key`"""
+        return super().get_vector(key, norm=norm).astype(np.float32)
+
+    def fill_norms(self, force=False):
+        """Compute float32 norms of all vectors, if not already computed"""
+        if self.norms is None or force:
+            self.norms = _row_norms(self.vectors)
+
+
+class Float16FastTextKeyedVectors(FastTextKeyedVectors):
+    """
+    FastTextKeyedVectors storing vectors and n-gram vectors as float16. Vectors
+    are upcast to float32 as they are looked up.
+    """
+
+    def get_vector(self, word, norm=False):
+        """Get the float32 vector for `word`"""
+        return super().get_vector(word, norm=norm).astype(np.float32)
+
+    def fill_norms(self, force=False):
+        """Compute float32 norms of all vectors, if not already computed"""
+        if self.norms is None or force:
+            self.norms = _row_norms(self.vectors)
+
+
+class Int8KeyedVectors(KeyedVectors):
+    """
+    KeyedVectors storing vectors quantized to int8 with one float32 scale per
+    vector (`vector ~= vectors[i] * scales[i]`). Vectors are dequantized to float32
+    as they are looked up, so similarities are computed in float32.
+
+    Methods that read `self.vectors` directly in bulk (e.g. `most_similar`) are not
+    supported.
+    """
+
+    def get_vector(self, key, norm=False):
+        """Get the dequantized float32 vector for `key`"""
+        index = self.get_index(key)
+        result = self.vectors[index].astype(np.float32) * self.scales[index]
+        if norm:
+            self.fill_norms()
+            result /= self.norms[index]
+
+        result.setflags(write=False)
+        return result
+
+    def fill_norms(self, force=False):
+        """Compute float32 norms of all dequantized vectors, if not already computed"""
+        if self.norms is None or force:
+            self.norms = _row_norms(self.vectors, self.scales)
+
+
+COMPACT_CLASSES = {
+    "float16": (Float16KeyedVectors, Float16FastTextKeyedVectors),
+    "int8": (Int8KeyedVectors,),
+}
+
+
+def compress_word_embeddings(model, storage):
+    """
+    Return a copy of `model` with vectors stored as `storage`.
+
+    The compact vectors are a new array in the memory of the process that runs
+    this, even if `model` is memory-mapped. The app runs it once while loading the
+    model, before gunicorn forks the workers with `--preload`, so the workers share
+    the copy. To skip the conversion (and its peak memory) on every boot, save the
+    compact model once with `save_compact_model.py` and load it as a memory-mapped
+    `kv` model: a model already stored as `storage` is returned as is.
+
+    Parameters
+    ----------
+    model : KeyedVectors
+        Word embeddings, e.g. as returned by `load_word_embeddings_bin`
+    storage : str
+        One of `STORAGE_TYPES`. "float16" halves and "int8" quarters the memory used
+        by the vectors. "int8" is not supported for fasttext models.
+
+    Returns
+    -------
+    KeyedVectors
+        `model` itself if `storage` is "float32" or `model` is already stored as
+        `storage`, otherwise a new object sharing the vocabulary of `model`
+    """
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Invalid `storage`! Choose from {STORAGE_TYPES}")
+
+    if storage == "float32" or isinstance(model, COMPACT_CLASSES[storage]):
+        return model
+
+    is_fasttext = isinstance(model, FastTextKeyedVectors)
+
+    if storage == "float16":
+        compact_class = (
+            Float16FastTextKeyedVectors if is_fasttext else Float16KeyedVectors
+        )
+        compact_model = compact_class.__new__(compact_class)
+        compact_model.__dict__.update(model.__dict__)
+        compact_model.vectors = _cast(model.vectors, np.float16)
+        if is_fasttext:
+            compact_model.vectors_vocab = _cast(model.vectors_vocab, np.float16)
+            compact_model.vectors_ngrams = _cast(model.vectors_ngrams, np.float16)
+    else:
+        if is_fasttext:
+            raise ValueError("int8 storage is not supported for fasttext models")
+
+        compact_model = Int8KeyedVectors.__new__(Int8KeyedVectors)
+        compact_model.__dict__.update(model.__dict__)
+        compact_model.vectors, compact_model.scales = _quantize_int8(model.vectors)
+
+    compact_model.norms = None
+
+    return compact_model
+
+
+def prune_keyed_vectors(model, top_n, words_to_keep=()):
+    """
+    Return a copy of `model` with only its first `top_n` words, plus every word in
+    `words_to_keep` that `model` contains.
+
+    Word2vec files list words from most to least frequent, so for pretrained models
+    the first `top_n` words are the most frequent ones.
+
+    Parameters
+    ----------
+    model : KeyedVectors
+        Word embeddings. Fasttext models are not supported, since their vectors for
+        out-of-vocabulary words come from n-grams rather than the vocabulary.
+    top_n : int
+        Number of words to keep from the start of the vocabulary
+    words_to_keep : Iterable[str], optional
+        Words to keep regardless of their position in the vocabulary
+
+    Returns
+    -------
+    KeyedVectors
+    """
+    if isinstance(model, FastTextKeyedVectors):
+        raise ValueError("Pruning is not supported for fasttext models")
+
+    keys = list(model.index_to_key[:top_n])
+    extra_keys = {
+        word
+        for word in words_to_keep
+        if model.has_index_for(word) and model.get_index(word) >= top_n
+    }
+    keys += sorted(extra_keys, key=model.get_index)
+
+    pruned_model = KeyedVectors(model.vector_size, dtype=model.vectors.dtype)
+    pruned_model.add_vectors(keys, model.vectors[[model.get_index(k) for k in keys]])
+
+    return pruned_model
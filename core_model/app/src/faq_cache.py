@@ -0,0 +1,104 @@
+"""Caching of FAQ processing between refreshes"""
+
+
+class FAQTokenCache:
+    """
+    Tokenizer that caches the tokens of FAQ contents, so that refreshing FAQs only
+    tokenizes the FAQs that were added or changed since the last refresh.
+
+    Use an instance as the faqt model's tokenizer: calls on the content of a cached
+    FAQ return the cached tokens, and any other text (e.g. inbound messages) is
+    passed to the wrapped tokenizer.
+
+    Models that look up the word vectors of contents themselves (see
+    `VectorizedScorer.set_contents`) can also keep them here, with
+    `set_content_vectors`, so that they are only looked up again for FAQs added or
+    changed since. Vectors depend on the model's word embeddings and glossary, so a
+    cache must only be shared by models with the same ones (a new cache is created
+    whenever the language context changes).
+
+    Parameters
+    ----------
+    tokenizer : Callable[[str], List[str]]
+        The tokenizer to wrap
+    """
+
+    def __init__(self, tokenizer):
+        """Create an empty cache for `tokenizer`"""
+        self.tokenizer = tokenizer
+        self._faq_tokens = {}
+        self._tokens_by_content = {}
+        self._vectors_by_content = {}
+
+    def __call__(self, text):
+        """Tokenize `text`, using cached tokens if `text` is a cached FAQ content"""
+        tokens = self._tokens_by_content.get(text)
+        if tokens is None:
+            return self.tokenizer(text)
+
+        # Return a copy so callers can't modify the cached tokens
+        return list(tokens)
+
+    def get_content_vectors(self, content):
+        """
+        Cached tokens with a vector and word vectors of `content`, as set with
+        `set_content_vectors`, or None
+        """
+        return self._vectors_by_content.get(content)
+
+    def set_content_vectors(self, content, tokens, vectors):
+        """
+        Cache the `tokens` with a vector and the word `vectors` of `content`, if it
+        is the content of a cached FAQ
+        """
+        if content in self._tokens_by_content:
+            self._vectors_by_content[content] = (tokens, vectors)
+
+    def update(self, faqs):
+        """
+        Cache tokens for `faqs`, only tokenizing FAQs that are new or changed since
+        the last update (by `faq_id`, `faq_updated_utc` and content). The word
+        vectors of new or changed FAQs, and FAQs no longer in `faqs`, are dropped
+        from the cache.
+
+        Parameters
+        ----------
+        faqs : List[FAQ]
+            A list of FAQ ORM objects
+
+        Returns
+        -------
+        int
+            Number of FAQs that were tokenized
+        """
+        faq_tokens = {}
+        n_tokenized = 0
+
+        for faq in faqs:
+            version = (faq.faq_updated_utc, faq.faq_content_to_send)
+            cached = self._faq_tokens.get(faq.faq_id)
+
+            if cached is not None and cached[0] == version:
+                faq_tokens[faq.faq_id] = cached
+            else:
+                tokens = self.tokenizer(faq.faq_content_to_send)
+                faq_tokens[faq.faq_id] = (version, tokens)
+                n_tokenized += 1
+
+        # Contents of FAQs kept as they were, whose vectors are still valid
+        unchanged_contents = {
+            cached[0][1]
+            for faq_id, cached in faq_tokens.items()
+            if self._faq_tokens.get(faq_id) is cached
+        }
+        self._vectors_by_content = {
+            content: self._vectors_by_content[content]
+            for content in unchanged_contents
+            if content in self._vectors_by_content
+        }
+        self._faq_tokens = faq_tokens
+        self._tokens_by_content = {
+            content: tokens for (_, content), tokens in faq_tokens.values()
+        }
+
+        return n_tokenized
@@ -0,0 +1,102 @@
+"""Immutable snapshot of the state used to match messages to FAQs"""
+import hashlib
+import json
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class FAQSnapshot:
+    """
+    Everything needed to match a message to FAQs, built together and never modified
+    afterwards.
+
+    Refreshes build a new snapshot and swap it in with a single assignment to
+    `app.faq_snapshot`, so a request that reads `app.faq_snapshot` once always sees
+    FAQs, model contents, weights and contextualizer that belong together, even
+    with several threads serving requests while a refresh runs.
+
+    Parameters
+    ----------
+    faqs : Tuple[FAQ]
+        FAQ ORM objects, sorted by `faq_id`, with `faq_weight_share` set. Same order
+        as the contents of `faqt_model`
+    faqt_model : faqt.WMDScorer or VectorizedScorer
+        Model with the FAQs set as contents. Only call its read-only methods (e.g.
+        `score_contents`)
+    contextualizer : Contextualization or None
+        Contextualization for the FAQs, or None if contextualization is not active
+    language_context : LanguageContextModel or None
+        The language context the model was built with
+    tokenizer : Callable[[str], List[str]]
+        The tokenizer the model was built with
+    content_state : List[Tuple[int, float]] or None
+        `(faq_id, faq_weight_share)` of the FAQs, or None if FAQs were never loaded
+    version : tuple or None
+        FAQ table version (see `get_faq_version`) the FAQs were loaded at
+    """
+
+    faqs: Tuple[Any, ...]
+    faqt_model: Any
+    contextualizer: Any = None
+    language_context: Any = None
+    tokenizer: Any = None
+    content_state: Optional[list] = None
+    version: Optional[tuple] = None
+    faqs_by_id: Mapping[int, Any] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        """Store `faqs` as a tuple and index them by `faq_id`"""
+        faqs = tuple(self.faqs)
+        object.__setattr__(self, "faqs", faqs)
+        object.__setattr__(
+            self,
+            "faqs_by_id",
+            MappingProxyType({faq.faq_id: faq for faq in faqs}),
+        )
+
+    @cached_property
+    def content_hash(self):
+        """
+        Hash of the faq_ids and titles of the FAQs, in order. Identifies what a
+        stored array of scores (see `src/compact_scoring.py`) refers to
+        """
+        faq_keys = [[faq.faq_id, faq.faq_title] for faq in self.faqs]
+        return hashlib.sha256(json.dumps(faq_keys).encode("utf-8")).hexdigest()
+
+    @property
+    def language_context_version(self):
+        """
+        Identifies the language context (glossary, entities and tags guiding typos)
+        the model was built with, or None if there is none. See
+        `get_language_context_version`
+        """
+        return get_language_context_version(self.language_context)
+
+    def replace(self, **changes):
+        """Return a new snapshot with the given fields replaced"""
+        return replace(self, **changes)
+
+
+def get_language_context_version(language_context):
+    """
+    Hash of the id, version and content (glossary, entities and tags guiding
+    typos) of `language_context`, so that it changes even if the content is edited
+    without updating `config_updated_utc`. None if there is no language context
+    """
+    if language_context is None:
+        return None
+
+    language_context_keys = [
+        language_context.contextualization_id,
+        language_context.version_id,
+        str(language_context.config_updated_utc),
+        language_context.custom_wvs,
+        language_context.pairwise_triplewise_entities,
+        language_context.tag_guiding_typos,
+    ]
+    return hashlib.sha256(
+        json.dumps(language_context_keys, sort_keys=True).encode("utf-8")
+    ).hexdigest()
@@ -0,0 +1,265 @@
+"""
+Manage the monthly range partitions (on `inbound_utc`) of the `inbounds` table.
+
+DDL can't take bind parameters, so it is composed with `psycopg2.sql`, which quotes
+partition names as identifiers and partition bounds as literals
+"""
+import gzip
+import os
+import re
+from datetime import datetime
+
+from psycopg2 import sql
+from sqlalchemy import text
+
+DEFAULT_PARTITION = "inbounds_default"
+
+GET_PARTITION_BOUNDS = text(
+    "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+    "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "WHERE pg_inherits.inhparent = 'inbounds'::regclass"
+)
+UPPER_BOUND_PATTERN = re.compile(r"TO \('([^']+)'\)")
+
+
+def add_months(timestamp, months):
+    """
+    First day of the month `months` months after that of `timestamp`
+
+    Parameters
+    ----------
+    timestamp : datetime.datetime
+    months : int
+        Can be negative
+
+    Returns
+    -------
+    datetime.datetime
+    """
+    month_index = timestamp.year * 12 + timestamp.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_partition_name(month_start):
+    """Name of the partition for the month starting at `month_start`"""
+    return f"inbounds_y{month_start.year}m{month_start.month:02d}"
+
+
+def parse_upper_bound(partition_bound):
+    """
+    Upper bound (exclusive) of a partition, from its bound expression, e.g.
+    "FOR VALUES FROM ('2023-05-01 00:00:00') TO ('2023-06-01 00:00:00')". None for
+    the default partition
+    """
+    match = UPPER_BOUND_PATTERN.search(partition_bound)
+    if match is None:
+        return None
+    return datetime.fromisoformat(match.group(1))
+
+
+def get_partitions(connection):
+    """
+    Get the range partitions of `inbounds`, excluding the default partition
+
+    Parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+
+    Returns
+    -------
+    List[Tuple[str, datetime.datetime]]
+        `(partition_name, upper_bound)` of each partition, sorted by upper bound
+    """
+    partitions = []
+    for partition_name, partition_bound in connection.execute(GET_PARTITION_BOUNDS):
+        upper_bound = parse_upper_bound(partition_bound)
+        if upper_bound is not None:
+            partitions.append((partition_name, upper_bound))
+
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partitions(connection, months_ahead, now=None):
+    """
+    Create monthly partitions of `inbounds`, continuing from the last existing
+    partition, until the month `months_ahead` months after the current one is
+    covered.
+
+    Inbounds in the default partition that fall in a new partition's range are
+    moved into it (otherwise Postgres refuses to create the partition).
+
+    Parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Should be in a transaction, so that partitions are created all or nothing
+    months_ahead : int
+    now : datetime.datetime, optional
+        Defaults to the current UTC time
+
+    Returns
+    -------
+    List[str]
+        Names of the partitions created
+    """
+    now = now or datetime.utcnow()
+    end = add_months(now, months_ahead + 1)
+
+    partitions = get_partitions(connection)
+    start = partitions[-1][1] if partitions else add_months(now, 0)
+
+    created = []
+    while start < end:
+        month_end = add_months(start, 1)
+        partition_name = get_partition_name(start)
+        create_partition(connection, partition_name, start, month_end)
+        created.append(partition_name)
+        start = month_end
+
+    return created
+
+
+def create_partition(connection, partition_name, start, end):
+    """
+    Create the partition `partition_name` of `inbounds` for `start` <= inbound_utc <
+    `end`, moving any matching inbounds out of the default partition
+    """
+    default_partition = sql.Identifier(DEFAULT_PARTITION)
+    bounds = {"start": start, "end": end}
+    rows_in_default = execute_sql(
+        connection,
+        sql.SQL(
+            "SELECT EXISTS (SELECT 1 FROM {} "
+            "WHERE inbound_utc >= %(start)s AND inbound_utc < %(end)s)"
+        ).format(default_partition),
+        bounds,
+    )[0]
+
+    if rows_in_default:
+        execute_sql(
+            connection,
+            sql.SQL("ALTER TABLE inbounds DETACH PARTITION {}").format(
+                default_partition
+            ),
+        )
+
+    execute_sql(
+        connection,
+        sql.SQL(
+            "CREATE TABLE {} PARTITION OF inbounds FOR VALUES FROM ({}) TO ({})"
+        ).format(
+            sql.Identifier(partition_name),
+            sql.Literal(start.isoformat()),
+            sql.Literal(end.isoformat()),
+        ),
+    )
+
+    if rows_in_default:
+        execute_sql(
+            connection,
+            sql.SQL(
+                "WITH moved AS (DELETE FROM {} "
+                "WHERE inbound_utc >= %(start)s AND inbound_utc < %(end)s "
+                "RETURNING *) "
+                "INSERT INTO inbounds SELECT * FROM moved"
+            ).format(default_partition),
+            bounds,
+        )
+        execute_sql(
+            connection,
+            sql.SQL("ALTER TABLE inbounds ATTACH PARTITION {} DEFAULT").format(
+                default_partition
+            ),
+        )
+
+
+def archive_partitions(engine, before, output_dir, drop=True):
+    """
+    Detach the partitions of `inbounds` that only hold inbounds from before
+    `before`, export each to `<output_dir>/<partition_name>.csv.gz` and drop it.
+
+    Each partition is handled in its own transaction, so a failed export leaves
+    that partition attached.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+    before : datetime.datetime
+    output_dir : str
+    drop : bool, default True
+        Drop the partitions once exported. If False, they are kept as standalone
+        tables
+
+    Returns
+    -------
+    List[str]
+        Paths of the exported files
+    """
+    with engine.connect() as connection:
+        partitions = get_partitions(connection)
+
+    os.makedirs(output_dir, exist_ok=True)
+    exported = []
+    for partition_name, upper_bound in partitions:
+        if upper_bound > before:
+            break
+
+        output_path = os.path.join(output_dir, f"{partition_name}.csv.gz")
+        with engine.begin() as connection:
+            partition = sql.Identifier(partition_name)
+            execute_sql(
+                connection,
+                sql.SQL("ALTER TABLE inbounds DETACH PARTITION {}").format(partition),
+            )
+            export_table(connection, partition_name, output_path)
+            if drop:
+                execute_sql(connection, sql.SQL("DROP TABLE {}").format(partition))
+        exported.append(output_path)
+
+    return exported
+
+
+def export_table(connection, table_name, output_path):
+    """
+    Write the rows of `table_name` to `output_path` as gzipped CSV (with header).
+    Written to a temporary file first, so `output_path` is only ever complete
+    """
+    temporary_path = f"{output_path}.tmp"
+    cursor = connection.connection.cursor()
+    try:
+        with gzip.open(temporary_path, "wb") as output_file:
+            cursor.copy_expert(
+                sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)")
+                .format(sql.Identifier(table_name))
+                .as_string(cursor),
+                output_file,
+            )
+    finally:
+        cursor.close()
+    os.replace(temporary_path, output_path)
+
+
+def execute_sql(connection, query, params=None):
+    """
+    Execute `query` on the database connection underlying `connection`
+
+    Parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Should be in a transaction, which commits `query` with it
+    query : psycopg2.sql.Composable
+    params : Dict, optional
+        Values of the `%(name)s` placeholders of `query`
+
+    Returns
+    -------
+    Tuple or None
+        The first row returned by `query`, if it returns rows
+    """
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(query, params)
+        if cursor.description is None:
+            return None
+        return cursor.fetchone()
+    finally:
+        cursor.close()
@@ -0,0 +1,337 @@
+"""Write-behind persistence of inbound messages"""
+import atexit
+import base64
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import text
+
+from ..data_models import Inbound
+from ..database_sqlalchemy import db
+from ..prometheus_metrics import (
+    inbound_write_failures,
+    inbound_write_flush_seconds,
+    inbound_write_queue_depth,
+)
+
+logger = logging.getLogger(__name__)
+
+RESERVE_INBOUND_IDS = text(
+    "SELECT nextval(pg_get_serial_sequence('inbounds', 'inbound_id')) "
+    "FROM generate_series(1, :n_ids)"
+)
+
+
+class InboundIdAllocator:
+    """
+    Hands out inbound ids from blocks reserved from the `inbounds` id sequence, so
+    that only one in `block_size` ids costs a database round trip.
+
+    Ids are unique across workers, but not in order of arrival across workers, and
+    ids reserved but unused when a worker exits are skipped.
+
+    Parameters
+    ----------
+    block_size : int
+        Number of ids to reserve at once
+    """
+
+    def __init__(self, block_size):
+        """Create an allocator with no ids reserved yet"""
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._ids = deque()
+
+    def next_id(self):
+        """Get an unused inbound id, reserving a new block if needed"""
+        with self._lock:
+            # Ids reserved before forking would be shared by all workers
+            if self._pid != os.getpid():
+                self._ids.clear()
+                self._pid = os.getpid()
+            if not self._ids:
+                self._ids.extend(self._reserve())
+
+            return self._ids.popleft()
+
+    def _reserve(self):
+        """Reserve `block_size` ids from the sequence, in one query"""
+        return (
+            db.session.execute(RESERVE_INBOUND_IDS, {"n_ids": self.block_size})
+            .scalars()
+            .all()
+        )
+
+
+class InboundWriter:
+    """
+    Buffers inbound rows and inserts them in batches from a background thread, so
+    that `/inbound/check` can respond without waiting on the insert.
+
+    Inbound ids are taken from blocks of ids reserved from the `inbounds` id
+    sequence (see `InboundIdAllocator`), so they can be returned before the row is
+    written. Rows are written with one
+    multi-row INSERT per batch of up to `batch_size` rows, at least every
+    `flush_interval` seconds. If the queue is full, `submit` blocks until there is
+    room, so a slow database slows requests down rather than dropping rows. Remaining
+    rows are written when the process exits (see `stop`).
+
+    A batch that fails to be written is retried up to `max_retries` times, waiting
+    `retry_wait` seconds and twice as long before each further retry, then written
+    row by row so that a bad row doesn't hold back the others. Rows that still
+    can't be written are appended to `dead_letter_path` (see `save_dead_letters`),
+    from which they can be written again later (`flask inbounds replay-failed`).
+
+    The background thread is started on the first `submit` in each process, so
+    the writer can be created before gunicorn forks workers.
+
+    Parameters
+    ----------
+    app : Flask
+        App to get database connections from
+    max_queue_size : int
+        Maximum number of rows waiting to be written
+    batch_size : int
+        Maximum number of rows per INSERT
+    flush_interval : float
+        Maximum number of seconds a row waits before being written
+    id_block_size : int, optional
+        Number of inbound ids to reserve from the sequence at once. Default 1
+    max_retries : int, optional
+        Number of times a failed batch is retried before writing it row by row.
+        Default 3
+    retry_wait : float, optional
+        Seconds to wait before the first retry, doubled for each further retry.
+        Default 1
+    dead_letter_path : str, optional
+        File to append rows that can't be written to. Default
+        `failed_inbounds.jsonl` in the working directory
+    """
+
+    def __init__(
+        self,
+        app,
+        max_queue_size,
+        batch_size,
+        flush_interval,
+        id_block_size=1,
+        max_retries=3,
+        retry_wait=1,
+        dead_letter_path="failed_inbounds.jsonl",
+    ):
+        """Create the writer. The background thread is started on `submit`"""
+        self.app = app
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.id_allocator = InboundIdAllocator(id_block_size)
+        self.max_retries = max_retries
+        self.retry_wait = retry_wait
+        self.dead_letter_path = dead_letter_path
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def next_inbound_id(self):
+        """Get an id for a new inbound"""
+        return self.id_allocator.next_id()
+
+    def submit(self, row):
+        """
+        Queue `row` (a dict of `Inbound` column values, including `inbound_id`) to
+        be written
+        """
+        self._start()
+        self._queue.put(row)
+        inbound_write_queue_depth.set(self._queue.qsize())
+
+    def flush(self):
+        """Block until every row submitted so far is written (or failed)"""
+        if self._is_running():
+            self._queue.join()
+
+    def stop(self):
+        """Write any remaining rows and stop the background thread"""
+        if not self._is_running():
+            return
+
+        self._queue.put(None)
+        self._thread.join()
+
+    def _is_running(self):
+        """Whether the background thread was started in this process"""
+        return self._pid == os.getpid() and self._thread.is_alive()
+
+    def _start(self):
+        """Start the background thread, if not yet started in this process"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._thread = threading.Thread(
+                target=self._run, name="inbound-writer", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def _run(self):
+        """Write queued rows in batches until `stop` is called"""
+        stopping = False
+        while not stopping:
+            try:
+                row = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            rows = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if row is None:
+                    stopping = True
+                    self._queue.task_done()
+                else:
+                    rows.append(row)
+                if stopping or len(rows) >= self.batch_size:
+                    break
+                try:
+                    row = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            if rows:
+                self._write(rows)
+                for _ in rows:
+                    self._queue.task_done()
+            inbound_write_queue_depth.set(self._queue.qsize())
+
+    def _write(self, rows):
+        """
+        Insert `rows` with a single multi-row INSERT, retrying with backoff, then
+        row by row. Rows that still fail are saved to `dead_letter_path`
+        """
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt > 0:
+                    time.sleep(self.retry_wait * 2 ** (attempt - 1))
+                try:
+                    self._insert(rows)
+                    return
+                except Exception:
+                    logger.warning(
+                        f"Failed to write {len(rows)} inbounds "
+                        f"(attempt {attempt + 1} of {self.max_retries + 1})",
+                        exc_info=True,
+                    )
+
+            failed_rows = []
+            for row in rows:
+                try:
+                    self._insert([row])
+                except Exception:
+                    logger.exception(f"Failed to write inbound {row['inbound_id']}")
+                    failed_rows.append(row)
+
+            if failed_rows:
+                inbound_write_failures.inc(len(failed_rows))
+                self._save_failed(failed_rows)
+        finally:
+            inbound_write_flush_seconds.observe(time.perf_counter() - start)
+
+    def _insert(self, rows):
+        """Insert `rows` in one transaction"""
+        with self.app.app_context():
+            try:
+                db.session.execute(Inbound.__table__.insert(), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _save_failed(self, rows):
+        """Save `rows` to `dead_letter_path`, or log them if that fails too"""
+        try:
+            save_dead_letters(rows, self.dead_letter_path)
+        except Exception:
+            logger.exception(
+                f"Could not save inbounds to {self.dead_letter_path}: "
+                f"{dumps_dead_letters(rows)}"
+            )
+        else:
+            logger.error(
+                f"Saved {len(rows)} inbounds that couldn't be written to "
+                f"{self.dead_letter_path}"
+            )
+
+
+def dumps_dead_letters(rows):
+    """
+    Serialize `rows` as JSON lines, with datetimes and bytes (e.g. compact scores)
+    tagged so that `loads_dead_letters` restores them
+    """
+
+    def encode(value):
+        """Tag values that JSON can't represent"""
+        if isinstance(value, datetime):
+            return {"$datetime": value.isoformat()}
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return {"$bytes": base64.b64encode(bytes(value)).decode("ascii")}
+        raise TypeError(f"Cannot serialize {type(value)}")
+
+    return "".join(json.dumps(row, default=encode) + "\n" for row in rows)
+
+
+def loads_dead_letters(lines):
+    """Rows serialized with `dumps_dead_letters`, one per line of `lines`"""
+
+    def decode(value):
+        """Restore values tagged by `dumps_dead_letters`"""
+        if value.keys() == {"$datetime"}:
+            return datetime.fromisoformat(value["$datetime"])
+        if value.keys() == {"$bytes"}:
+            return base64.b64decode(value["$bytes"])
+        return value
+
+    return [json.loads(line, object_hook=decode) for line in lines if line.strip()]
+
+
+def save_dead_letters(rows, path):
+    """Append `rows` to the dead letter file at `path`"""
+    with open(path, "a") as dead_letter_file:
+        dead_letter_file.write(dumps_dead_letters(rows))
+        dead_letter_file.flush()
+        os.fsync(dead_letter_file.fileno())
+
+
+def replay_dead_letters(path):
+    """
+    Insert the rows saved to the dead letter file at `path`, in one transaction.
+    The file is left in place, to be removed once the rows are written
+
+    Returns
+    -------
+    int
+        Number of rows inserted
+    """
+    with open(path) as dead_letter_file:
+        rows = loads_dead_letters(dead_letter_file)
+
+    if rows:
+        db.session.execute(Inbound.__table__.insert(), rows)
+        db.session.commit()
+
+    return len(rows)
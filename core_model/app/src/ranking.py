@@ -0,0 +1,38 @@
+"""Ordering of FAQs by score"""
+import numpy as np
+
+
+def rank_by_score(scores, faq_ids, n_top=None):
+    """
+    Indices of `scores` from highest to lowest score, FAQs with the same score
+    ordered by `faq_id`. Every ranking of FAQs uses this order, so that pages of an
+    inbound list FAQs in the same order whichever way its scores were stored.
+
+    Parameters
+    ----------
+    scores : Sequence[float]
+        Score of each FAQ
+    faq_ids : Sequence[int]
+        faq_id of each FAQ
+    n_top : int, optional
+        Only order the `n_top` highest scoring FAQs (found with `np.partition`).
+        Default order all FAQs
+
+    Returns
+    -------
+    np.ndarray
+        Indices of the (top) FAQs, in order
+    """
+    scores = np.asarray(scores, dtype=float)
+    faq_ids = np.asarray(faq_ids, dtype=np.int64)
+    indices = np.arange(len(scores))
+
+    if n_top is not None and n_top < len(scores):
+        # Keep all FAQs tied with the n-th highest score, to choose among them by
+        # faq_id
+        nth_highest = -np.partition(-scores, n_top - 1)[n_top - 1]
+        indices = indices[scores >= nth_highest]
+
+    order = indices[np.lexsort((faq_ids[indices], -scores[indices]))]
+
+    return order[:n_top]
@@ -0,0 +1,64 @@
+"""
+Save a compact copy of a word embedding model, with vectors stored as `--storage`
+(see `src/embeddings.py`), in gensim-native format (model type `kv`) in the same
+folder as the original model.
+
+Loaded as a `kv` model, the compact vectors are memory-mapped and shared between
+all processes through the OS page cache, instead of being converted into the
+memory of the process on every boot. Set the same `storage` on the compact model
+in `data_sources.yml`.
+
+Run e.g.
+
+    python save_compact_model.py google_news_pretrained_mmap --storage float16
+"""
+import argparse
+from pathlib import Path
+
+from app.src.embeddings import STORAGE_TYPES, compress_word_embeddings
+from app.src.utils import load_data_sources, load_word_embeddings_bin
+
+
+def parse_args():
+    """Parses arguments for the script."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "model",
+        help="Name of the model to compress, as in `data_sources.yml`",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=[storage for storage in STORAGE_TYPES if storage != "float32"],
+        default="float16",
+        help="How to store the vectors",
+    )
+    parser.add_argument(
+        "--output",
+        help="Filename of the compact model. Default `<model filename>-<storage>.kv`",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    data_source = load_data_sources(args.model)
+    model = load_word_embeddings_bin(
+        data_source["folder"], data_source["filename"], data_source["type"]
+    )
+    compact_model = compress_word_embeddings(model, args.storage)
+
+    output_filename = (
+        args.output or f"{Path(data_source['filename']).stem}-{args.storage}.kv"
+    )
+    output_path = (
+        Path(__file__).parents[3] / "data" / data_source["folder"] / output_filename
+    )
+    # `sep_limit=0` saves the vectors (and int8 scales) in their own `.npy` files,
+    # to be memory-mapped
+    compact_model.save(str(output_path), sep_limit=0)
+
+    print(f"Saved {len(compact_model)} words as {args.storage} to {output_path}")
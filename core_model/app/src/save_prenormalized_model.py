@@ -1,3 +1,12 @@
+"""
+Create the prenormalized GoogleNews model used by the app.
+
+Writes two copies of the prenormalized vectors:
+- `GoogleNews-vectors-negative300-prenorm.bin`: word2vec binary (`w2v` type)
+- `GoogleNews-vectors-negative300-prenorm.kv`: gensim-native KeyedVectors with the
+  vector matrix in a separate `.npy` file (`kv` type), which the app memory-maps
+  instead of parsing on every boot.
+"""
 import os
 import sys
 
@@ -14,3 +23,9 @@ if __name__ == "__main__":
         "../data/pretrained_wv_models/GoogleNews-vectors-negative300-prenorm.bin",
         binary=True,
     )
+    # `sep_limit=0` forces every array into its own `.npy` file, so that they can
+    # all be memory-mapped on load
+    model.save(
+        "../data/pretrained_wv_models/GoogleNews-vectors-negative300-prenorm.kv",
+        sep_limit=0,
+    )
@@ -0,0 +1,100 @@
+"""
+Create a pruned copy of a word embedding model, keeping only the `--top-n` most
+frequent words plus every word needed for the FAQs and the active language context
+(glossary and tags guiding typos) currently in the database.
+
+The pruned model is saved in gensim-native format (model type `kv`) in the same
+folder as the original model. Since words outside the kept vocabulary can no longer
+be matched or validated as tags, rebuild it when FAQs or the language context
+change.
+
+Run with the database environment variables set, e.g.
+
+    python save_pruned_model.py google_news_pretrained --top-n 200000
+"""
+import argparse
+from pathlib import Path
+
+from app import create_app, get_text_preprocessor, load_language_context
+from app.data_models import FAQModel
+from app.src.embeddings import prune_keyed_vectors
+from app.src.utils import load_data_sources, load_word_embeddings_bin
+
+
+def parse_args():
+    """Parses arguments for the script."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "model",
+        help="Name of the model to prune, as in `data_sources.yml`",
+    )
+    parser.add_argument(
+        "--top-n",
+        type=int,
+        default=200000,
+        help="Number of most frequent words to keep",
+    )
+    parser.add_argument(
+        "--output",
+        help="Filename of the pruned model. Default `<model filename>-pruned.kv`",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+def word_variants(word):
+    """Casings under which a word may be looked up in the model"""
+    return {word, word.lower(), word.capitalize(), word.upper()}
+
+
+def get_words_to_keep(app):
+    """
+    Get words appearing in the FAQs, the glossary and the tags guiding typos
+    """
+    language_context = load_language_context(app)
+    custom_wvs = language_context.custom_wvs if language_context else {}
+    pairwise = language_context.pairwise_triplewise_entities if language_context else {}
+    tags_guiding_typos = language_context.tag_guiding_typos if language_context else []
+
+    with app.app_context():
+        faqs = FAQModel.query.all()
+
+    tokenizer = get_text_preprocessor(pairwise)
+    words = set(tags_guiding_typos)
+    for word_weights in custom_wvs.values():
+        words.update(word_weights.keys())
+    for faq in faqs:
+        texts = [faq.faq_title, faq.faq_content_to_send] + (faq.faq_questions or [])
+        words.update(faq.faq_tags or [])
+        for text in texts:
+            words.update(tokenizer(text))
+
+    return {variant for word in words for variant in word_variants(word)}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    data_source = load_data_sources(args.model)
+    model = load_word_embeddings_bin(
+        data_source["folder"], data_source["filename"], data_source["type"]
+    )
+
+    app = create_app()
+    words_to_keep = get_words_to_keep(app)
+    pruned_model = prune_keyed_vectors(model, args.top_n, words_to_keep)
+
+    output_filename = args.output or f"{Path(data_source['filename']).stem}-pruned.kv"
+    output_path = (
+        Path(__file__).parents[3] / "data" / data_source["folder"] / output_filename
+    )
+    # `sep_limit=0` saves the vectors in their own `.npy` file, to be memory-mapped
+    pruned_model.save(str(output_path), sep_limit=0)
+
+    print(
+        f"Saved {len(pruned_model)} of {len(model)} words "
+        f"({len(pruned_model) - min(args.top_n, len(model))} outside the top "
+        f"{args.top_n}) to {output_path}"
+    )
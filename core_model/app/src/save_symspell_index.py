@@ -0,0 +1,77 @@
+"""
+Build the SymSpell index (see `symspell.py`) of a word embedding model's
+vocabulary, so that the app loads it at startup instead of building it.
+
+The index is saved in the same folder as the model. Set `spelling: symspell:
+index_filename` in `parameters.yml` to its filename, and build it again with the
+same `max_edit_distance`, `prefix_length` and `max_vocab_size` as set there.
+
+Run with e.g.
+
+    python save_symspell_index.py google_news_pretrained --max-vocab-size 50000
+"""
+import argparse
+from pathlib import Path
+
+from app.src.symspell import SymSpellIndex
+from app.src.utils import load_data_sources, load_parameters, load_word_embeddings_bin
+
+
+def parse_args():
+    """Parses arguments for the script."""
+    symspell_params = load_parameters("spelling")["symspell"]
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "model",
+        help="Name of the model to index, as in `data_sources.yml`",
+    )
+    parser.add_argument(
+        "--max-vocab-size",
+        type=int,
+        default=symspell_params["max_vocab_size"],
+        help="Number of most frequent words to index",
+    )
+    parser.add_argument(
+        "--max-edit-distance",
+        type=int,
+        default=symspell_params["max_edit_distance"],
+    )
+    parser.add_argument(
+        "--prefix-length",
+        type=int,
+        default=symspell_params["prefix_length"],
+    )
+    parser.add_argument(
+        "--output",
+        help="Filename of the index. Default `<model filename>-symspell.pkl`",
+    )
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    data_source = load_data_sources(args.model)
+    model = load_word_embeddings_bin(
+        data_source["folder"], data_source["filename"], data_source["type"]
+    )
+
+    index = SymSpellIndex.from_keyed_vectors(
+        model,
+        args.max_vocab_size,
+        max_edit_distance=args.max_edit_distance,
+        prefix_length=args.prefix_length,
+    )
+
+    output_filename = (
+        args.output or f"{Path(data_source['filename']).stem}-symspell.pkl"
+    )
+    output_path = (
+        Path(__file__).parents[3] / "data" / data_source["folder"] / output_filename
+    )
+    index.save(str(output_path))
+
+    print(f"Saved SymSpell index of {len(index)} words to {output_path}")
@@ -0,0 +1,420 @@
+"""
+Vectorized scoring of messages against FAQ contents by word vector similarities.
+
+Scores are those of faqt's `KeyedVectorsScorer` with `cs_nearest_k_percent_average`
+tag scoring and `simple_mean` score reduction: each token of a FAQ scores the mean
+of the cosine similarities of its `k` percent (at least `floor`) nearest message
+tokens, and a FAQ scores the mean of the scores of its tokens. They differ from the
+scores of faqt's `WMDScorer`, the app's default. Word vectors and spell correction
+of message tokens come from faqt's own `model_search`.
+
+Instead of scoring FAQs one at a time, the normalized vectors of the tokens of all
+FAQs are stacked into one contiguous matrix, with the offset of each FAQ's tokens
+kept aside. A message is scored against all FAQs with a single matrix product and
+reductions over the segments of each FAQ. `score_contents_batch` scores several
+messages with a single matrix product against the tokens of all their messages.
+
+With many FAQs, scoring can optionally be restricted to candidates: FAQs are first
+ranked by the cosine similarity of their centroid (the mean of their normalized
+token vectors) to the message's, and only the top `prefilter_top_m` are scored in
+full. Other FAQs get `PREFILTER_FLOOR_SCORE`, so they still have a score and rank
+below all candidates.
+"""
+import numpy as np
+from faqt.model.faq_matching.keyed_vectors_scoring import (
+    model_search,
+    model_search_word,
+)
+
+
+def add_weight(scores, weights, N=1.0):
+    """Weighted average of `scores` and `weights`, `weights` counting `N` times"""
+    return (scores + N * np.asarray(weights, dtype=scores.dtype)) / (N + 1)
+
+
+WEIGHTING_METHODS = {"add_weight": add_weight}
+SCORE_REDUCTION_METHODS = {"simple_mean"}
+
+# Score of FAQs left out by the prefilter: the lowest cosine similarity
+PREFILTER_FLOOR_SCORE = -1.0
+
+
+def get_n_nearest(n_vectors, k, floor):
+    """
+    Number of nearest vectors averaged by `cs_nearest_k_percent_average`: `k`
+    percent of `n_vectors`, at least `floor`, at most `n_vectors`
+    """
+    return min(n_vectors, max(floor, int(n_vectors * k / 100)))
+
+
+class VectorizedScorer:
+    """
+    Scores messages against contents, with the interface of the faqt scorers used
+    by the app (`set_contents` and `score_contents`).
+
+    Parameters
+    ----------
+    word_embedding_model : gensim.models.KeyedVectors
+    tokenizer : Callable[[str], List[str]]
+    weighting_method : str, optional
+        How content weights are combined with scores. Only `add_weight`
+    weighting_kwargs : Dict, optional
+    glossary : Dict, optional
+        Custom word vectors, looked up before `word_embedding_model`
+    hunspell : optional
+        Spell checker with `spell` and `suggest` methods, used by faqt's
+        `model_search` to correct message tokens that have no vector
+    tags_guiding_typos : List[str], optional
+        Spell corrections preferred over other suggestions
+    tag_scoring_kwargs : Dict, optional
+        `k` and `floor` of `cs_nearest_k_percent_average`. Default 10 and 1
+    score_reduction_method : str, default "simple_mean"
+        Only `simple_mean`
+    prefilter_top_m : int, default 0
+        Number of candidate contents scored in full, chosen by centroid similarity.
+        0 scores all contents
+    """
+
+    def __init__(
+        self,
+        word_embedding_model,
+        tokenizer,
+        weighting_method=None,
+        weighting_kwargs=None,
+        glossary=None,
+        hunspell=None,
+        tags_guiding_typos=None,
+        tag_scoring_kwargs=None,
+        score_reduction_method="simple_mean",
+        prefilter_top_m=0,
+    ):
+        """Create a scorer without contents"""
+        if weighting_method is not None and weighting_method not in WEIGHTING_METHODS:
+            raise ValueError(f"Unsupported weighting method {weighting_method}")
+        if score_reduction_method not in SCORE_REDUCTION_METHODS:
+            raise ValueError(
+                f"Unsupported score reduction method {score_reduction_method}"
+            )
+
+        self.word_embedding_model = word_embedding_model
+        self.tokenizer = tokenizer
+        self.weighting_method = weighting_method
+        self.weighting_kwargs = weighting_kwargs or {}
+        self.glossary = glossary or {}
+        self.hunspell = hunspell
+        self.tags_guiding_typos = list(tags_guiding_typos or [])
+        tag_scoring_kwargs = tag_scoring_kwargs or {}
+        self.k = tag_scoring_kwargs.get("k", 10)
+        self.floor = tag_scoring_kwargs.get("floor", 1)
+        self.prefilter_top_m = prefilter_top_m
+
+        self.contents = None
+        self.content_weights = None
+        self.content_tokens = None
+        self.content_matrix = None
+        self.content_offsets = None
+        self.content_centroids = None
+
+    @property
+    def is_set(self):
+        """Whether contents were set"""
+        return self.contents is not None
+
+    def set_contents(self, contents, weights=None):
+        """
+        Tokenize `contents` and stack the normalized vectors of their tokens (see
+        `get_content_vectors`).
+
+        Parameters
+        ----------
+        contents : List[str]
+        weights : List[float], optional
+            Weight of each content, combined with scores by `weighting_method`
+        """
+        if weights is not None and len(weights) != len(contents):
+            raise ValueError("`weights` must have one weight per content")
+
+        content_tokens = []
+        content_vectors = []
+        for content in contents:
+            tokens, vectors = self.get_content_vectors(content)
+            content_tokens.append(tokens)
+            content_vectors.append(vectors)
+
+        lengths = np.array([len(tokens) for tokens in content_tokens], dtype=int)
+        # Offsets of the first token of each content, and the end of the last one
+        self.content_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.content_matrix = np.concatenate(
+            [np.zeros((0, self.word_embedding_model.vector_size), dtype=np.float32)]
+            + content_vectors
+        )
+        self.content_centroids = normalize_rows(
+            segment_means(self.content_matrix, self.content_offsets),
+            self.word_embedding_model.vector_size,
+        )
+        self.content_tokens = content_tokens
+        self.content_weights = weights
+        self.contents = contents
+
+    def get_content_vectors(self, content):
+        """
+        Tokens of `content` that have a vector, and their normalized vectors.
+
+        If the tokenizer caches them (see `FAQTokenCache`), they are taken from and
+        kept in its cache, so refreshing contents only looks up the vectors of new
+        or changed contents
+        """
+        get_cached = getattr(self.tokenizer, "get_content_vectors", None)
+        cached = get_cached(content) if get_cached is not None else None
+        if cached is not None:
+            return cached
+
+        tokens = []
+        vectors = []
+        for token in self.tokenizer(content):
+            vector = model_search_word(token, self.word_embedding_model, self.glossary)
+            if vector is not None:
+                tokens.append(token)
+                vectors.append(vector)
+        vectors = normalize_rows(vectors, self.word_embedding_model.vector_size)
+
+        if get_cached is not None:
+            self.tokenizer.set_content_vectors(content, tokens, vectors)
+
+        return tokens, vectors
+
+    def score_contents(
+        self,
+        message,
+        return_spell_corrected=False,
+        return_tag_scores=False,
+        weights=None,
+    ):
+        """
+        Score `message` against each of the contents.
+
+        Parameters
+        ----------
+        message : str
+        return_spell_corrected : bool, default False
+            Whether to return the message tokens after spell correction
+        return_tag_scores : bool, default False
+            Whether to return the score of each token of each content (none for
+            contents left out by the prefilter)
+        weights : List[float], optional
+            Weight of each content for this message (e.g. from contextualization),
+            used instead of the content weights
+
+        Returns
+        -------
+        Dict
+            `overall_scores`, a list with the score of each content, and
+            `spell_corrected` and `tag_scores` if requested
+        """
+        if not self.is_set:
+            raise ValueError("Contents must be set before scoring")
+
+        message_tokens, message_vectors = self.get_message_vectors(message)
+        candidates = self.get_candidates(message_vectors, self.prefilter_top_m)
+        if candidates is None:
+            candidates = np.arange(len(self.contents))
+            rows, offsets = None, self.content_offsets
+        else:
+            rows, offsets = self.get_candidate_rows(candidates)
+
+        tag_scores = self.score_tags(message_vectors, rows)
+        overall_scores = np.zeros(len(self.contents), dtype=tag_scores.dtype)
+        overall_scores[candidates] = segment_means(tag_scores, offsets)
+
+        overall_scores = self.weigh_scores(overall_scores, weights)
+        if len(candidates) < len(self.contents):
+            is_candidate = np.zeros(len(self.contents), dtype=bool)
+            is_candidate[candidates] = True
+            overall_scores[~is_candidate] = PREFILTER_FLOOR_SCORE
+
+        result = {"overall_scores": overall_scores.tolist()}
+        if return_spell_corrected:
+            result["spell_corrected"] = message_tokens
+        if return_tag_scores:
+            result["tag_scores"] = [{} for _ in self.contents]
+            for i, start, end in zip(candidates, offsets[:-1], offsets[1:]):
+                result["tag_scores"][i] = dict(
+                    zip(self.content_tokens[i], tag_scores[start:end].tolist())
+                )
+
+        return result
+
+    def score_contents_batch(
+        self, messages, return_spell_corrected=False, weights=None
+    ):
+        """
+        Score each of `messages` against each of the contents, as `score_contents`
+        does, computing the similarities of the tokens of all contents to the tokens
+        of all messages with one matrix product.
+
+        With the prefilter, candidates differ between messages, so messages are
+        scored one at a time.
+
+        Parameters
+        ----------
+        messages : List[str]
+        return_spell_corrected : bool, default False
+            Whether to return the message tokens after spell correction
+        weights : List[Optional[List[float]]], optional
+            Weight of each content for each message, as in `score_contents`
+
+        Returns
+        -------
+        List[Dict]
+            For each message, `overall_scores` and `spell_corrected` if requested
+        """
+        if not self.is_set:
+            raise ValueError("Contents must be set before scoring")
+
+        weights = weights if weights is not None else [None] * len(messages)
+        if 0 < self.prefilter_top_m < len(self.contents):
+            return [
+                self.score_contents(message, return_spell_corrected, weights=weight)
+                for message, weight in zip(messages, weights)
+            ]
+
+        tokens, vectors = zip(*(self.get_message_vectors(m) for m in messages))
+        message_offsets = np.concatenate([[0], np.cumsum([len(v) for v in vectors])])
+        # similarities[i, j] is the cosine similarity of content token i and token j
+        # of all messages' tokens
+        similarities = self.content_matrix @ np.concatenate(vectors).T
+
+        results = []
+        for i, (start, end) in enumerate(
+            zip(message_offsets[:-1], message_offsets[1:])
+        ):
+            tag_scores = self.reduce_similarities(similarities[:, start:end])
+            overall_scores = self.weigh_scores(
+                segment_means(tag_scores, self.content_offsets), weights[i]
+            )
+            result = {"overall_scores": overall_scores.tolist()}
+            if return_spell_corrected:
+                result["spell_corrected"] = tokens[i]
+            results.append(result)
+
+        return results
+
+    def weigh_scores(self, overall_scores, weights=None):
+        """
+        Combine `overall_scores` with `weights`, or else the content weights, by
+        `weighting_method`
+        """
+        weights = weights if weights is not None else self.content_weights
+        if self.weighting_method is None or weights is None:
+            return overall_scores
+
+        return WEIGHTING_METHODS[self.weighting_method](
+            overall_scores, weights, **self.weighting_kwargs
+        )
+
+    def get_candidates(self, message_vectors, top_m):
+        """
+        Indices of the `top_m` contents whose centroids are most similar to the
+        centroid of `message_vectors`, in no particular order. None if all contents
+        should be scored: `top_m` is 0 or not less than the number of contents, or
+        the message has no tokens
+        """
+        if not 0 < top_m < len(self.contents) or len(message_vectors) == 0:
+            return None
+
+        similarities = self.content_centroids @ message_vectors.mean(axis=0)
+        return np.argpartition(-similarities, top_m - 1)[:top_m]
+
+    def get_candidate_rows(self, candidates):
+        """
+        Rows of `content_matrix` of the tokens of `candidates`, in order, and the
+        offsets of each candidate's tokens among them
+        """
+        starts = self.content_offsets[:-1][candidates]
+        lengths = self.content_offsets[1:][candidates] - starts
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        # Shift the positions among the candidates' tokens to each content's start
+        rows = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], lengths)
+
+        return rows, offsets
+
+    def get_message_vectors(self, message):
+        """
+        Tokens of `message` that have a vector, after spell correction, and their
+        normalized vectors
+        """
+        tokens = []
+        vectors = []
+        for token in self.tokenizer(message):
+            vector, corrected_token = model_search(
+                token,
+                self.word_embedding_model,
+                self.glossary,
+                hunspell=self.hunspell,
+                tags_guiding_typos=self.tags_guiding_typos,
+                return_spellcorrected_text=True,
+            )
+            if vector is not None:
+                tokens.append(corrected_token)
+                vectors.append(vector)
+
+        return tokens, normalize_rows(vectors, self.word_embedding_model.vector_size)
+
+    def score_tags(self, message_vectors, rows=None):
+        """
+        Score of each token of all contents, or of the tokens in `rows` of
+        `content_matrix`: the mean cosine similarity of its nearest message tokens
+        (see `get_n_nearest`). 0 for a message without tokens
+        """
+        content_matrix = (
+            self.content_matrix if rows is None else self.content_matrix[rows]
+        )
+        # One matrix product for all contents: similarities[i, j] is the cosine
+        # similarity of content token i and message token j
+        return self.reduce_similarities(content_matrix @ message_vectors.T)
+
+    def reduce_similarities(self, similarities):
+        """
+        Score of each content token from its cosine similarities to the message
+        tokens (one column each): the mean of the nearest (see `get_n_nearest`). 0
+        for a message without tokens. Sorts `similarities` in place
+        """
+        n_message_tokens = similarities.shape[1]
+        if n_message_tokens == 0:
+            return np.zeros(len(similarities), dtype=similarities.dtype)
+
+        n_nearest = get_n_nearest(n_message_tokens, self.k, self.floor)
+        similarities.sort(axis=1)
+
+        return similarities[:, -n_nearest:].mean(axis=1)
+
+
+def segment_means(values, offsets):
+    """
+    Mean of each segment of `values` (along the first axis), segment `i` being
+    `values[offsets[i]:offsets[i + 1]]`. 0 for empty segments
+    """
+    lengths = np.diff(offsets)
+    means = np.zeros((len(lengths),) + values.shape[1:], dtype=values.dtype)
+    has_values = lengths > 0
+    if has_values.any():
+        # Empty segments take up no rows, so summing from the start of each
+        # non-empty segment to the next sums each segment's values
+        sums = np.add.reduceat(values, offsets[:-1][has_values], axis=0)
+        means[has_values] = sums / lengths[has_values].reshape(
+            (-1,) + (1,) * (values.ndim - 1)
+        )
+
+    return means
+
+
+def normalize_rows(vectors, vector_size):
+    """Stack `vectors` into a contiguous float32 matrix of unit-norm rows"""
+    if len(vectors) == 0:
+        return np.zeros((0, vector_size), dtype=np.float32)
+
+    matrix = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+
+    return np.ascontiguousarray(matrix / norms)
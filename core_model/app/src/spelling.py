@@ -0,0 +1,152 @@
+"""Spell checking shared between threads"""
+import json
+import logging
+import os
+import threading
+from functools import wraps
+
+from hunspell import Hunspell
+
+from ..prometheus_metrics import spelling_memo_evictions, spelling_memo_requests
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Hunspell methods that change the dictionary, and so invalidate memoized results
+DICTIONARY_CHANGING_METHODS = {"add", "add_dic", "remove"}
+
+
+class ThreadSafeHunspell:
+    """
+    Hunspell spell checker that can be shared between threads.
+
+    The underlying Hunspell object isn't safe to use from several threads at once,
+    so calls to it are serialized with a lock. Calls are short compared to the rest
+    of scoring, so the lock is rarely contended.
+
+    Results of `spell` and `suggest` (the slowest call) can be memoized per word:
+    the same misspellings recur constantly in inbound messages. The memo is
+    cleared whenever the dictionary changes through this object, and should be
+    cleared (`clear_memo`) when the glossary or tags guiding typos change.
+
+    Parameters
+    ----------
+    hunspell : hunspell.Hunspell, optional
+        The spell checker to wrap. Default a new `Hunspell()`
+    memo_size : int, default 0
+        Maximum number of memoized results, least recently used evicted first. 0
+        disables memoization
+    """
+
+    def __init__(self, hunspell=None, memo_size=0):
+        """Wrap `hunspell`"""
+        self._hunspell = hunspell if hunspell is not None else Hunspell()
+        self._lock = threading.Lock()
+        self._memo = LRUCache(memo_size) if memo_size > 0 else None
+
+    def spell(self, word):
+        """Whether `word` is spelled correctly"""
+        return self._memoized("spell", word)
+
+    def suggest(self, word):
+        """Suggested corrections for `word`"""
+        return self._memoized("suggest", word)
+
+    def _memoized(self, method, word):
+        """Result of Hunspell `method` for `word`, memoized if enabled"""
+        if self._memo is not None:
+            result = self._memo.get((method, word))
+            if result is not None:
+                spelling_memo_requests.labels(method=method, outcome="hit").inc()
+                return result
+            spelling_memo_requests.labels(method=method, outcome="miss").inc()
+
+        with self._lock:
+            result = getattr(self._hunspell, method)(word)
+
+        if self._memo is not None:
+            # Suggestions are shared between callers, so store them immutably
+            result = tuple(result) if method == "suggest" else result
+            n_evicted = self._memo.set((method, word), result)
+            if n_evicted:
+                spelling_memo_evictions.inc(n_evicted)
+
+        return result
+
+    def clear_memo(self):
+        """Forget all memoized results"""
+        if self._memo is not None:
+            self._memo.clear()
+
+    def save_memo(self, path, version=None):
+        """
+        Save the memoized results to `path` (JSON), to warm start other processes
+        with `load_memo`.
+
+        Parameters
+        ----------
+        path : str
+        version : str, optional
+            Identifies the dictionary state the results were computed with (e.g.
+            the language context version). `load_memo` ignores files saved with a
+            different version
+        """
+        if self._memo is None:
+            return
+
+        memo = {
+            "version": version,
+            "entries": [
+                [method, word, result] for (method, word), result in self._memo.items()
+            ],
+        }
+        # Write aside and rename, so concurrent readers never see a partial file
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as memo_file:
+            json.dump(memo, memo_file)
+        os.replace(temporary_path, path)
+
+    def load_memo(self, path, version=None):
+        """
+        Load results saved with `save_memo`, unless the file doesn't exist, can't
+        be read, or was saved with a different `version`.
+
+        Returns
+        -------
+        int
+            Number of results loaded
+        """
+        if self._memo is None or not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path) as memo_file:
+                memo = json.load(memo_file)
+        except (OSError, ValueError):
+            logger.warning(f"Could not read spelling memo from {path}", exc_info=True)
+            return 0
+
+        if memo.get("version") != version:
+            return 0
+
+        for method, word, result in memo["entries"]:
+            result = tuple(result) if method == "suggest" else result
+            self._memo.set((method, word), result)
+
+        return len(memo["entries"])
+
+    def __getattr__(self, name):
+        """Delegate any other attribute to the wrapped Hunspell, holding the lock"""
+        attribute = getattr(self._hunspell, name)
+        if not callable(attribute):
+            return attribute
+
+        @wraps(attribute)
+        def locked(*args, **kwargs):
+            with self._lock:
+                result = attribute(*args, **kwargs)
+            if name in DICTIONARY_CHANGING_METHODS:
+                self.clear_memo()
+            return result
+
+        return locked
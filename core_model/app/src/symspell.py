@@ -0,0 +1,196 @@
+"""
+Spell correction by symmetric delete lookups (the SymSpell algorithm), as a faster
+alternative to Hunspell suggestions.
+
+Every word of the vocabulary is indexed under all the strings obtained by deleting
+up to `max_edit_distance` characters from its first `prefix_length` characters. A
+misspelt word is corrected by generating the same deletes for it and looking them
+up, so the cost of a lookup doesn't grow with the size of the vocabulary.
+"""
+import pickle
+from collections import defaultdict
+
+
+class SymSpellIndex:
+    """
+    Index of the words that can be suggested as corrections.
+
+    Parameters
+    ----------
+    max_edit_distance : int, default 2
+        Maximum edit distance (insertions, deletions, substitutions and
+        transpositions of adjacent characters) of suggestions
+    prefix_length : int, default 7
+        Only the first `prefix_length` characters of words are used to generate
+        deletes, which bounds the size of the index
+    """
+
+    def __init__(self, max_edit_distance=2, prefix_length=7):
+        """Create an empty index"""
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self._word_ranks = {}
+        self._deletes = defaultdict(list)
+
+    def __len__(self):
+        """Number of words indexed"""
+        return len(self._word_ranks)
+
+    def __contains__(self, word):
+        """Whether `word` is indexed"""
+        return word in self._word_ranks
+
+    @classmethod
+    def from_keyed_vectors(
+        cls, keyed_vectors, max_vocab_size, max_edit_distance=2, prefix_length=7
+    ):
+        """
+        Index the `max_vocab_size` most frequent alphabetic words of a gensim
+        `KeyedVectors`, lowercased, ranked by frequency
+        """
+        index = cls(max_edit_distance, prefix_length)
+        for word in keyed_vectors.index_to_key:
+            if len(index) >= max_vocab_size:
+                break
+            if word.isalpha():
+                index.add_word(word.lower(), rank=len(index))
+
+        return index
+
+    def add_word(self, word, rank):
+        """
+        Add `word` to the index. Among suggestions at the same edit distance, lower
+        ranks come first. A word already indexed keeps its rank
+        """
+        if word in self._word_ranks:
+            return
+
+        self._word_ranks[word] = rank
+        for delete in self._get_deletes(word):
+            self._deletes[delete].append(word)
+
+    def lookup(self, word):
+        """
+        Indexed words within `max_edit_distance` of `word`
+
+        Returns
+        -------
+        List[Tuple[int, int, str]]
+            `(edit_distance, rank, suggestion)` of each suggestion
+        """
+        suggestions = set()
+        for delete in self._get_deletes(word):
+            suggestions.update(self._deletes.get(delete, ()))
+
+        results = []
+        for suggestion in suggestions:
+            if abs(len(suggestion) - len(word)) > self.max_edit_distance:
+                continue
+            distance = edit_distance(word, suggestion, self.max_edit_distance)
+            if distance <= self.max_edit_distance:
+                results.append((distance, self._word_ranks[suggestion], suggestion))
+
+        return results
+
+    def _get_deletes(self, word):
+        """`word`'s prefix and all strings made by deleting characters from it"""
+        deletes = {word[: self.prefix_length]}
+        edits = deletes
+        for _ in range(self.max_edit_distance):
+            edits = {
+                edit[:i] + edit[i + 1 :] for edit in edits for i in range(len(edit))
+            }
+            deletes |= edits
+
+        return deletes
+
+    def save(self, path):
+        """Save the index, to be loaded with `SymSpellIndex.load`"""
+        with open(path, "wb") as index_file:
+            pickle.dump(self, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """Load an index saved with `save`"""
+        with open(path, "rb") as index_file:
+            return pickle.load(index_file)
+
+
+class SymSpellChecker:
+    """
+    Spell checker with the `spell` and `suggest` methods of Hunspell used by faqt,
+    backed by a `SymSpellIndex` of the word embeddings' vocabulary plus extra words
+    (e.g. the glossary and tags guiding typos).
+
+    The vocabulary index is only read, so it can be shared between checkers (e.g.
+    one per language context) and threads.
+
+    Parameters
+    ----------
+    index : SymSpellIndex
+    extra_words : Iterable[str], optional
+        Words to suggest in addition to those of `index`, ahead of them at the same
+        edit distance
+    max_suggestions : int, default 10
+    """
+
+    def __init__(self, index, extra_words=(), max_suggestions=10):
+        """Index `extra_words` alongside `index`"""
+        self.index = index
+        self.max_suggestions = max_suggestions
+        self.extra_index = SymSpellIndex(index.max_edit_distance, index.prefix_length)
+        for word in extra_words:
+            self.extra_index.add_word(word, rank=-1)
+
+    def spell(self, word):
+        """Whether `word` is a known word"""
+        return word in self.extra_index or word in self.index
+
+    def suggest(self, word):
+        """
+        Known words closest to `word`, by edit distance and then frequency. Empty if
+        none is within the index's `max_edit_distance`
+        """
+        results = self.extra_index.lookup(word) + self.index.lookup(word)
+        results.sort()
+
+        suggestions = []
+        for _, _, suggestion in results:
+            if suggestion not in suggestions:
+                suggestions.append(suggestion)
+            if len(suggestions) == self.max_suggestions:
+                break
+
+        return suggestions
+
+
+def edit_distance(source, target, max_distance):
+    """
+    Optimal string alignment distance (Levenshtein distance plus transpositions of
+    adjacent characters) between `source` and `target`. Returns `max_distance + 1`
+    as soon as the distance is known to exceed `max_distance`
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous_row = None
+    previous_row = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        row = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            row[j] = min(
+                previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost
+            )
+            if (
+                i > 1
+                and j > 1
+                and source[i - 1] == target[j - 2]
+                and source[i - 2] == target[j - 1]
+            ):
+                row[j] = min(row[j], previous_previous_row[j - 2] + 1)
+        if min(row) > max_distance:
+            return max_distance + 1
+        previous_previous_row, previous_row = previous_row, row
+
+    return previous_row[-1]
@@ -48,16 +48,45 @@ def load_w2v_binary(folder, filename):
     return model
 
 
+def load_keyed_vectors_mmap(folder, filename):
+    """
+    Load gensim-native KeyedVectors, memory-mapping the vector matrix read-only.
+
+    The vectors are not parsed or copied into the process: pages are read lazily
+    from the `.npy` file and shared between all processes through the OS page
+    cache. See `save_prenormalized_model.py` for creating the files.
+    """
+    if os.getenv("GITHUB_ACTIONS") == "true":
+        bucket = os.getenv("WORD2VEC_BINARY_BUCKET")
+        s3 = boto3.resource("s3")
+
+        # mmap needs the files to outlive this function, and the `.npy` arrays
+        # are saved next to the main file with `filename` as prefix
+        local_folder = Path(tempfile.mkdtemp())
+        for s3_object in s3.Bucket(bucket).objects.filter(Prefix=filename):
+            s3.Bucket(bucket).download_file(
+                s3_object.key, str(local_folder / s3_object.key)
+            )
+        full_path = local_folder / filename
+    else:
+        full_path = Path(__file__).parents[3] / "data" / folder / filename
+
+    model = KeyedVectors.load(str(full_path), mmap="r")
+
+    return model
+
+
 MODEL_LOADING_FUNCS = {
     "w2v": load_w2v_binary,
     "fasttext": load_fasttext,
+    "kv": load_keyed_vectors_mmap,
 }
 
 
 def load_word_embeddings_bin(folder, filename, model_type):
     """
-    Load pretrained word2vec or fasttext model from either local mount or S3
-    based on environment var.
+    Load pretrained word2vec, fasttext or gensim-native (memory-mapped) model from
+    either local mount or S3 based on environment var.
 
     TODO: make into a pure function and take ENV as input
     TODO: Change env var to be VECTORS_BINARY_BUCKET since it is no longer just W2V
@@ -206,6 +235,38 @@ def deep_update(dict_to_update, update_values):
     return dict_to_update
 
 
+def get_process_memory():
+    """
+    Return the memory used by the current process, in bytes, split into pages
+    private to the process and pages shared with other processes (e.g. gunicorn
+    workers sharing the model loaded with `--preload`), plus the proportional set
+    size (shared pages divided between the processes sharing them).
+
+    Returns an empty dict if `/proc/self/smaps_rollup` is not available (non-Linux
+    systems or kernels older than 4.14).
+    """
+    field_to_type = {
+        "Pss": "proportional",
+        "Shared_Clean": "shared",
+        "Shared_Dirty": "shared",
+        "Private_Clean": "private",
+        "Private_Dirty": "private",
+    }
+    memory = {"private": 0, "shared": 0, "proportional": 0}
+
+    try:
+        with open("/proc/self/smaps_rollup") as file:
+            for line in file:
+                field, _, value = line.partition(":")
+                if field in field_to_type:
+                    # values are reported in kB
+                    memory[field_to_type[field]] += int(value.split()[0]) * 1024
+    except OSError:
+        return {}
+
+    return memory
+
+
 def get_ttl_hash(seconds):
     """Return the same value within `seconds` time period"""
     return time.time() // seconds
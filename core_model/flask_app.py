@@ -1,12 +1,18 @@
 """
 Main python script called by gunicorn
 """
+import gc
 import logging
 import os
+from datetime import datetime
 
+import click
 import sentry_sdk
 from app import create_app, db, init_faqt_model, refresh_faqs
 from app.data_models import FAQModel, Inbound
+from app.src.inbound_partitions import add_months, archive_partitions, create_partitions
+from app.src.inbound_writer import replay_dead_letters
+from flask.cli import AppGroup
 from sentry_sdk.integrations.flask import FlaskIntegration
 from sentry_sdk.integrations.logging import LoggingIntegration
 
@@ -21,6 +27,12 @@ app = create_app()
 init_faqt_model(app)
 refresh_faqs(app)
 
+# With `--preload`, the objects created above (e.g. the model's vocab) sit in pages
+# that the workers share with the master process copy-on-write. Moving them to the
+# permanent generation stops garbage collections in the workers from writing to,
+# and so copying, those pages.
+gc.freeze()
+
 
 @app.shell_context_processor
 def make_shell_context():
@@ -28,3 +40,76 @@ def make_shell_context():
     Return flask shell with objects imported
     """
     return dict(db=db, Inbound=Inbound, FAQModel=FAQModel)
+
+
+inbounds_cli = AppGroup("inbounds", help="Manage the inbounds table")
+
+
+@inbounds_cli.command("create-partitions")
+@click.option(
+    "--months-ahead",
+    default=3,
+    show_default=True,
+    help="Create monthly partitions up to this many months after the current one",
+)
+def create_inbound_partitions(months_ahead):
+    """
+    Create the upcoming monthly partitions of the inbounds table. Run this at least
+    monthly, so that inbounds never land in the default partition
+    """
+    with db.engine.begin() as connection:
+        created = create_partitions(connection, months_ahead)
+
+    for partition_name in created:
+        click.echo(f"Created partition {partition_name}")
+
+
+@inbounds_cli.command("archive-partitions")
+@click.option(
+    "--retention-months",
+    default=12,
+    show_default=True,
+    help="Keep partitions with inbounds from the last this many months",
+)
+@click.option(
+    "--output-dir",
+    required=True,
+    type=click.Path(file_okay=False),
+    help="Directory to export the partitions to, as gzipped CSV",
+)
+@click.option(
+    "--drop/--keep",
+    default=True,
+    show_default=True,
+    help="Drop the partitions once exported, or keep them as standalone tables",
+)
+def archive_inbound_partitions(retention_months, output_dir, drop):
+    """
+    Detach the partitions of the inbounds table that are older than the retention
+    period, and export them to compressed files
+    """
+    before = add_months(datetime.utcnow(), -retention_months)
+    exported = archive_partitions(db.engine, before, output_dir, drop=drop)
+
+    for output_path in exported:
+        click.echo(f"Archived partition to {output_path}")
+
+
+@inbounds_cli.command("replay-failed")
+@click.option(
+    "--path",
+    default=lambda: app.config["WRITE_BEHIND"]["dead_letter_path"],
+    show_default="storage: write_behind: dead_letter_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Dead letter file of inbounds that couldn't be written",
+)
+def replay_failed_inbounds(path):
+    """
+    Write the inbounds that the write-behind writer couldn't write and saved to
+    its dead letter file. Remove the file once they are written
+    """
+    n_rows = replay_dead_letters(path)
+    click.echo(f"Wrote {n_rows} inbounds from {path}")
+
+
+app.cli.add_command(inbounds_cli)
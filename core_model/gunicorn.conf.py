@@ -9,3 +9,30 @@ def child_exit(server, worker):
     Required for prometheus for Gunicorn
     """
     GunicornInternalPrometheusMetrics.mark_process_dead_on_child_exit(worker.pid)
+
+
+def post_worker_init(worker):
+    """
+    Start refreshing FAQs and language context in the background, and on database
+    notifications, if enabled. Threads don't survive forking, so this can't be done
+    when preloading the app.
+    """
+    from app import start_background_refresh, start_change_listener
+
+    start_background_refresh(worker.wsgi)
+    start_change_listener(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    """
+    Write any inbounds still queued by the write-behind inbound writer, and save the
+    spell checker's memo if enabled
+    """
+    inbound_writer = getattr(worker.wsgi, "inbound_writer", None)
+    if inbound_writer is not None:
+        inbound_writer.stop()
+
+    if hasattr(worker.wsgi, "hunspell"):
+        from app import save_spelling_memo
+
+        save_spelling_memo(worker.wsgi)
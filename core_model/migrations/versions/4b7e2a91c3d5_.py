@@ -0,0 +1,51 @@
+"""Notify listeners when FAQs or language context change
+
+Revision ID: 4b7e2a91c3d5
+Revises: 1e941a9520db
+Create Date: 2023-03-20 11:05:32.418274
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4b7e2a91c3d5"
+down_revision = "1e941a9520db"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Channel names must match those in `core_model/app/__init__.py`
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_table_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(TG_ARGV[0], TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER faqmatches_notify_changed
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON faqmatches
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_table_changed('faqs_changed');
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER contextualization_notify_changed
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON contextualization
+        FOR EACH STATEMENT
+        EXECUTE PROCEDURE notify_table_changed('language_context_changed');
+        """
+    )
+
+
+def downgrade():
+    op.execute(
+        "DROP TRIGGER IF EXISTS contextualization_notify_changed ON contextualization;"
+    )
+    op.execute("DROP TRIGGER IF EXISTS faqmatches_notify_changed ON faqmatches;")
+    op.execute("DROP FUNCTION IF EXISTS notify_table_changed();")
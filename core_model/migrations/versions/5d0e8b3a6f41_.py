@@ -0,0 +1,76 @@
+"""Store inbound JSON columns as JSONB, with indexes for analytics
+
+Revision ID: 5d0e8b3a6f41
+Revises: 9c3f5d17a2e8
+Create Date: 2023-04-03 10:12:47.206518
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "5d0e8b3a6f41"
+down_revision = "9c3f5d17a2e8"
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = [
+    ("inbound_metadata", True),
+    ("model_scoring", False),
+    ("returned_content", False),
+    ("returned_feedback", True),
+]
+
+
+def upgrade():
+    for column, nullable in JSON_COLUMNS:
+        op.alter_column(
+            "inbounds",
+            column,
+            existing_type=sa.JSON(),
+            type_=postgresql.JSONB(astext_type=sa.Text()),
+            existing_nullable=nullable,
+            postgresql_using=f"{column}::jsonb",
+        )
+
+    # Feedback containment lookups, e.g. by feedback type or faq_id:
+    # returned_feedback @> '[{"feedback_type": "negative"}]'
+    op.create_index(
+        "ix_inbounds_returned_feedback",
+        "inbounds",
+        ["returned_feedback"],
+        postgresql_using="gin",
+        postgresql_ops={"returned_feedback": "jsonb_path_ops"},
+    )
+    # Metadata key and containment lookups, e.g. inbound_metadata ? 'channel'
+    op.create_index(
+        "ix_inbounds_inbound_metadata",
+        "inbounds",
+        ["inbound_metadata"],
+        postgresql_using="gin",
+    )
+    # Inbounds are inserted in time order, so a small BRIN index is enough for
+    # time range scans
+    op.create_index(
+        "ix_inbounds_inbound_utc",
+        "inbounds",
+        ["inbound_utc"],
+        postgresql_using="brin",
+    )
+
+
+def downgrade():
+    op.drop_index("ix_inbounds_inbound_utc", table_name="inbounds")
+    op.drop_index("ix_inbounds_inbound_metadata", table_name="inbounds")
+    op.drop_index("ix_inbounds_returned_feedback", table_name="inbounds")
+
+    for column, nullable in JSON_COLUMNS:
+        op.alter_column(
+            "inbounds",
+            column,
+            existing_type=postgresql.JSONB(astext_type=sa.Text()),
+            type_=sa.JSON(),
+            existing_nullable=nullable,
+            postgresql_using=f"{column}::json",
+        )
@@ -0,0 +1,108 @@
+"""Partition inbounds by month of inbound_utc
+
+Revision ID: 7a2c4e9f1b36
+Revises: 5d0e8b3a6f41
+Create Date: 2023-04-11 09:26:15.830142
+
+"""
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7a2c4e9f1b36"
+down_revision = "5d0e8b3a6f41"
+branch_labels = None
+depends_on = None
+
+# Monthly partitions created up front. Later ones are created by
+# `flask inbounds create-partitions` (see `core_model/flask_app.py`)
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    ("ix_inbounds_returned_feedback", "USING gin (returned_feedback jsonb_path_ops)"),
+    ("ix_inbounds_inbound_metadata", "USING gin (inbound_metadata)"),
+    ("ix_inbounds_inbound_utc", "USING brin (inbound_utc)"),
+]
+FAQ_SNAPSHOT_FKEY = (
+    "ADD CONSTRAINT inbounds_faq_snapshot_id_fkey FOREIGN KEY (faq_snapshot_id) "
+    "REFERENCES faq_snapshots (faq_snapshot_id)"
+)
+
+
+def add_months(timestamp, months):
+    """First day of the month `months` months after that of `timestamp`"""
+    month_index = timestamp.year * 12 + timestamp.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def upgrade():
+    connection = op.get_bind()
+    id_sequence = connection.execute(
+        sa.text("SELECT pg_get_serial_sequence('inbounds', 'inbound_id')")
+    ).scalar()
+
+    # The existing table becomes the partition for everything up to the end of
+    # the current month. Its indexes are kept (and attached to the new indexes of
+    # `inbounds`); its primary key is rebuilt to include the partition key
+    op.execute("ALTER TABLE inbounds RENAME TO inbounds_legacy")
+    op.execute("ALTER TABLE inbounds_legacy DROP CONSTRAINT inbounds_pkey")
+    op.execute(
+        "ALTER TABLE inbounds_legacy DROP CONSTRAINT inbounds_faq_snapshot_id_fkey"
+    )
+    for index_name, _ in INDEXES:
+        legacy_index_name = index_name.replace("ix_inbounds_", "ix_inbounds_legacy_")
+        op.execute(f"ALTER INDEX {index_name} RENAME TO {legacy_index_name}")
+
+    op.execute(
+        "CREATE TABLE inbounds (LIKE inbounds_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (inbound_utc)"
+    )
+    op.execute(f"ALTER SEQUENCE {id_sequence} OWNED BY inbounds.inbound_id")
+    op.execute(
+        "ALTER TABLE inbounds ADD CONSTRAINT inbounds_pkey "
+        "PRIMARY KEY (inbound_id, inbound_utc)"
+    )
+    op.execute(f"ALTER TABLE inbounds {FAQ_SNAPSHOT_FKEY}")
+    for index_name, index_definition in INDEXES:
+        op.execute(f"CREATE INDEX {index_name} ON inbounds {index_definition}")
+
+    next_month = add_months(datetime.utcnow(), 1)
+    op.execute(
+        "ALTER TABLE inbounds ATTACH PARTITION inbounds_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{next_month.isoformat()}')"
+    )
+    for months in range(MONTHS_AHEAD):
+        start = add_months(next_month, months)
+        end = add_months(next_month, months + 1)
+        op.execute(
+            f"CREATE TABLE inbounds_y{start.year}m{start.month:02d} "
+            "PARTITION OF inbounds "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    # Catches inbounds beyond the last monthly partition, so inserts never fail
+    op.execute("CREATE TABLE inbounds_default PARTITION OF inbounds DEFAULT")
+
+
+def downgrade():
+    connection = op.get_bind()
+    id_sequence = connection.execute(
+        sa.text("SELECT pg_get_serial_sequence('inbounds', 'inbound_id')")
+    ).scalar()
+
+    op.execute("CREATE TABLE inbounds_unpartitioned (LIKE inbounds INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO inbounds_unpartitioned SELECT * FROM inbounds")
+    op.execute(
+        f"ALTER SEQUENCE {id_sequence} OWNED BY inbounds_unpartitioned.inbound_id"
+    )
+    # Also drops the partitions
+    op.execute("DROP TABLE inbounds")
+    op.execute("ALTER TABLE inbounds_unpartitioned RENAME TO inbounds")
+
+    op.execute(
+        "ALTER TABLE inbounds ADD CONSTRAINT inbounds_pkey PRIMARY KEY (inbound_id)"
+    )
+    op.execute(f"ALTER TABLE inbounds {FAQ_SNAPSHOT_FKEY}")
+    for index_name, index_definition in INDEXES:
+        op.execute(f"CREATE INDEX {index_name} ON inbounds {index_definition}")
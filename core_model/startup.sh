@@ -18,7 +18,27 @@ else
 fi
 
 # Note: timeout is high here to allow for loading the large pre-trained model
-# Note: we run with 2n+1 workers, preloading application (to share the large model in RAM)
-# Note: application is not thread-safe, so must be single-threaded
+# (models of type `kv` are memory-mapped, so they load in seconds and their vectors
+# are shared between workers through the OS page cache)
+# Note: we run with 2n+1 workers by default (override with GUNICORN_WORKERS),
+# preloading application (to share the large model in RAM)
+# Note: set GUNICORN_THREADS > 1 to serve requests from several threads per worker
+# (gthread worker class). Requests read an immutable snapshot of the FAQs and model
+# and the spell checker is locked, so the app is thread-safe. Fewer workers with
+# more threads each need less memory for the same number of concurrent requests;
+# see `load_testing/configs/sync_vs_gthread.json`
+# Note: set `refresh: background: true` in `parameters.yml` to refresh FAQs in a
+# background thread of each worker, rather than during inbound requests
+# Note: set `refresh: on_notify: true` in `parameters.yml` to refresh FAQs and language
+# context as soon as they change in the database (Postgres LISTEN/NOTIFY). Polling
+# can then be turned off with FAQ_REFRESH_FREQ=0, LANGUAGE_CONTEXT_REFRESH_FREQ=0 and
+# ENABLE_FAQ_REFRESH_CRON=false
+WORKERS=${GUNICORN_WORKERS:-$((2 * $(getconf _NPROCESSORS_ONLN) + 1))}
+THREADS=${GUNICORN_THREADS:-1}
+if [[ $THREADS -gt 1 ]]; then
+    WORKER_ARGS="--worker-class gthread --threads $THREADS"
+else
+    WORKER_ARGS=""
+fi
 exec su-exec container_user \
-    gunicorn --timeout 300 --workers=$((2 * $(getconf _NPROCESSORS_ONLN) + 1)) --preload flask_app:app -b 0.0.0.0:$PORT
+    gunicorn --timeout 300 --workers=$WORKERS $WORKER_ARGS --preload flask_app:app -b 0.0.0.0:$PORT
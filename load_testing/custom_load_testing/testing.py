@@ -6,7 +6,7 @@ import subprocess
 logging.basicConfig(level=logging.INFO)
 
 hosts_dict = {}
-for URL_label in ["LOCAL_URL", "STAGING_URL", "DEV_URL"]:
+for URL_label in ["LOCAL_URL", "STAGING_URL", "DEV_URL", "GTHREAD_URL"]:
     URL = os.getenv(URL_label)
     if URL is None:
         logging.warning(f"Could not find {URL_label} in env vars.")
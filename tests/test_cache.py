@@ -0,0 +1,76 @@
+import threading
+
+from core_model.app.src import cache
+from core_model.app.src.cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestLRUCache:
+    def test_least_recently_used_evicted(self):
+        lru_cache = LRUCache(maxsize=2)
+        lru_cache.set("a", 1)
+        lru_cache.set("b", 2)
+        lru_cache.get("a")
+        lru_cache.set("c", 3)
+
+        assert lru_cache.get("a") == 1
+        assert lru_cache.get("b") is None
+        assert lru_cache.get("c") == 3
+
+    def test_expired_entries_not_returned(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(cache, "time", clock)
+        lru_cache = LRUCache(maxsize=2, ttl=10)
+        lru_cache.set("a", 1)
+
+        clock.now = 105.0
+        assert lru_cache.get("a") == 1
+
+        clock.now = 111.0
+        assert lru_cache.get("a", "missing") == "missing"
+        assert len(lru_cache) == 0
+
+    def test_evictions_returned(self):
+        lru_cache = LRUCache(maxsize=2)
+
+        assert [lru_cache.set(key, 0) for key in "abc"] == [0, 0, 1]
+
+    def test_items_least_recently_used_first(self):
+        lru_cache = LRUCache(maxsize=3)
+        lru_cache.set("a", 1)
+        lru_cache.set("b", 2)
+        lru_cache.get("a")
+
+        assert lru_cache.items() == [("b", 2), ("a", 1)]
+
+    def test_pop(self):
+        lru_cache = LRUCache(maxsize=2)
+        lru_cache.set("a", 1)
+
+        assert lru_cache.pop("a") == 1
+        assert lru_cache.pop("a") is None
+
+    def test_size_bounded_with_threads(self):
+        lru_cache = LRUCache(maxsize=50)
+
+        def set_values(offset):
+            for i in range(200):
+                lru_cache.set(offset + i, i)
+                lru_cache.get(offset + i // 2)
+
+        threads = [
+            threading.Thread(target=set_values, args=(1000 * n,)) for n in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(lru_cache) == 50
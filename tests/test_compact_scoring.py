@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from core_model.app.src.compact_scoring import (
+    decode_scores,
+    encode_scores,
+    scoring_from_scores,
+)
+
+
+class TestCompactScoring:
+    def test_scores_round_trip_as_float32(self):
+        scores = [0.25, 0.1, 0.9]
+        decoded = decode_scores(encode_scores(scores))
+
+        assert decoded.dtype == np.float32
+        assert np.allclose(decoded, scores)
+
+    def test_scoring_rebuilt_in_model_scoring_format(self):
+        scoring, ranked_faq_ids = scoring_from_scores(
+            encode_scores([0.25, 0.1, 0.9]), [3, 5, 8], ["Three", "Five", "Eight"]
+        )
+
+        assert ranked_faq_ids == ["8", "3", "5"]
+        assert scoring["3"] == {
+            "overall_score": "0.25",
+            "faq_title": "Three",
+            "rank": "2",
+        }
+
+    def test_scores_not_matching_faqs_raises(self):
+        with pytest.raises(ValueError):
+            scoring_from_scores(encode_scores([0.25, 0.1]), [3, 5, 8], ["", "", ""])
@@ -6,6 +6,12 @@ from datetime import datetime
 import pytest
 from sqlalchemy import text
 
+from core_model.app.src.utils import (
+    MODEL_LOADING_FUNCS,
+    load_data_sources,
+    load_parameters,
+)
+
 
 class TestConfig:
     insert_query = (
@@ -49,11 +55,34 @@ class TestConfig:
         custom_wvs = eval(self.config_params["custom_wvs"])
         tags = eval(self.config_params["tags"])
 
-        assert custom_wvs != app_main.faqt_model.glossary
-        assert tags != app_main.faqt_model.tags_guiding_typos
+        assert custom_wvs != app_main.faq_snapshot.faqt_model.glossary
+        assert tags != app_main.faq_snapshot.faqt_model.tags_guiding_typos
+
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        client.get("/config/edit-language-context", headers=headers)
+
+        assert custom_wvs == app_main.faq_snapshot.faqt_model.glossary
+        assert tags == app_main.faq_snapshot.faqt_model.tags_guiding_typos
 
+    def test_unchanged_language_context_not_rebuilt(self, client, app_main, add_config):
         headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
         client.get("/config/edit-language-context", headers=headers)
+        faqt_model = app_main.faq_snapshot.faqt_model
+
+        response = client.get("/config/edit-language-context", headers=headers)
+
+        assert response.get_data(as_text=True) == "pytest_config"
+        assert app_main.faq_snapshot.faqt_model is faqt_model
+
+
+class TestModelParams:
+    def test_every_word_embedding_model_has_model_params(self):
+        model_params = load_parameters("model_params")
+        matching_models = [
+            name
+            for name, data_source in load_data_sources().items()
+            if data_source.get("type") in MODEL_LOADING_FUNCS
+        ]
 
-        assert custom_wvs == app_main.faqt_model.glossary
-        assert tags == app_main.faqt_model.tags_guiding_typos
+        assert matching_models
+        assert set(matching_models) - set(model_params) == set()
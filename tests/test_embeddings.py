@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from core_model.app.src.embeddings import compress_word_embeddings, prune_keyed_vectors
+
+
+@pytest.fixture
+def small_keyed_vectors():
+    rng = np.random.default_rng(0)
+    words = ["vaccine", "baby", "pregnant", "clinic", "zero"]
+    vectors = rng.normal(size=(len(words), 300)).astype(np.float32)
+    vectors[-1] = 0
+    model = KeyedVectors(vector_size=300)
+    model.add_vectors(words, vectors)
+    return model
+
+
+class TestCompressWordEmbeddings:
+    @pytest.mark.parametrize(
+        "storage,dtype,rtol", [("float16", np.float16, 1e-3), ("int8", np.int8, 2e-2)]
+    )
+    def test_vectors_stored_compactly(self, small_keyed_vectors, storage, dtype, rtol):
+        compact = compress_word_embeddings(small_keyed_vectors, storage)
+
+        assert compact.vectors.dtype == dtype
+        for word in small_keyed_vectors.index_to_key:
+            vector = compact[word]
+            assert vector.dtype == np.float32
+            assert np.allclose(vector, small_keyed_vectors[word], rtol=rtol, atol=rtol)
+
+    @pytest.mark.parametrize("storage", ["float16", "int8"])
+    def test_similarities_close_to_float32(self, small_keyed_vectors, storage):
+        compact = compress_word_embeddings(small_keyed_vectors, storage)
+
+        assert np.isclose(
+            compact.similarity("vaccine", "clinic"),
+            small_keyed_vectors.similarity("vaccine", "clinic"),
+            atol=1e-2,
+        )
+
+    def test_float32_returns_same_model(self, small_keyed_vectors):
+        compact = compress_word_embeddings(small_keyed_vectors, "float32")
+        assert compact is small_keyed_vectors
+
+    @pytest.mark.parametrize("storage", ["float16", "int8"])
+    def test_saved_compact_model_memory_mapped(
+        self, small_keyed_vectors, storage, tmp_path
+    ):
+        compact = compress_word_embeddings(small_keyed_vectors, storage)
+        compact.save(str(tmp_path / "compact.kv"), sep_limit=0)
+
+        loaded = KeyedVectors.load(str(tmp_path / "compact.kv"), mmap="r")
+
+        assert isinstance(loaded.vectors, np.memmap)
+        assert compress_word_embeddings(loaded, storage) is loaded
+        assert np.array_equal(loaded["baby"], compact["baby"])
+
+    def test_invalid_storage_raises(self, small_keyed_vectors):
+        with pytest.raises(ValueError):
+            compress_word_embeddings(small_keyed_vectors, "float8")
+
+
+class TestPruneKeyedVectors:
+    def test_keeps_top_n_words(self, small_keyed_vectors):
+        pruned = prune_keyed_vectors(small_keyed_vectors, 2)
+
+        assert pruned.index_to_key == ["vaccine", "baby"]
+
+    def test_keeps_words_to_keep(self, small_keyed_vectors):
+        pruned = prune_keyed_vectors(
+            small_keyed_vectors, 2, words_to_keep=["clinic", "baby", "not_a_word"]
+        )
+
+        assert pruned.index_to_key == ["vaccine", "baby", "clinic"]
+        assert np.array_equal(pruned["clinic"], small_keyed_vectors["clinic"])
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+
+from core_model.app.data_models import TemporaryModel
+from core_model.app.src.faq_cache import FAQTokenCache
+
+
+def make_faq(faq_id, content, updated_utc=datetime(2022, 4, 14)):
+    return TemporaryModel(
+        faq_id=faq_id, faq_content_to_send=content, faq_updated_utc=updated_utc
+    )
+
+
+class TestFAQTokenCache:
+    @pytest.fixture
+    def tokenizer_calls(self):
+        return []
+
+    @pytest.fixture
+    def token_cache(self, tokenizer_calls):
+        def tokenizer(text):
+            tokenizer_calls.append(text)
+            return text.lower().split()
+
+        return FAQTokenCache(tokenizer)
+
+    def test_only_new_or_changed_faqs_tokenized(self, token_cache, tokenizer_calls):
+        faqs = [make_faq(1, "Vaccines are safe"), make_faq(2, "Drink water")]
+        assert token_cache.update(faqs) == 2
+
+        faqs = [
+            make_faq(1, "Vaccines are safe"),
+            make_faq(2, "Drink clean water", datetime(2022, 5, 1)),
+            make_faq(3, "Sleep well"),
+        ]
+        assert token_cache.update(faqs) == 2
+        assert tokenizer_calls == [
+            "Vaccines are safe",
+            "Drink water",
+            "Drink clean water",
+            "Sleep well",
+        ]
+
+    def test_cached_content_not_retokenized(self, token_cache, tokenizer_calls):
+        token_cache.update([make_faq(1, "Vaccines are safe")])
+
+        assert token_cache("Vaccines are safe") == ["vaccines", "are", "safe"]
+        assert token_cache("Are vaccines safe") == ["are", "vaccines", "safe"]
+        assert tokenizer_calls == ["Vaccines are safe", "Are vaccines safe"]
+
+    def test_removed_faqs_dropped(self, token_cache, tokenizer_calls):
+        token_cache.update([make_faq(1, "Vaccines are safe")])
+        token_cache.update([])
+        token_cache("Vaccines are safe")
+
+        assert tokenizer_calls == ["Vaccines are safe", "Vaccines are safe"]
+
+    def test_vectors_of_changed_faqs_dropped(self, token_cache):
+        token_cache.update([make_faq(1, "Vaccines are safe"), make_faq(2, "Drink")])
+        token_cache.set_content_vectors("Vaccines are safe", ["vaccines"], "v1")
+        token_cache.set_content_vectors("Drink", ["drink"], "v2")
+        token_cache.set_content_vectors("Not a FAQ", ["faq"], "v3")
+
+        token_cache.update(
+            [
+                make_faq(1, "Vaccines are safe"),
+                make_faq(2, "Drink", datetime(2023, 1, 1)),
+            ]
+        )
+
+        assert token_cache.get_content_vectors("Vaccines are safe") == (
+            ["vaccines"],
+            "v1",
+        )
+        assert token_cache.get_content_vectors("Drink") is None
+        assert token_cache.get_content_vectors("Not a FAQ") is None
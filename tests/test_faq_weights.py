@@ -101,16 +101,16 @@ class TestFaqWeights:
     def test_weights_correctly_calculated_no_weights(
         self, app_main, faq_data_no_weights
     ):
-        weight_shares = [f.faq_weight_share for f in app_main.faqs]
-        weights = [f.faq_weight for f in app_main.faqs]
+        weight_shares = [f.faq_weight_share for f in app_main.faq_snapshot.faqs]
+        weights = [f.faq_weight for f in app_main.faq_snapshot.faqs]
         assert len(weights) == sum(weights)
         assert np.isclose(sum(weight_shares), 1)
 
     def test_weights_correctly_calculated_w_weights(
         self, app_weight, faq_data_w_weights, faq_weights
     ):
-        weight_shares = [f.faq_weight_share for f in app_weight.faqs]
-        weights = [f.faq_weight for f in app_weight.faqs]
+        weight_shares = [f.faq_weight_share for f in app_weight.faq_snapshot.faqs]
+        weights = [f.faq_weight for f in app_weight.faq_snapshot.faqs]
 
         assert weights == faq_weights
         assert np.isclose(sum(weight_shares), 1)
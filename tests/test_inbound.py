@@ -1,11 +1,27 @@
+import json
 import os
 import re
+from datetime import datetime
 from time import sleep
 
 import pytest
 from sqlalchemy import text
 
 from core_model import app
+from core_model.app.data_models import TemporaryModel
+from core_model.app.main.inbound import (
+    get_response_cache_key,
+    get_top_n_matches,
+    prepare_scoring_as_json,
+)
+from core_model.app.src.compact_scoring import encode_scores, scoring_from_scores
+from core_model.app.src.inbound_writer import (
+    InboundIdAllocator,
+    InboundWriter,
+    loads_dead_letters,
+    replay_dead_letters,
+)
+from core_model.app.src.scoring import PREFILTER_FLOOR_SCORE
 
 insert_faq = (
     "INSERT INTO faqmatches ("
@@ -285,6 +301,44 @@ class TestInboundFeedback:
         assert response.status_code == 200
         assert response.data == b"Success"
 
+    def test_inbound_feedback_appended_to_legacy_dict(
+        self, inbounds, inbound_id, client, request_json, db_engine
+    ):
+        legacy_feedback = {"feedback_type": "negative", "page_number": 1}
+        with db_engine.connect() as db_connection:
+            db_connection.execute(
+                text(
+                    "UPDATE inbounds SET returned_feedback = :feedback "
+                    "WHERE inbound_id = :inbound_id"
+                ),
+                feedback=json.dumps(legacy_feedback),
+                inbound_id=inbound_id,
+            )
+
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        for page_number in [2, 3]:
+            feedback = {"feedback_type": "negative", "page_number": page_number}
+            request_json.update(
+                {
+                    "inbound_id": inbound_id,
+                    "feedback_secret_key": "abc123",
+                    "feedback": feedback,
+                }
+            )
+            client.put("/inbound/feedback", json=request_json, headers=headers)
+
+        with db_engine.connect() as db_connection:
+            returned_feedback = db_connection.execute(
+                text("SELECT returned_feedback FROM inbounds WHERE inbound_id = :id"),
+                id=inbound_id,
+            ).scalar()
+
+        assert returned_feedback == [
+            legacy_feedback,
+            {"feedback_type": "negative", "page_number": 2},
+            {"feedback_type": "negative", "page_number": 3},
+        ]
+
     def test_inbound_feedback_no_faq_id(
         self, inbounds, inbound_id, client, request_json
     ):
@@ -368,6 +422,90 @@ class TestInboundPagination:
 
         assert len(top_results_page1.intersection(top_results_page2)) == 0
 
+    def test_next_page_served_from_recent_inbounds(
+        self, client, inbound_response_json, monkeypatch
+    ):
+        def _fail_get_inbound(inbound_id):
+            raise AssertionError("Inbound read from the database")
+
+        monkeypatch.setattr(app.main.inbound, "get_inbound", _fail_get_inbound)
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        page_response = client.get(
+            inbound_response_json["next_page_url"], headers=headers
+        )
+
+        assert page_response.status_code == 200
+
+    def test_feedback_on_recent_inbound_not_read(
+        self, client, inbound_response_json, db_engine, monkeypatch
+    ):
+        def _fail_get_inbound(inbound_id, columns=None):
+            raise AssertionError("Inbound read from the database")
+
+        monkeypatch.setattr(app.main.inbound, "get_inbound", _fail_get_inbound)
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        feedback_response = client.put(
+            "/inbound/feedback",
+            json={
+                "inbound_id": inbound_response_json["inbound_id"],
+                "feedback_secret_key": inbound_response_json["feedback_secret_key"],
+                "feedback": {"feedback_type": "positive", "faq_id": 3},
+            },
+            headers=headers,
+        )
+        with db_engine.connect() as db_connection:
+            returned_feedback = db_connection.execute(
+                text(
+                    "SELECT returned_feedback FROM inbounds "
+                    "WHERE inbound_id = :inbound_id"
+                ),
+                inbound_id=int(inbound_response_json["inbound_id"]),
+            ).scalar()
+
+        assert feedback_response.status_code == 200
+        assert returned_feedback == [{"feedback_type": "positive", "faq_id": 3}]
+
+    def test_feedback_caches_inbound_not_cached(
+        self, app_main, client, inbound_response_json, monkeypatch
+    ):
+        app_main.recent_inbounds.clear()
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        feedback_request = {
+            "inbound_id": inbound_response_json["inbound_id"],
+            "feedback_secret_key": inbound_response_json["feedback_secret_key"],
+            "feedback": {"feedback_type": "positive", "faq_id": 3},
+        }
+        client.put("/inbound/feedback", json=feedback_request, headers=headers)
+
+        def _fail_get_inbound(inbound_id, columns=None):
+            raise AssertionError("Inbound read from the database")
+
+        monkeypatch.setattr(app.main.inbound, "get_inbound", _fail_get_inbound)
+        feedback_response = client.put(
+            "/inbound/feedback", json=feedback_request, headers=headers
+        )
+        page_response = client.get(
+            inbound_response_json["next_page_url"], headers=headers
+        )
+
+        assert feedback_response.status_code == 200
+        assert page_response.status_code == 200
+
+    def test_next_page_same_when_not_cached(
+        self, app_main, client, inbound_response_json
+    ):
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        next_page_url = inbound_response_json["next_page_url"]
+        cached_response = client.get(next_page_url, headers=headers)
+        app_main.recent_inbounds.clear()
+        db_response = client.get(next_page_url, headers=headers)
+
+        assert db_response.status_code == 200
+        assert (
+            db_response.get_json()["top_responses"]
+            == cached_response.get_json()["top_responses"]
+        )
+
     def test_accessing_valid_prev_page(self, client, inbound_response_json):
         headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
 
@@ -406,6 +544,307 @@ class TestInboundPagination:
         assert nonexistent_page_response.status_code == 404
 
 
+class TestCompactScoring:
+    @pytest.fixture
+    def page_2_responses(self, app_main, client, db_engine, faq_data, monkeypatch):
+        """Page 2 of the same inbound, with scoring stored as JSON and compactly"""
+        monkeypatch.setattr(app.main.inbound, "FAQ_SNAPSHOT_IDS", {})
+        request_data = {
+            "text_to_match": "I love going hiking. What should I pack for lunch?",
+        }
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+
+        responses = {}
+        for compact_scoring in [False, True]:
+            monkeypatch.setitem(app_main.config, "COMPACT_SCORING", compact_scoring)
+            response = client.post("/inbound/check", json=request_data, headers=headers)
+            next_page_url = response.get_json()["next_page_url"]
+            responses[compact_scoring] = client.get(next_page_url, headers=headers)
+
+        yield responses
+
+        with db_engine.connect() as db_connection:
+            db_connection.execute(text("DELETE FROM inbounds"))
+            db_connection.execute(text("DELETE FROM faq_snapshots"))
+
+    def test_compact_scoring_pages_same_as_json(self, page_2_responses):
+        assert page_2_responses[True].status_code == 200
+        assert (
+            page_2_responses[True].get_json()["top_responses"]
+            == page_2_responses[False].get_json()["top_responses"]
+        )
+
+    def test_compact_scoring_not_saved_as_json(self, page_2_responses, db_engine):
+        with db_engine.connect() as db_connection:
+            rows = db_connection.execute(
+                text(
+                    "SELECT model_scoring, model_scores FROM inbounds "
+                    "WHERE model_scores IS NOT NULL"
+                )
+            ).fetchall()
+
+        assert len(rows) == 1
+        assert list(rows[0][0]) == ["spell_corrected"]
+
+
+class TestWriteBehind:
+    @pytest.fixture
+    def inbound_writer(self, app_main, db_engine, monkeypatch):
+        # Long flush interval, so that rows are only written when flushed
+        inbound_writer = InboundWriter(
+            app_main,
+            max_queue_size=100,
+            batch_size=10,
+            flush_interval=60,
+            id_block_size=10,
+        )
+        monkeypatch.setattr(app_main, "inbound_writer", inbound_writer)
+
+        yield inbound_writer
+
+        inbound_writer.stop()
+        with db_engine.connect() as db_connection:
+            db_connection.execute(text("DELETE FROM inbounds"))
+
+    @pytest.fixture
+    def inbound_response_json(self, client, inbound_writer, faq_data):
+        request_data = {
+            "text_to_match": "I love going hiking. What should I pack for lunch?",
+        }
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        response = client.post("/inbound/check", json=request_data, headers=headers)
+
+        return response.get_json()
+
+    def test_inbound_written_when_flushed(
+        self, inbound_response_json, inbound_writer, db_engine
+    ):
+        inbound_id = int(inbound_response_json["inbound_id"])
+        select_inbound = text(
+            "SELECT returned_content FROM inbounds WHERE inbound_id = :inbound_id"
+        )
+
+        inbound_writer.flush()
+        with db_engine.connect() as db_connection:
+            rows = db_connection.execute(
+                select_inbound, inbound_id=inbound_id
+            ).fetchall()
+
+        assert len(rows) == 1
+        assert "inbound_id" not in rows[0][0]
+
+    def test_ids_reserved_in_blocks(self, app_main, monkeypatch):
+        id_allocator = InboundIdAllocator(block_size=5)
+        reserved_blocks = []
+        reserve = id_allocator._reserve
+
+        def _reserve():
+            reserved_blocks.append(reserve())
+            return reserved_blocks[-1]
+
+        monkeypatch.setattr(id_allocator, "_reserve", _reserve)
+
+        with app_main.app_context():
+            inbound_ids = [id_allocator.next_id() for _ in range(7)]
+
+        assert len(set(inbound_ids)) == 7
+        assert [len(block) for block in reserved_blocks] == [5, 5]
+
+    def test_queued_inbound_pages_and_feedback_found(
+        self, client, inbound_response_json
+    ):
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        page_response = client.get(
+            inbound_response_json["next_page_url"], headers=headers
+        )
+        feedback_response = client.put(
+            "/inbound/feedback",
+            json={
+                "inbound_id": inbound_response_json["inbound_id"],
+                "feedback_secret_key": inbound_response_json["feedback_secret_key"],
+                "feedback": {"feedback_type": "positive", "faq_id": 3},
+            },
+            headers=headers,
+        )
+
+        assert page_response.status_code == 200
+        assert feedback_response.status_code == 200
+
+    def test_failed_rows_saved_and_replayed(
+        self,
+        app_main,
+        client,
+        inbound_writer,
+        faq_data,
+        db_engine,
+        monkeypatch,
+        tmp_path,
+    ):
+        dead_letter_path = str(tmp_path / "failed_inbounds.jsonl")
+        monkeypatch.setattr(inbound_writer, "retry_wait", 0)
+        monkeypatch.setattr(inbound_writer, "dead_letter_path", dead_letter_path)
+        insert = inbound_writer._insert
+
+        def _insert(rows):
+            if any(row["inbound_metadata"] == {"fail": True} for row in rows):
+                raise RuntimeError("Insert failed")
+            insert(rows)
+
+        monkeypatch.setattr(inbound_writer, "_insert", _insert)
+
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        inbound_ids = []
+        for metadata in [{"fail": False}, {"fail": True}, {"fail": False}]:
+            response = client.post(
+                "/inbound/check",
+                json={"text_to_match": "What should I pack?", "metadata": metadata},
+                headers=headers,
+            )
+            inbound_ids.append(response.get_json()["inbound_id"])
+        inbound_writer.flush()
+
+        select_ids = text("SELECT inbound_id FROM inbounds ORDER BY inbound_id")
+        with db_engine.connect() as db_connection:
+            written = [row[0] for row in db_connection.execute(select_ids)]
+        with open(dead_letter_path) as dead_letter_file:
+            failed = loads_dead_letters(dead_letter_file)
+
+        assert written == [inbound_ids[0], inbound_ids[2]]
+        assert [row["inbound_id"] for row in failed] == [inbound_ids[1]]
+        assert isinstance(failed[0]["inbound_utc"], datetime)
+
+        with app_main.app_context():
+            assert replay_dead_letters(dead_letter_path) == 1
+        with db_engine.connect() as db_connection:
+            written = [row[0] for row in db_connection.execute(select_ids)]
+
+        assert written == sorted(inbound_ids)
+
+
+class TestInboundBatch:
+    messages = [
+        {"text_to_match": "I love going hiking. What should I pack for lunch?"},
+        {
+            "text_to_match": "Can I enjoy movies while deploying the new version?",
+            "context": ["deploy"],
+            "metadata": {"channel": "batch"},
+        },
+    ]
+
+    @pytest.fixture
+    def batch_response(self, client, db_engine, faq_data):
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        response = client.post(
+            "/inbound/check-batch", json={"messages": self.messages}, headers=headers
+        )
+
+        yield response
+
+        with db_engine.connect() as db_connection:
+            db_connection.execute(text("DELETE FROM inbounds"))
+
+    def test_batch_returns_result_per_message(self, client, batch_response):
+        request_data = {"text_to_match": self.messages[0]["text_to_match"]}
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        single_json = client.post(
+            "/inbound/check", json=request_data, headers=headers
+        ).get_json()
+        results = batch_response.get_json()["results"]
+
+        assert batch_response.status_code == 200
+        assert len(results) == len(self.messages)
+        assert set(results[0]) == set(single_json)
+        assert results[0]["top_responses"] == single_json["top_responses"]
+
+    def test_batch_inbounds_saved_in_order(self, batch_response, db_engine):
+        results = batch_response.get_json()["results"]
+        with db_engine.connect() as db_connection:
+            rows = db_connection.execute(
+                text("SELECT inbound_id, inbound_text FROM inbounds")
+            ).fetchall()
+        texts_by_id = dict(rows)
+
+        assert [texts_by_id[int(result["inbound_id"])] for result in results] == [
+            message["text_to_match"] for message in self.messages
+        ]
+
+    def test_batch_pages_accessible(self, client, batch_response):
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        for result in batch_response.get_json()["results"]:
+            page_response = client.get(result["next_page_url"], headers=headers)
+
+            assert page_response.status_code == 200
+            assert page_response.get_json()["inbound_id"] == result["inbound_id"]
+
+    @pytest.mark.parametrize(
+        "request_data",
+        [
+            {"messages": []},
+            {"messages": [{"context": ["deploy"]}]},
+            {"messages": [{"text_to_match": "hello"}] * 101},
+        ],
+    )
+    def test_bad_batch_rejected(self, client, request_data):
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        response = client.post(
+            "/inbound/check-batch", json=request_data, headers=headers
+        )
+
+        assert response.status_code == 400
+
+
+class TestResponseCache:
+    @pytest.fixture
+    def cached_response_json(self, app_main, client, db_engine, faq_data):
+        app_main.response_cache.clear()
+        request_data = {
+            "text_to_match": "I love going hiking. What should I pack for lunch?",
+        }
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        response = client.post("/inbound/check", json=request_data, headers=headers)
+
+        yield response.get_json()
+
+        app_main.response_cache.clear()
+        with db_engine.connect() as db_connection:
+            db_connection.execute(text("DELETE FROM inbounds"))
+
+    def test_repeated_message_not_scored_again(
+        self, app_main, client, cached_response_json, monkeypatch
+    ):
+        def _fail_score_contents(*args, **kwargs):
+            raise AssertionError("Message scored again")
+
+        monkeypatch.setattr(
+            app_main.faq_snapshot.faqt_model, "score_contents", _fail_score_contents
+        )
+        request_data = {
+            "text_to_match": "  I love going hiking.  What should I pack for lunch?",
+        }
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        response = client.post("/inbound/check", json=request_data, headers=headers)
+        json_data = response.get_json()
+
+        assert response.status_code == 200
+        assert json_data["top_responses"] == cached_response_json["top_responses"]
+        assert json_data["inbound_id"] != cached_response_json["inbound_id"]
+        assert (
+            json_data["feedback_secret_key"]
+            != cached_response_json["feedback_secret_key"]
+        )
+
+    def test_cache_key_changes_with_snapshot(self, app_main):
+        snapshot = app_main.faq_snapshot
+        key = get_response_cache_key("hello  there", ["test", "deploy"], snapshot)
+
+        assert key == get_response_cache_key(
+            "hello there", ["deploy", "test"], snapshot
+        )
+        assert key != get_response_cache_key(
+            "hello there", ["deploy", "test"], snapshot.replace(version=(0,))
+        )
+
+
 class TestInboundCachedRefreshes:
     @pytest.mark.parametrize(
         "refresh_func, hash_value",
@@ -513,3 +952,130 @@ class TestInboundCachedRefreshes:
         captured = capsys.readouterr()
 
         assert captured.out.strip() == expected_output
+
+
+class TestResultAssembly:
+    @pytest.fixture
+    def faqs(self):
+        return [
+            TemporaryModel(
+                faq_id=faq_id,
+                faq_title=f"Title #{faq_id}",
+                faq_content_to_send=f"Content #{faq_id}",
+            )
+            for faq_id in [3, 5, 8, 13]
+        ]
+
+    def test_scoring_ranks_and_order_match(self, faqs):
+        scoring, ranked_faq_ids = prepare_scoring_as_json(
+            faqs, [0.2, 0.9, 0.1, 0.5], []
+        )
+
+        ranks = [scoring[faq_id]["rank"] for faq_id in ranked_faq_ids]
+
+        assert ranked_faq_ids == [5, 13, 3, 8]
+        assert ranks == ["1", "2", "3", "4"]
+
+    def test_top_n_matches_same_with_or_without_ranked_ids(self, faqs):
+        scoring, ranked_faq_ids = prepare_scoring_as_json(
+            faqs, [0.2, 0.9, 0.1, 0.5], []
+        )
+        # As when read back from the database
+        stored_scoring = {str(faq_id): scores for faq_id, scores in scoring.items()}
+        faqs_by_id = {faq.faq_id: faq for faq in faqs}
+
+        from_ranked_ids = get_top_n_matches(
+            scoring, 2, 1, ranked_faq_ids=ranked_faq_ids, faqs_by_id=faqs_by_id
+        )
+        from_stored = get_top_n_matches(stored_scoring, 2, 1, faqs_by_id=faqs_by_id)
+
+        assert from_ranked_ids == from_stored
+        assert from_ranked_ids == [
+            ("13", "Title #13", "Content #13"),
+            ("3", "Title #3", "Content #3"),
+        ]
+
+    def test_top_k_scoring_only_ranks_top_faqs(self, faqs):
+        scoring, ranked_faq_ids = prepare_scoring_as_json(
+            faqs, [0.2, 0.9, 0.1, 0.5], [], n_ranked=2
+        )
+
+        assert ranked_faq_ids == [5, 13]
+        assert scoring[5]["rank"] == "1"
+        assert scoring[13]["rank"] == "2"
+        assert "rank" not in scoring[3]
+        assert scoring[3]["overall_score"] == "0.2"
+
+    @pytest.mark.parametrize("n_ranked", [None, 1, 2, 3])
+    def test_tied_scores_ranked_by_faq_id(self, faqs, n_ranked):
+        scoring, ranked_faq_ids = prepare_scoring_as_json(
+            faqs, [0.5, 0.9, 0.5, 0.5], [], n_ranked=n_ranked
+        )
+
+        expected = [5, 3, 8, 13][:n_ranked]
+        assert ranked_faq_ids == expected
+        assert [scoring[faq_id]["rank"] for faq_id in expected] == [
+            str(rank) for rank in range(1, len(expected) + 1)
+        ]
+
+    def test_deeper_pages_ranked_lazily(self, faqs):
+        scores = [0.2, 0.9, 0.1, 0.5]
+        full_scoring, _ = prepare_scoring_as_json(faqs, scores, [])
+        top_scoring, _ = prepare_scoring_as_json(faqs, scores, [], n_ranked=2)
+        faqs_by_id = {faq.faq_id: faq for faq in faqs}
+
+        for start_idx in [0, 2]:
+            assert get_top_n_matches(
+                top_scoring, 2, start_idx, faqs_by_id=faqs_by_id
+            ) == get_top_n_matches(full_scoring, 2, start_idx, faqs_by_id=faqs_by_id)
+
+    def test_pages_past_prefilter_cut_off_same_however_stored(self):
+        # Two FAQs scored in full by the prefilter, the others given the floor score
+        faqs = [
+            TemporaryModel(
+                faq_id=faq_id,
+                faq_title=f"Title #{faq_id}",
+                faq_content_to_send=f"Content #{faq_id}",
+            )
+            for faq_id in [2, 4, 6, 8, 10, 12, 14]
+        ]
+        faqs_by_id = {faq.faq_id: faq for faq in faqs}
+        scores = [PREFILTER_FLOOR_SCORE] * len(faqs)
+        scores[3] = 0.5
+        scores[5] = 0.25
+        n_per_page = 2
+
+        # Recent inbound cache
+        scoring, ranked_faq_ids = prepare_scoring_as_json(faqs, scores, [])
+        # Top-k scoring read back from the database
+        top_scoring, _ = prepare_scoring_as_json(faqs, scores, [], n_ranked=2)
+        top_scoring = {str(faq_id): value for faq_id, value in top_scoring.items()}
+        # Compact scoring read back from the database
+        compact_scoring, compact_ranked_faq_ids = scoring_from_scores(
+            encode_scores(scores),
+            [faq.faq_id for faq in faqs],
+            [faq.faq_title for faq in faqs],
+        )
+
+        pages = []
+        for kwargs in [
+            dict(scoring=scoring, ranked_faq_ids=ranked_faq_ids),
+            dict(scoring=top_scoring),
+            dict(scoring=compact_scoring, ranked_faq_ids=compact_ranked_faq_ids),
+        ]:
+            pages.append(
+                [
+                    faq_id
+                    for start_idx in range(0, len(faqs), n_per_page)
+                    for faq_id, _, _ in get_top_n_matches(
+                        n_top_matches=n_per_page,
+                        start_idx=start_idx,
+                        faqs_by_id=faqs_by_id,
+                        **kwargs,
+                    )
+                ]
+            )
+
+        assert pages[0] == ["8", "12", "2", "4", "6", "10", "14"]
+        assert pages[1] == pages[0]
+        assert pages[2] == pages[0]
@@ -0,0 +1,115 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from core_model.app.src.inbound_partitions import (
+    add_months,
+    create_partitions,
+    get_partition_name,
+    get_partitions,
+    parse_upper_bound,
+)
+
+
+class TestPartitionBounds:
+    def test_add_months_crosses_years(self):
+        timestamp = datetime(2023, 11, 17, 8, 30)
+
+        assert add_months(timestamp, 0) == datetime(2023, 11, 1)
+        assert add_months(timestamp, 2) == datetime(2024, 1, 1)
+        assert add_months(timestamp, -11) == datetime(2022, 12, 1)
+
+    def test_partition_name(self):
+        assert get_partition_name(datetime(2024, 3, 1)) == "inbounds_y2024m03"
+
+    def test_parse_upper_bound(self):
+        range_bound = (
+            "FOR VALUES FROM ('2023-05-01 00:00:00') TO ('2023-06-01 00:00:00')"
+        )
+        legacy_bound = "FOR VALUES FROM (MINVALUE) TO ('2023-05-01 00:00:00')"
+
+        assert parse_upper_bound(range_bound) == datetime(2023, 6, 1)
+        assert parse_upper_bound(legacy_bound) == datetime(2023, 5, 1)
+        assert parse_upper_bound("DEFAULT") is None
+
+
+class TestCreatePartitions:
+    def test_partitions_cover_months_ahead(self, db_engine):
+        with db_engine.connect() as connection:
+            transaction = connection.begin()
+            create_partitions(connection, months_ahead=2)
+            partitions = get_partitions(connection)
+            transaction.rollback()
+
+        assert partitions[-1][1] >= add_months(datetime.utcnow(), 3)
+
+    def test_create_partitions_is_idempotent(self, db_engine):
+        with db_engine.connect() as connection:
+            transaction = connection.begin()
+            create_partitions(connection, months_ahead=2)
+            created_again = create_partitions(connection, months_ahead=2)
+            transaction.rollback()
+
+        assert created_again == []
+
+
+class TestFeedbackAfterCreatePartitions:
+    insert_inbound = text(
+        "INSERT INTO inbounds ("
+        "inbound_text, feedback_secret_key, inbound_secret_key, inbound_metadata, "
+        "inbound_utc, model_scoring, returned_content, returned_utc) "
+        "VALUES ('is the vaccine safe?', 'abc123', 'abc456', '{}', :utc, '{}', "
+        "'{}', :utc) RETURNING inbound_id"
+    )
+
+    @pytest.fixture
+    def inbound_utc(self):
+        # Beyond the monthly partitions, so the inbound lands in the default one
+        return add_months(datetime.utcnow(), 24) + timedelta(days=10, hours=5)
+
+    @pytest.fixture
+    def moved_inbound_id(self, db_engine, inbound_utc):
+        with db_engine.connect() as connection:
+            with connection.begin():
+                inbound_id = connection.execute(
+                    self.insert_inbound, utc=inbound_utc
+                ).scalar()
+            with connection.begin():
+                created = create_partitions(connection, months_ahead=24)
+
+        yield inbound_id
+
+        with db_engine.connect() as connection:
+            with connection.begin():
+                connection.execute(
+                    text("DELETE FROM inbounds WHERE inbound_id = :inbound_id"),
+                    inbound_id=inbound_id,
+                )
+                for partition_name in created:
+                    connection.execute(text(f"DROP TABLE {partition_name}"))
+
+    def test_feedback_found_in_monthly_partition(
+        self, client, db_engine, inbound_utc, moved_inbound_id
+    ):
+        request_json = {
+            "inbound_id": moved_inbound_id,
+            "feedback_secret_key": "abc123",
+            "feedback": {"feedback_type": "positive", "faq_id": 3},
+        }
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        response = client.put("/inbound/feedback", json=request_json, headers=headers)
+
+        with db_engine.connect() as connection:
+            partition_name, returned_feedback = connection.execute(
+                text(
+                    "SELECT tableoid::regclass::text, returned_feedback "
+                    "FROM inbounds WHERE inbound_id = :inbound_id"
+                ),
+                inbound_id=moved_inbound_id,
+            ).one()
+
+        assert response.status_code == 200
+        assert partition_name == get_partition_name(add_months(inbound_utc, 0))
+        assert returned_feedback == [request_json["feedback"]]
@@ -5,6 +5,8 @@ import pytest
 import yaml
 from sqlalchemy import text
 
+from core_model import app
+
 insert_faq = (
     "INSERT INTO faqmatches ("
     "faq_tags,faq_questions,faq_contexts, faq_author, faq_title, faq_content_to_send, "
@@ -84,3 +86,51 @@ class TestRefresh:
         response = client_no_refresh.get("/internal/refresh-faqs", headers=headers)
         assert response.status_code == 200
         assert response.get_data() == b"Successfully refreshed 6 FAQs"
+
+    def test_refresh_skipped_when_faqs_unchanged(
+        self, monkeypatch, load_faq_data, client_no_refresh
+    ):
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        client_no_refresh.get("/internal/refresh-faqs", headers=headers)
+
+        def _fail_reload(*args, **kwargs):
+            raise AssertionError("FAQs were reloaded")
+
+        monkeypatch.setattr(app, "add_faq_weight_share", _fail_reload)
+        response = client_no_refresh.get("/internal/refresh-faqs", headers=headers)
+
+        assert response.status_code == 200
+        assert response.get_data() == b"Successfully refreshed 6 FAQs"
+
+    def test_background_refresh_started_by_inbound(
+        self, monkeypatch, app_no_refresh, client_no_refresh
+    ):
+        monkeypatch.setitem(app_no_refresh.config, "REFRESH_IN_BACKGROUND", True)
+        request_data = {"text_to_match": "I love going hiking"}
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+
+        client_no_refresh.post("/inbound/check", json=request_data, headers=headers)
+        thread = app_no_refresh.background_refresh_thread
+        assert thread.is_alive()
+        assert app_no_refresh.background_refresh_pid == os.getpid()
+
+        client_no_refresh.post("/inbound/check", json=request_data, headers=headers)
+        assert app_no_refresh.background_refresh_thread is thread
+
+    def test_refresh_after_edit_without_updated_utc(
+        self, db_engine, load_faq_data, client_no_refresh
+    ):
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        client_no_refresh.get("/internal/refresh-faqs", headers=headers)
+
+        with db_engine.connect() as db_connection:
+            db_connection.execute(
+                text(
+                    "UPDATE faqmatches SET faq_tags = '{edited}' "
+                    "WHERE faq_author = 'Pytest refresh'"
+                )
+            )
+        client_no_refresh.get("/internal/refresh-faqs", headers=headers)
+
+        faqs = client_no_refresh.application.faq_snapshot.faqs
+        assert [faq.faq_tags for faq in faqs] == [["edited"]] * len(faqs)
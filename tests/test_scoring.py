@@ -0,0 +1,251 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from faqt import KeyedVectorsScorer
+from gensim.models import KeyedVectors
+
+from core_model.app.data_models import TemporaryModel
+from core_model.app.src.faq_cache import FAQTokenCache
+from core_model.app.src.scoring import (
+    PREFILTER_FLOOR_SCORE,
+    VectorizedScorer,
+    get_n_nearest,
+)
+from core_model.app.src.spelling import ThreadSafeHunspell
+
+WORDS = ["vaccine", "baby", "pregnant", "clinic", "fever", "sleep", "feed", "milk"]
+
+CONTENTS = [
+    "vaccine clinic",
+    "baby sleep feed milk",
+    "unknownword",
+    "pregnant fever clinic vaccine baby",
+]
+
+
+@pytest.fixture
+def keyed_vectors():
+    rng = np.random.default_rng(0)
+    model = KeyedVectors(vector_size=50)
+    model.add_vectors(WORDS, rng.normal(size=(len(WORDS), 50)).astype(np.float32))
+    return model
+
+
+def score_by_loop(keyed_vectors, message, contents, k, floor):
+    """
+    Reference scores, one content and token at a time: each content token scores
+    the mean of its nearest message token similarities, and a content the mean of
+    its token scores
+    """
+    message_tokens = [word for word in message.split() if word in keyed_vectors]
+    scores = []
+    for content in contents:
+        tag_scores = []
+        for tag in content.split():
+            if tag not in keyed_vectors:
+                continue
+            similarities = sorted(
+                keyed_vectors.similarity(tag, word) for word in message_tokens
+            )
+            n_nearest = get_n_nearest(len(similarities), k, floor)
+            tag_scores.append(np.mean(similarities[-n_nearest:]))
+        scores.append(np.mean(tag_scores) if tag_scores else 0)
+
+    return scores
+
+
+class TestVectorizedScorer:
+    @pytest.mark.parametrize("k, floor", [(10, 1), (50, 1), (100, 2)])
+    @pytest.mark.parametrize(
+        "message", ["vaccine", "my baby has a fever", "milk feed sleep baby clinic"]
+    )
+    def test_scores_match_loop(self, keyed_vectors, message, k, floor):
+        scorer = VectorizedScorer(
+            keyed_vectors, str.split, tag_scoring_kwargs={"k": k, "floor": floor}
+        )
+        scorer.set_contents(CONTENTS)
+
+        scores = scorer.score_contents(message)["overall_scores"]
+
+        expected = score_by_loop(keyed_vectors, message, CONTENTS, k, floor)
+        assert np.allclose(scores, expected, atol=1e-6)
+
+    def test_content_weights_added(self, keyed_vectors):
+        weights = [0.1, 0.2, 0.3, 0.4]
+        scorer = VectorizedScorer(
+            keyed_vectors,
+            str.split,
+            weighting_method="add_weight",
+            weighting_kwargs={"N": 5},
+        )
+        scorer.set_contents(CONTENTS, weights)
+
+        scores = scorer.score_contents("baby fever")["overall_scores"]
+
+        unweighted = score_by_loop(keyed_vectors, "baby fever", CONTENTS, 10, 1)
+        expected = (np.array(unweighted) + 5 * np.array(weights)) / 6
+        assert np.allclose(scores, expected, atol=1e-6)
+
+    def test_message_without_known_tokens_scores_zero(self, keyed_vectors):
+        scorer = VectorizedScorer(keyed_vectors, str.split)
+        scorer.set_contents(CONTENTS)
+
+        result = scorer.score_contents(
+            "nothing known", return_spell_corrected=True, return_tag_scores=True
+        )
+
+        assert result["overall_scores"] == [0, 0, 0, 0]
+        assert result["spell_corrected"] == []
+        assert result["tag_scores"][2] == {}
+
+    @pytest.mark.parametrize("prefilter_top_m", [0, 2])
+    def test_batch_matches_one_at_a_time(self, keyed_vectors, prefilter_top_m):
+        scorer = VectorizedScorer(
+            keyed_vectors,
+            str.split,
+            weighting_method="add_weight",
+            prefilter_top_m=prefilter_top_m,
+        )
+        scorer.set_contents(CONTENTS, [0.1, 0.2, 0.3, 0.4])
+        messages = ["vaccine", "nothing known", "my baby has a fever", "milk feed"]
+        weights = [None, None, [0.4, 0.3, 0.2, 0.1], None]
+
+        results = scorer.score_contents_batch(
+            messages, return_spell_corrected=True, weights=weights
+        )
+
+        assert len(results) == len(messages)
+        for message, message_weights, result in zip(messages, weights, results):
+            expected = scorer.score_contents(
+                message, return_spell_corrected=True, weights=message_weights
+            )
+            assert np.allclose(
+                result["overall_scores"], expected["overall_scores"], atol=1e-6
+            )
+            assert result["spell_corrected"] == expected["spell_corrected"]
+
+    def test_vectors_of_unchanged_faqs_reused(self, keyed_vectors):
+        token_cache = FAQTokenCache(str.split)
+        faqs = [
+            TemporaryModel(
+                faq_id=i,
+                faq_content_to_send=content,
+                faq_updated_utc=datetime(2022, 1, 1),
+            )
+            for i, content in enumerate(CONTENTS)
+        ]
+        token_cache.update(faqs)
+        VectorizedScorer(keyed_vectors, token_cache).set_contents(CONTENTS)
+        unchanged_vectors = token_cache.get_content_vectors(CONTENTS[0])
+
+        faqs[1] = TemporaryModel(
+            faq_id=1, faq_content_to_send="baby fever", faq_updated_utc=datetime.now()
+        )
+        token_cache.update(faqs)
+        contents = [faq.faq_content_to_send for faq in faqs]
+        scorer = VectorizedScorer(keyed_vectors, token_cache)
+        scorer.set_contents(contents)
+
+        assert token_cache.get_content_vectors(CONTENTS[0]) is unchanged_vectors
+        uncached_scorer = VectorizedScorer(keyed_vectors, str.split)
+        uncached_scorer.set_contents(contents)
+        assert np.allclose(
+            scorer.score_contents("my baby has a fever")["overall_scores"],
+            uncached_scorer.score_contents("my baby has a fever")["overall_scores"],
+        )
+
+    def test_score_before_set_contents_fails(self, keyed_vectors):
+        scorer = VectorizedScorer(keyed_vectors, str.split)
+
+        with pytest.raises(ValueError):
+            scorer.score_contents("vaccine")
+
+
+class TestPrefilter:
+    def test_candidates_scored_in_full_others_floored(self, keyed_vectors):
+        scorer = VectorizedScorer(keyed_vectors, str.split, prefilter_top_m=2)
+        scorer.set_contents(CONTENTS)
+        message = "my baby has a fever"
+
+        scores = scorer.score_contents(message)["overall_scores"]
+
+        candidates = scorer.get_candidates(scorer.get_message_vectors(message)[1], 2)
+        expected = score_by_loop(keyed_vectors, message, CONTENTS, 10, 1)
+        for i, score in enumerate(scores):
+            if i in candidates:
+                assert np.isclose(score, expected[i], atol=1e-6)
+            else:
+                assert score == PREFILTER_FLOOR_SCORE
+
+    def test_candidates_most_similar_centroids(self, keyed_vectors):
+        scorer = VectorizedScorer(keyed_vectors, str.split)
+        scorer.set_contents(CONTENTS)
+
+        candidates = scorer.get_candidates(
+            scorer.get_message_vectors("sleep feed milk")[1], 1
+        )
+
+        assert list(candidates) == [1]
+
+    @pytest.mark.parametrize("top_m", [0, 4, 10])
+    def test_all_contents_scored_if_top_m_not_less(self, keyed_vectors, top_m):
+        scorer = VectorizedScorer(keyed_vectors, str.split, prefilter_top_m=top_m)
+        scorer.set_contents(CONTENTS)
+
+        scores = scorer.score_contents("baby clinic")["overall_scores"]
+
+        expected = score_by_loop(keyed_vectors, "baby clinic", CONTENTS, 10, 1)
+        assert np.allclose(scores, expected, atol=1e-6)
+
+
+class TestParityWithFaqt:
+    """
+    Scores of `VectorizedScorer` against those of faqt's own keyed vectors scorer,
+    with the same settings
+    """
+
+    contents = [
+        "vaccine clinic",
+        "baby sleep feed milk",
+        "pregnant fever clinic vaccine baby",
+        "milk",
+    ]
+    messages = [
+        "vaccine",
+        "my baby has a fever",
+        "is the vacine safe when pregnant",
+        # Over 10 tokens with vectors, so that more than one nearest token counts
+        "baby milk feed sleep fever clinic vaccine pregnant baby milk feed sleep",
+    ]
+
+    @pytest.mark.parametrize("k, floor", [(10, 1), (50, 1), (100, 2)])
+    @pytest.mark.parametrize("weights", [None, [0.1, 0.2, 0.3, 0.4]])
+    def test_overall_scores_match_faqt(self, keyed_vectors, k, floor, weights):
+        settings = dict(
+            tokenizer=str.split,
+            weighting_method="add_weight" if weights else None,
+            weighting_kwargs={"N": 5} if weights else None,
+            hunspell=ThreadSafeHunspell(),
+            tag_scoring_kwargs={"k": k, "floor": floor},
+        )
+        faqt_scorer = KeyedVectorsScorer(
+            keyed_vectors,
+            tag_scoring_method="cs_nearest_k_percent_average",
+            score_reduction_method="simple_mean",
+            **settings,
+        )
+        faqt_scorer.set_contents(self.contents, weights)
+        vectorized_scorer = VectorizedScorer(keyed_vectors, **settings)
+        vectorized_scorer.set_contents(self.contents, weights)
+
+        for message in self.messages:
+            expected = faqt_scorer.score_contents(message, return_spell_corrected=True)
+            result = vectorized_scorer.score_contents(
+                message, return_spell_corrected=True
+            )
+
+            assert np.allclose(
+                result["overall_scores"], expected["overall_scores"], atol=1e-6
+            )
+            assert result["spell_corrected"] == expected["spell_corrected"]
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from core_model.app.src.spelling import ThreadSafeHunspell
+
+
+class FakeHunspell:
+    """Records how many calls run at once"""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.n_calls = 0
+        self.lang = "en_US"
+
+    def _call(self, result):
+        self.n_calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        time.sleep(0.001)
+        self.running -= 1
+        return result
+
+    def spell(self, word):
+        return self._call(word == "vaccine")
+
+    def suggest(self, word):
+        return self._call(("vaccine",))
+
+    def stem(self, word):
+        return self._call((word,))
+
+    def add(self, word):
+        return self._call(None)
+
+
+class TestThreadSafeHunspell:
+    def test_calls_delegated(self):
+        hunspell = ThreadSafeHunspell(FakeHunspell())
+
+        assert hunspell.spell("vaccine")
+        assert not hunspell.spell("vacine")
+        assert hunspell.suggest("vacine") == ("vaccine",)
+        assert hunspell.stem("vaccines") == ("vaccines",)
+        assert hunspell.lang == "en_US"
+
+    def test_calls_from_threads_serialized(self):
+        fake = FakeHunspell()
+        hunspell = ThreadSafeHunspell(fake)
+
+        def check_words():
+            for _ in range(20):
+                hunspell.spell("vacine")
+                hunspell.suggest("vacine")
+                hunspell.stem("vaccines")
+
+        threads = [threading.Thread(target=check_words) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert fake.max_running == 1
+
+
+class TestSpellingMemo:
+    def test_repeated_words_not_checked_again(self):
+        fake = FakeHunspell()
+        hunspell = ThreadSafeHunspell(fake, memo_size=10)
+
+        for _ in range(3):
+            assert not hunspell.spell("vacine")
+            assert hunspell.suggest("vacine") == ("vaccine",)
+
+        assert fake.n_calls == 2
+
+    def test_memo_bounded(self):
+        fake = FakeHunspell()
+        hunspell = ThreadSafeHunspell(fake, memo_size=1)
+
+        hunspell.suggest("vacine")
+        hunspell.suggest("vacsine")
+        hunspell.suggest("vacine")
+
+        assert fake.n_calls == 3
+
+    def test_memo_cleared_when_dictionary_changes(self):
+        fake = FakeHunspell()
+        hunspell = ThreadSafeHunspell(fake, memo_size=10)
+
+        hunspell.suggest("vacine")
+        hunspell.add("vacine")
+        hunspell.suggest("vacine")
+
+        assert fake.n_calls == 3
+
+    def test_memo_warm_started_from_file(self, tmp_path):
+        memo_path = str(tmp_path / "spelling_memo.json")
+        saved = ThreadSafeHunspell(FakeHunspell(), memo_size=10)
+        saved.suggest("vacine")
+        saved.save_memo(memo_path, version="1:v1")
+
+        fake = FakeHunspell()
+        loaded = ThreadSafeHunspell(fake, memo_size=10)
+
+        assert loaded.load_memo(memo_path, version="1:v1") == 1
+        assert loaded.suggest("vacine") == ("vaccine",)
+        assert fake.n_calls == 0
+
+    def test_memo_from_other_language_context_ignored(self, tmp_path):
+        memo_path = str(tmp_path / "spelling_memo.json")
+        saved = ThreadSafeHunspell(FakeHunspell(), memo_size=10)
+        saved.suggest("vacine")
+        saved.save_memo(memo_path, version="1:v1")
+
+        loaded = ThreadSafeHunspell(FakeHunspell(), memo_size=10)
+
+        assert loaded.load_memo(memo_path, version="1:v2") == 0
@@ -0,0 +1,60 @@
+import pytest
+
+from core_model.app.src.symspell import SymSpellChecker, SymSpellIndex, edit_distance
+
+
+class FakeKeyedVectors:
+    index_to_key = ["the", "Vaccine", "vaccines", "COVID-19", "pregnant", "baby"]
+
+
+@pytest.fixture
+def index():
+    return SymSpellIndex.from_keyed_vectors(FakeKeyedVectors(), max_vocab_size=10)
+
+
+class TestEditDistance:
+    @pytest.mark.parametrize(
+        "source, target, distance",
+        [
+            ("vaccine", "vaccine", 0),
+            ("vacine", "vaccine", 1),
+            ("vacicne", "vaccine", 1),
+            ("vaxcin", "vaccine", 2),
+            ("baby", "vaccine", 3),
+        ],
+    )
+    def test_edit_distance(self, source, target, distance):
+        assert edit_distance(source, target, max_distance=2) == min(distance, 3)
+
+
+class TestSymSpell:
+    def test_vocabulary_lowercased_alphabetic_words(self, index):
+        assert len(index) == 5
+        assert "vaccine" in index
+        assert "covid-19" not in index
+
+    def test_vocabulary_size_limited(self):
+        index = SymSpellIndex.from_keyed_vectors(FakeKeyedVectors(), max_vocab_size=2)
+
+        assert len(index) == 2
+
+    def test_suggestions_by_distance_then_frequency(self, index):
+        checker = SymSpellChecker(index)
+
+        assert checker.suggest("vacine") == ["vaccine", "vaccines"]
+        assert checker.suggest("pregnnt") == ["pregnant"]
+        assert checker.suggest("xylophone") == []
+
+    def test_extra_words_suggested_first(self, index):
+        checker = SymSpellChecker(index, extra_words=["vaccinee"])
+
+        assert checker.suggest("vaccine") == ["vaccine", "vaccinee", "vaccines"]
+        assert checker.spell("vaccinee")
+        assert not checker.spell("vacine")
+
+    def test_index_saved_and_loaded(self, index, tmp_path):
+        index_path = str(tmp_path / "symspell.pkl")
+        index.save(index_path)
+        loaded = SymSpellIndex.load(index_path)
+
+        assert SymSpellChecker(loaded).suggest("vacine") == ["vaccine", "vaccines"]
@@ -1,4 +1,5 @@
 import os
+
 import pytest
 
 
@@ -34,6 +35,19 @@ class TestNewTagTool:
             == "*** NEW TAGS MATCHED ***"
         )
 
+    def test_check_new_tags_leaves_snapshot_unchanged(self, app_main, client):
+        snapshot = app_main.faq_snapshot
+        weight_shares = [faq.faq_weight_share for faq in snapshot.faqs]
+        request_data = {
+            "tags_to_check": ["banana", "health", "fruit"],
+            "queries_to_check": ["nutrition facts for bananas"],
+        }
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        client.post("/tools/check-new-tags", json=request_data, headers=headers)
+
+        assert app_main.faq_snapshot is snapshot
+        assert [faq.faq_weight_share for faq in snapshot.faqs] == weight_shares
+
     def test_validate_tags(self, client):
         request_data = {"tags_to_check": ["banana", "health", "fruit"]}
         headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
@@ -5,8 +5,10 @@ import sqlalchemy
 import yaml
 from sqlalchemy.pool import NullPool
 
+from core_model import app
 from core_model.app import create_app, get_config_data, init_faqt_model
 from core_model.app.main import inbound
+from core_model.app.src.embeddings import compress_word_embeddings
 
 
 @pytest.fixture(scope="session")
@@ -21,6 +23,9 @@ def monkeysession():
 @pytest.fixture(scope="session")
 def patch_inbound_db(monkeysession):
     monkeysession.setattr(inbound, "save_inbound_to_db", lambda *x, **y: 123)
+    monkeysession.setattr(
+        inbound, "save_inbounds_to_db", lambda rows: list(range(123, 123 + len(rows)))
+    )
 
 
 @pytest.fixture(scope="session")
@@ -44,6 +49,73 @@ def client(app_main):
         yield client
 
 
+@pytest.fixture(scope="session", params=["float16", "int8"])
+def app_compact_storage(request, test_params, app_main):
+    """App using the same embeddings as `app_main`, stored as `request.param`"""
+    from _pytest.monkeypatch import MonkeyPatch
+
+    compact_embeddings = compress_word_embeddings(
+        app_main.word_embedding_model, request.param
+    )
+    with MonkeyPatch.context() as mpatch:
+        mpatch.setattr(app, "load_embeddings", lambda *x: compact_embeddings)
+        compact_app = create_app(test_params)
+        init_faqt_model(compact_app)
+
+    compact_app.embedding_storage = request.param
+    return compact_app
+
+
+@pytest.fixture(scope="session")
+def client_compact_storage(app_compact_storage):
+    with app_compact_storage.test_client() as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def app_symspell(test_params, app_main):
+    """App using the same embeddings as `app_main`, correcting spelling with SymSpell"""
+    from _pytest.monkeypatch import MonkeyPatch
+
+    with MonkeyPatch.context() as mpatch:
+        mpatch.setattr(app, "load_embeddings", lambda *x: app_main.word_embedding_model)
+        symspell_app = create_app({**test_params, "spelling": {"engine": "symspell"}})
+        init_faqt_model(symspell_app)
+
+    return symspell_app
+
+
+@pytest.fixture(scope="session")
+def client_symspell(app_symspell):
+    with app_symspell.test_client() as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def app_vectorized(test_params, app_main):
+    """App using the same embeddings as `app_main`, scoring with `VectorizedScorer`"""
+    from _pytest.monkeypatch import MonkeyPatch
+
+    matching_model = app_main.config["MATCHING_MODEL"]
+    with MonkeyPatch.context() as mpatch:
+        mpatch.setattr(app, "load_embeddings", lambda *x: app_main.word_embedding_model)
+        vectorized_app = create_app(
+            {
+                **test_params,
+                "model_params": {matching_model: {"scorer": "vectorized"}},
+            }
+        )
+        init_faqt_model(vectorized_app)
+
+    return vectorized_app
+
+
+@pytest.fixture(scope="session")
+def client_vectorized(app_vectorized):
+    with app_vectorized.test_client() as client:
+        yield client
+
+
 @pytest.fixture(scope="class")
 def db_engine(test_params):
     config = get_config_data(test_params)
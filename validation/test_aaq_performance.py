@@ -2,9 +2,13 @@
 Validation scripts
 """
 import os
+import random
+import string
+import time
 from datetime import datetime
 
 import boto3
+import numpy as np
 import pandas as pd
 import pytest
 from nltk.corpus import stopwords
@@ -13,6 +17,9 @@ from sqlalchemy import text
 # This is required to allow multithreading to work
 stopwords.ensure_loaded()
 
+# Candidate set sizes (`prefilter_top_m` in `parameters.yml`) to report recall for
+PREFILTER_TOP_MS = [5, 10, 20, 50]
+
 
 def generate_message(result, test_params):
     """Generate messages for validation results
@@ -79,6 +86,26 @@ def generate_message(result, test_params):
     return message
 
 
+def add_typos(message, rng, p_delete=0.02, p_insert=0.02, p_replace=0.02):
+    """
+    Add typos to `message` character by character, with the same probabilities as
+    `load_testing/locustfiles/val_msgs_spell.py`
+    """
+    new_message = ""
+    for character in message:
+        p = rng.random()
+        if p < p_delete:
+            continue
+        elif p < p_delete + p_insert:
+            new_message += character + rng.choice(string.ascii_lowercase)
+        elif p < p_delete + p_insert + p_replace:
+            new_message += rng.choice(string.ascii_lowercase)
+        else:
+            new_message += character
+
+    return new_message
+
+
 def send_notification(
     content="",
     topic="arn:aws:sns:ap-south-1:678681925278:praekelt-vaccnlp-developer-notifications",
@@ -141,6 +168,28 @@ class TestPerformance:
         top_faq_names = set(x[1] for x in top_responses)
         return row[test_params["TRUE_FAQ_COL"]] in top_faq_names
 
+    def submit_inbound_batch(self, rows, client, test_params):
+        """
+        Single request to /inbound/check-batch for a batch of validation messages
+        """
+        request_data = {
+            "messages": [
+                {"text_to_match": str(row[test_params["QUERY_COL"]])}
+                for _, row in rows.iterrows()
+            ],
+            "return_scoring": "true",
+        }
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        response = client.post(
+            "/inbound/check-batch", json=request_data, headers=headers
+        )
+
+        results = []
+        for (_, row), result in zip(rows.iterrows(), response.get_json()["results"]):
+            top_faq_names = set(x[1] for x in result["top_responses"])
+            results.append(row[test_params["TRUE_FAQ_COL"]] in top_faq_names)
+        return results
+
     @pytest.fixture(scope="class")
     def faq_data(self, client, db_engine, test_params):
 
@@ -183,6 +232,39 @@ class TestPerformance:
 
         client.get("/internal/refresh-faqs", headers=headers)
 
+    def get_top_k_results(self, client, test_params, validation_df=None, batch=False):
+        """
+        Whether the true FAQ of each validation message is in the top k FAQs
+        returned, sending messages to /inbound/check or, if `batch`, in batches to
+        /inbound/check-batch. Default on the validation data as is
+        """
+
+        if validation_df is None:
+            validation_df = self.get_validation_data(test_params)
+
+        if not batch:
+
+            def submit_one_inbound(x):
+                return self.submit_one_inbound(x, client, test_params)
+
+            return validation_df.apply(submit_one_inbound, axis=1).tolist()
+
+        batch_size = client.application.config["MAX_INBOUND_BATCH_SIZE"]
+        results = []
+        for start in range(0, len(validation_df), batch_size):
+            rows = validation_df.iloc[start : start + batch_size]
+            results.extend(self.submit_inbound_batch(rows, client, test_params))
+
+        return results
+
+    def get_top_k_accuracy(self, client, test_params, validation_df=None):
+        """
+        Share of validation messages whose true FAQ is in the top k FAQs returned.
+        Default on the validation data as is
+        """
+        results = self.get_top_k_results(client, test_params, validation_df)
+        return sum(results) / len(results)
+
     def test_top_k_performance(self, client, faq_data, test_params):
         """
         Test if top k faqs contain the true FAQ
@@ -207,3 +289,132 @@ class TestPerformance:
             print(content)
 
         return top_k_accuracy
+
+    @pytest.mark.parametrize("scorer", ["wmd", "vectorized"])
+    def test_top_k_performance_batch(
+        self, scorer, client, client_vectorized, faq_data, test_params
+    ):
+        """
+        Test that matching validation messages in batches with /inbound/check-batch
+        returns the same top k FAQs as /inbound/check
+        """
+        scorer_client = client if scorer == "wmd" else client_vectorized
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        scorer_client.get("/internal/refresh-faqs", headers=headers)
+        validation_df = self.get_validation_data(test_params)
+
+        results = self.get_top_k_results(scorer_client, test_params, validation_df)
+        # Score the batches rather than serve the scores cached above
+        if scorer_client.application.response_cache is not None:
+            scorer_client.application.response_cache.clear()
+        batch_results = self.get_top_k_results(
+            scorer_client, test_params, validation_df, batch=True
+        )
+
+        assert batch_results == results
+        print(
+            f"Top k accuracy with {scorer} scorer in batches: "
+            f"{sum(batch_results) / len(batch_results):.3f}"
+        )
+
+    def test_top_k_performance_compact_storage(
+        self, client, client_compact_storage, app_compact_storage, faq_data, test_params
+    ):
+        """
+        Report the change in top k accuracy from storing the embeddings compactly
+        (see `storage` in `data_sources.yml`)
+        """
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        client_compact_storage.get("/internal/refresh-faqs", headers=headers)
+
+        full_accuracy = self.get_top_k_accuracy(client, test_params)
+        compact_accuracy = self.get_top_k_accuracy(client_compact_storage, test_params)
+
+        print(
+            f"Top k accuracy with {app_compact_storage.embedding_storage} storage: "
+            f"{compact_accuracy:.3f} (float32: {full_accuracy:.3f}, "
+            f"delta: {compact_accuracy - full_accuracy:+.3f})"
+        )
+
+    def test_spelling_engines_on_typos(
+        self, client, client_symspell, faq_data, test_params
+    ):
+        """
+        Report top k accuracy and latency with Hunspell and SymSpell spelling
+        correction (see `spelling` in `parameters.yml`), on the validation messages
+        with typos added
+        """
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        client_symspell.get("/internal/refresh-faqs", headers=headers)
+
+        validation_df = self.get_validation_data(test_params)
+        query_col = test_params["QUERY_COL"]
+        rng = random.Random(0)
+        validation_df[query_col] = [
+            add_typos(str(message), rng) for message in validation_df[query_col]
+        ]
+
+        for engine, engine_client in [
+            ("hunspell", client),
+            ("symspell", client_symspell),
+        ]:
+            # Start from cold caches, so that each engine is timed on every message
+            engine_client.application.hunspell.clear_memo()
+            if engine_client.application.response_cache is not None:
+                engine_client.application.response_cache.clear()
+
+            start = time.perf_counter()
+            accuracy = self.get_top_k_accuracy(
+                engine_client, test_params, validation_df
+            )
+            seconds = time.perf_counter() - start
+
+            print(
+                f"Top k accuracy on messages with typos using {engine}: "
+                f"{accuracy:.3f} ({1000 * seconds / len(validation_df):.1f} ms per "
+                "message)"
+            )
+
+    def test_prefilter_recall(
+        self, client_vectorized, app_vectorized, faq_data, test_params
+    ):
+        """
+        Report, for each candidate set size in `PREFILTER_TOP_MS`, how often the
+        prefilter of `VectorizedScorer` keeps all the top k FAQs of full scoring,
+        and the true FAQ, among the candidates of the validation messages
+        """
+        headers = {"Authorization": "Bearer %s" % os.getenv("INBOUND_CHECK_TOKEN")}
+        client_vectorized.get("/internal/refresh-faqs", headers=headers)
+
+        snapshot = app_vectorized.faq_snapshot
+        scorer = snapshot.faqt_model
+        titles = [faq.faq_title for faq in snapshot.faqs]
+        n_top = app_vectorized.config["N_TOP_MATCHES_PER_PAGE"]
+
+        validation_df = self.get_validation_data(test_params)
+        messages = []
+        for message, true_faq in zip(
+            validation_df[test_params["QUERY_COL"]],
+            validation_df[test_params["TRUE_FAQ_COL"]],
+        ):
+            message_vectors = scorer.get_message_vectors(str(message))[1]
+            scores = scorer.score_contents(str(message))["overall_scores"]
+            top_k = set(np.argsort(scores)[::-1][:n_top])
+            messages.append((message_vectors, top_k, true_faq))
+
+        for top_m in PREFILTER_TOP_MS:
+            top_k_kept = []
+            true_faq_kept = []
+            for message_vectors, top_k, true_faq in messages:
+                candidates = scorer.get_candidates(message_vectors, top_m)
+                if candidates is None:
+                    candidates = range(len(titles))
+                candidates = set(candidates)
+                top_k_kept.append(top_k <= candidates)
+                true_faq_kept.append(true_faq in {titles[i] for i in candidates})
+
+            print(
+                f"Prefilter with {top_m} of {len(titles)} FAQs: top k of full "
+                f"scoring kept for {np.mean(top_k_kept):.3f} of messages, true FAQ "
+                f"kept for {np.mean(true_faq_kept):.3f}"
+            )